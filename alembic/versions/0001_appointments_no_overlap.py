@@ -0,0 +1,44 @@
+"""Prevent overlapping appointments per doctor
+
+Adds a GiST exclusion constraint on (doctor_id, tsrange(start_time, end_time))
+for appointments that are not cancelled. The appointment columns are naive UTC
+timestamps, so the range type is tsrange. Ranges are half-open, so
+back-to-back appointments are allowed.
+
+Existing overlapping appointments must be resolved (e.g. cancelled) before
+upgrading, otherwise adding the constraint fails.
+
+The tables themselves predate Alembic; this is the first managed revision.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # btree_gist provides the GiST "=" operator for the uuid column
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.execute(
+        """
+        ALTER TABLE appointments
+        ADD CONSTRAINT appointments_doctor_period_excl
+        EXCLUDE USING gist (doctor_id WITH =, tsrange(start_time, end_time) WITH &&)
+        WHERE (status <> 'cancelled')
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE appointments DROP CONSTRAINT IF EXISTS appointments_doctor_period_excl")
@@ -0,0 +1,53 @@
+"""Composite indexes for availability and listing queries
+
+- appointments(doctor_id, start_time) WHERE status <> 'cancelled': busy time
+  of one doctor in a time range
+- blocked_periods(doctor_id, start_time, end_time): same, for blocked periods
+- business_hours(doctor_id, weekday): opening hours of a doctor on a weekday
+- appointments(user_id, start_time): a user's appointments in time order
+
+Indexes are built CONCURRENTLY so the tables stay writable during the upgrade.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ("ix_appointments_doctor_id_start_time_active", "appointments", ["doctor_id", "start_time"], "status <> 'cancelled'"),
+    ("ix_blocked_periods_doctor_id_start_time_end_time", "blocked_periods", ["doctor_id", "start_time", "end_time"], None),
+    ("ix_business_hours_doctor_id_weekday", "business_hours", ["doctor_id", "weekday"], None),
+    ("ix_appointments_user_id_start_time", "appointments", ["user_id", "start_time"], None),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_where=where,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
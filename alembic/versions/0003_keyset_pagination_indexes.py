@@ -0,0 +1,48 @@
+"""Indexes for keyset pagination of list endpoints
+
+Each list endpoint filters on its owner and pages by (created_at, id), or
+(start_time, id) for appointments. An index on (owner, sort key...) serves
+every page with one range scan. The appointments index replaces
+ix_appointments_user_id_start_time from 0002, which lacked the id tie-breaker.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ("ix_contacts_user_id_created_at_id", "contacts", ["user_id", "created_at", "id"]),
+    ("ix_doctors_user_id_created_at_id", "doctors", ["user_id", "created_at", "id"]),
+    ("ix_bots_user_id_created_at_id", "bots", ["user_id", "created_at", "id"]),
+    ("ix_services_doctor_id_created_at_id", "services", ["doctor_id", "created_at", "id"]),
+    ("ix_appointments_user_id_start_time_id", "appointments", ["user_id", "start_time", "id"]),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index("ix_appointments_user_id_start_time", table_name="appointments",
+                      postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index("ix_appointments_user_id_start_time", "appointments", ["user_id", "start_time"],
+                        postgresql_concurrently=True, if_not_exists=True)
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
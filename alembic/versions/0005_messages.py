@@ -0,0 +1,47 @@
+"""Create the messages table
+
+Stores WhatsApp messages received through the Evolution API webhook.
+(bot_id, external_id) is unique so retried deliveries are stored once.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "messages",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("bot_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("bots.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("contact_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("contacts.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("external_id", sa.String(), nullable=False),
+        sa.Column("remote_jid", sa.String(), nullable=False),
+        sa.Column("from_me", sa.Boolean(), nullable=False),
+        sa.Column("message_type", sa.String(), nullable=True),
+        sa.Column("text", sa.Text(), nullable=True),
+        sa.Column("payload", postgresql.JSONB(), nullable=True),
+        sa.Column("sent_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("bot_id", "external_id", name="uq_messages_bot_id_external_id"),
+    )
+    op.create_index("ix_messages_user_id", "messages", ["user_id"])
+    op.create_index("ix_messages_contact_id_sent_at", "messages", ["contact_id", "sent_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("messages")
@@ -0,0 +1,97 @@
+"""Normalized, unique phone key for contacts
+
+Adds contacts.phone_e164, backfills it from contacts.phone and makes
+(user_id, phone_e164) unique. Where a user already has several contacts with
+the same number, the oldest one keeps phone_e164 and the others are left
+NULL (their rows and phone values are untouched).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:00
+
+"""
+import re
+from typing import Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+# Frozen copy of app.core.phone.normalize_phone as of this revision: the
+# backfill must keep producing the keys it produced when it was written, even
+# if the application's normalizer changes later. Only the default country
+# code (configuration, not logic) is read from the settings.
+_NON_DIGITS = re.compile(r"\D")
+_MIN_DIGITS = 8
+_MAX_DIGITS = 15
+_MAX_NATIONAL_DIGITS = 11
+
+
+def normalize_phone(raw: Optional[str], country_code: str) -> Optional[str]:
+    if not raw:
+        return None
+    raw = raw.split("@", 1)[0].split(":", 1)[0].strip()
+
+    international = raw.startswith("+")
+    digits = _NON_DIGITS.sub("", raw)
+    if not international and digits.startswith("00"):
+        international = True
+        digits = digits[2:]
+
+    if not international:
+        national = digits.lstrip("0")
+        already_prefixed = digits.startswith(country_code) and len(digits) > _MAX_NATIONAL_DIGITS
+        if not already_prefixed and len(national) <= _MAX_NATIONAL_DIGITS:
+            digits = country_code + national
+
+    if not _MIN_DIGITS <= len(digits) <= _MAX_DIGITS:
+        return None
+    return f"+{digits}"
+
+
+def upgrade() -> None:
+    op.add_column("contacts", sa.Column("phone_e164", sa.String(), nullable=True))
+
+    conn = op.get_bind()
+    seen = set()
+    updates = []
+    rows = conn.execute(sa.text("SELECT id, user_id, phone FROM contacts ORDER BY created_at, id"))
+    for contact_id, user_id, phone in rows:
+        phone_e164 = normalize_phone(phone, settings.DEFAULT_PHONE_COUNTRY_CODE)
+        if phone_e164 is None or (user_id, phone_e164) in seen:
+            continue
+        seen.add((user_id, phone_e164))
+        updates.append({"id": contact_id, "phone_e164": phone_e164})
+
+    statement = sa.text("UPDATE contacts SET phone_e164 = :phone_e164 WHERE id = :id")
+    for start in range(0, len(updates), BATCH_SIZE):
+        conn.execute(statement, updates[start:start + BATCH_SIZE])
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "uq_contacts_user_id_phone_e164",
+            "contacts",
+            ["user_id", "phone_e164"],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("uq_contacts_user_id_phone_e164", table_name="contacts",
+                      postgresql_concurrently=True, if_exists=True)
+    op.drop_column("contacts", "phone_e164")
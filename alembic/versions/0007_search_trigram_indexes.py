@@ -0,0 +1,45 @@
+"""Trigram indexes for contact and appointment search
+
+The `q` parameter of the contacts and appointments listings matches substrings
+(ILIKE '%...%') of contact names and phones and appointment titles. pg_trgm GIN
+indexes serve those patterns (three characters or more) and similarity() ranks
+the matches.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ("ix_contacts_name_trgm", "contacts", "name"),
+    ("ix_contacts_phone_e164_trgm", "contacts", "phone_e164"),
+    ("ix_appointments_title_trgm", "appointments", "title"),
+]
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, column in INDEXES:
+            op.create_index(name, table, [column], postgresql_using="gin",
+                            postgresql_ops={column: "gin_trgm_ops"},
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
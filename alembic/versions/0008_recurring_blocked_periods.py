@@ -0,0 +1,48 @@
+"""Create the recurring_blocked_periods table
+
+Repeating blocks (every Friday afternoon, a daily lunch break) are stored as
+one rule each instead of one blocked_periods row per occurrence, and are
+expanded only for the window being queried.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "recurring_blocked_periods",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("doctor_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("doctors.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("frequency", sa.String(), nullable=False),
+        sa.Column("repeat_interval", sa.Integer(), nullable=False),
+        sa.Column("weekdays", postgresql.ARRAY(sa.Integer()), nullable=True),
+        sa.Column("start_time", sa.Time(), nullable=False),
+        sa.Column("end_time", sa.Time(), nullable=False),
+        sa.Column("starts_on", sa.Date(), nullable=False),
+        sa.Column("until", sa.Date(), nullable=True),
+        sa.Column("count", sa.Integer(), nullable=True),
+        sa.Column("exceptions", postgresql.ARRAY(sa.Date()), nullable=True),
+        sa.Column("reason", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_recurring_blocked_periods_doctor_id", "recurring_blocked_periods", ["doctor_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("recurring_blocked_periods")
@@ -0,0 +1,29 @@
+"""Add doctors.timezone
+
+Availability and appointment date filters use the doctor's timezone when it
+is set (IANA name), else the bot's or the default one.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("doctors", sa.Column("timezone", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("doctors", "timezone")
@@ -7,7 +7,8 @@ from app.api.api_v1.endpoints import (
     contacts,
     blocked_periods,
     doctors,
-    services
+    services,
+    webhooks
 )
 
 api_router = APIRouter()
@@ -18,6 +19,9 @@ api_router.include_router(auth.router, tags=["auth"])
 # Bot routes
 api_router.include_router(bots.router, prefix="/bots", tags=["bots"])
 
+# Evolution API webhook routes
+api_router.include_router(webhooks.router, prefix="/webhooks", tags=["webhooks"])
+
 # Business hours routes
 api_router.include_router(business_hours.router, tags=["business-hours"])
 
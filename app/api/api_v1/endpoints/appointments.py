@@ -1,174 +1,425 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
+import heapq
+import uuid
+from sqlalchemy import func, insert, or_, select, union_all, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import date, datetime, timedelta
-from app.core.database import get_db
+from zoneinfo import ZoneInfo
+from app.core.config import settings
+from app.core.database import get_async_db, is_exclusion_violation
 from app.models.user import User
 from app.models.bot import Bot
 from app.models.contact import Contact
-from app.models.appointment import Appointment
+from app.models.appointment import ACTIVE_APPOINTMENT, Appointment
 from app.models.blocked_period import BlockedPeriod
+from app.models.recurring_blocked_period import RecurringBlockedPeriod
 from app.models.business_hour import BusinessHour
 from app.models.doctor import Doctor
 from app.models.service import Service
-from app.schemas.appointment import Appointment as AppointmentSchema, AppointmentCreate, AppointmentUpdate, AppointmentResponse, AvailableSlotsResponse, AvailableTimeSlot
-from zoneinfo import ZoneInfo
+from app.schemas.appointment import Appointment as AppointmentSchema, AppointmentCreate, AppointmentUpdate, AppointmentResponse, AvailableSlotsResponse, AvailabilityRangeResponse, AppointmentBatchRequest, AppointmentBatchResponse, AppointmentBatchResult
 from app.api.api_v1.endpoints.auth import get_current_user
+from app.api.export import export_response
+from app.api.pagination import paginate, set_next_cursor
+from app.api.search import contains_pattern, search_page
+from app.services.availability_cache import availability_cache
+from app.core.timezones import get_timezone, local_day_start_utc, local_days_to_utc, local_window_to_utc
+from app.services.availability import BusyTimeline, compute_free_slots, to_aware_utc
+from app.services.recurrence import expand, expand_all
+from app.api.responses import FastJSONRoute
+
+router = APIRouter(route_class=FastJSONRoute)
 
-router = APIRouter()
+APPOINTMENT_ORDER = (Appointment.start_time, Appointment.id)
 
 @router.get("/", response_model=List[AppointmentResponse])
-def read_appointments(
+async def read_appointments(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    response: Response,
     doctor_id: Optional[str] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    timezone_name: Optional[str] = Query(None, alias="timezone", max_length=64),
+    q: Optional[str] = Query(None, min_length=1, max_length=100),
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_user)
 ):
     """
-    Retrieve appointments for the current user.
+    Retrieve appointments for the current user, in start time order.
+    `start_date` and `end_date` are days in `timezone` (by default the
+    doctor's timezone when filtering by doctor, else the default one).
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one.
+    With `q`, only appointments whose title contains it, best matches first,
+    paged with `skip`.
+    """
+    tz = await _listing_timezone(db, current_user.id, doctor_id, start_date, end_date, timezone_name)
+    query = _appointments_query(current_user.id, doctor_id, start_date, end_date, q, tz)
+    if q:
+        rank = func.similarity(Appointment.title, q)
+        return (await db.scalars(search_page(query, rank, APPOINTMENT_ORDER, cursor=cursor, skip=skip, limit=limit))).all()
+    appointments = (await db.scalars(paginate(query, APPOINTMENT_ORDER, cursor=cursor, skip=skip, limit=limit))).all()
+    set_next_cursor(response, appointments, APPOINTMENT_ORDER, limit)
+    return appointments
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_appointments(
+    *,
+    db: AsyncSession = Depends(get_async_db),
+    doctor_id: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    timezone_name: Optional[str] = Query(None, alias="timezone", max_length=64),
+    q: Optional[str] = Query(None, min_length=1, max_length=100),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    current_user: User = Depends(get_current_user)
+):
     """
-    query = db.query(Appointment).filter(Appointment.user_id == current_user.id)
+    Export all appointments matching the list filters as NDJSON or CSV, in start time order.
+    """
+    tz = await _listing_timezone(db, current_user.id, doctor_id, start_date, end_date, timezone_name)
+    query = _appointments_query(current_user.id, doctor_id, start_date, end_date, q, tz).order_by(*APPOINTMENT_ORDER)
+    return export_response(query, AppointmentResponse, format, "appointments")
+
+def _timezone(name: Optional[str]) -> ZoneInfo:
+    try:
+        return get_timezone(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _bot_timezone(db: AsyncSession, user_id, bot_id: Optional[str]) -> Optional[str]:
+    if not bot_id:
+        return None
+    bot_timezone = await db.scalar(select(Bot.timezone).where(Bot.id == bot_id, Bot.user_id == user_id))
+    if bot_timezone is None:
+        raise HTTPException(status_code=404, detail="Bot not found for this user")
+    return bot_timezone
+
+async def _listing_timezone(db: AsyncSession, user_id, doctor_id: Optional[str], start_date: Optional[date], end_date: Optional[date], timezone_name: Optional[str]) -> ZoneInfo:
+    # Only date filters depend on the timezone; skip the doctor lookup without them
+    if not timezone_name and doctor_id and (start_date or end_date):
+        timezone_name = await db.scalar(select(Doctor.timezone).where(Doctor.id == doctor_id, Doctor.user_id == user_id))
+    return _timezone(timezone_name)
+
+def _appointments_query(user_id, doctor_id: Optional[str], start_date: Optional[date], end_date: Optional[date], q: Optional[str] = None, tz: Optional[ZoneInfo] = None):
+    query = select(Appointment).where(Appointment.user_id == user_id)
+    tz = tz or get_timezone()
     
     if doctor_id:
-        query = query.filter(Appointment.doctor_id == doctor_id)
+        query = query.where(Appointment.doctor_id == doctor_id)
 
     if start_date:
-        query = query.filter(Appointment.start_time >= datetime.combine(start_date, datetime.min.time()))
+        query = query.where(Appointment.start_time >= local_day_start_utc(start_date, tz))
     if end_date:
         # Inclusive end date
-        query = query.filter(Appointment.end_time <= datetime.combine(end_date, datetime.max.time()))
-        
-    return query.offset(skip).limit(limit).all()
+        query = query.where(Appointment.end_time <= local_day_start_utc(end_date + timedelta(days=1), tz))
+
+    if q:
+        query = query.where(Appointment.title.ilike(contains_pattern(q)))
+    return query
 
 @router.get("/available-slots", response_model=AvailableSlotsResponse)
-def get_available_slots(
+async def get_available_slots(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user_id: str = Query(..., alias="userId"),
     date_param: date = Query(..., alias="date"),
     doctor_id: str = Query(..., alias="doctorId"),
-    service_id: str = Query(..., alias="serviceId")
+    service_id: str = Query(..., alias="serviceId"),
+    timezone_name: Optional[str] = Query(None, alias="timezone", max_length=64),
+    bot_id: Optional[str] = Query(None, alias="botId")
 ):
     """
     Get available time slots for a specific doctor and service on a date.
+    The date and business hours are local to `timezone`, else the doctor's
+    timezone, else the timezone of the bot `botId`, else the default one.
     """
     # 2. Find Doctor & Service
     # Ensure they belong to the bot
-    doctor = db.query(Doctor).filter(Doctor.id == doctor_id, Doctor.user_id == user_id).first()
+    doctor = await db.scalar(select(Doctor).where(Doctor.id == doctor_id, Doctor.user_id == user_id))
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found for this user")
         
-    service = db.query(Service).filter(Service.id == service_id, Service.doctor_id == doctor.id).first()
+    service = await db.scalar(select(Service).where(Service.id == service_id, Service.doctor_id == doctor.id))
     if not service:
         raise HTTPException(status_code=404, detail="Service not found for this doctor")
 
-    # 3. Setup Timezone
-    tz = ZoneInfo("America/Sao_Paulo")
+    duration = timedelta(minutes=service.duration)
+    if duration <= timedelta(0):
+        raise HTTPException(status_code=400, detail="Service duration must be positive")
+
+    tz = _timezone(timezone_name or doctor.timezone or await _bot_timezone(db, user_id, bot_id))
+    cache_key = await availability_cache.key(doctor.id, date_param, service.duration, tz.key)
+    slots = await availability_cache.get(cache_key)
+    if slots is None:
+        slots = await _compute_day_slots(db, doctor.id, date_param, duration, tz)
+        await availability_cache.set(cache_key, slots)
+
+    return {
+        "available_slots": [
+            {"start": start.astimezone(tz), "end": end.astimezone(tz)}
+            for start, end in slots
+        ]
+    }
 
-    # 4. Determine Business Hours for the Doctor
-    weekday = (date_param.weekday() + 1) % 7
+
+async def _compute_day_slots(db: AsyncSession, doctor_id, day: date, duration: timedelta, tz) -> list:
+    # 3. Determine Business Hours for the Doctor
+    weekday = (day.weekday() + 1) % 7
     
-    business_hour = db.query(BusinessHour).filter(
-        BusinessHour.doctor_id == doctor.id,
+    business_hour = await db.scalar(select(BusinessHour).where(
+        BusinessHour.doctor_id == doctor_id,
         BusinessHour.weekday == weekday,
         BusinessHour.is_available == True
-    ).first()
+    ).limit(1))
 
     if not business_hour:
         # Doctor Closed on this day
-        return AvailableSlotsResponse(available_slots=[])
-
-    # Convert Business Hours to UTC for the specific date
-    bh_start_naive = datetime.combine(date_param, business_hour.start_time)
-    bh_end_naive = datetime.combine(date_param, business_hour.end_time)
-
-    # Localize to bot's timezone
-    bh_start_local = bh_start_naive.replace(tzinfo=tz)
-    bh_end_local = bh_end_naive.replace(tzinfo=tz)
-
-    # Convert to UTC for DB querying
-    open_start_utc = bh_start_local.astimezone(ZoneInfo("UTC"))
-    open_end_utc = bh_end_local.astimezone(ZoneInfo("UTC"))
-
-    if open_end_utc <= open_start_utc:
-         # Handle wrap around if needed
-         pass
-
-    # 5. Fetch Busy Intervals
-    # Appointments for this Doctor
-    # Only active appointments count as busy
-    appointments = db.query(Appointment).filter(
-        Appointment.doctor_id == doctor.id,
-        Appointment.status != "cancelled",
-        Appointment.start_time < open_end_utc.replace(tzinfo=None), 
-        Appointment.end_time > open_start_utc.replace(tzinfo=None)
-    ).all()
-
-    # Blocked Periods
-    # Filtered by Doctor
-    blocked_periods = db.query(BlockedPeriod).filter(
-        BlockedPeriod.doctor_id == doctor.id,
-        BlockedPeriod.start_time < open_end_utc.replace(tzinfo=None),
-        BlockedPeriod.end_time > open_start_utc.replace(tzinfo=None)
-    ).all()
-
-    # 6. Process Availability
-    busy_intervals = []
-    
-    def to_aware_utc(dt):
-        if dt.tzinfo is None:
-            return dt.replace(tzinfo=ZoneInfo("UTC"))
-        return dt.astimezone(ZoneInfo("UTC"))
-
-    for appt in appointments:
-        start = to_aware_utc(appt.start_time)
-        end = to_aware_utc(appt.end_time)
-        busy_intervals.append((start, end))
-        
-    for bp in blocked_periods:
-        start = to_aware_utc(bp.start_time)
-        end = to_aware_utc(bp.end_time)
-        busy_intervals.append((start, end))
-        
-    # Sort by start time
-    busy_intervals.sort(key=lambda x: x[0])
+        return []
 
-    available_slots = []
-    
-    # 7. Generate fixed slots based on Service Duration
-    duration = timedelta(minutes=service.duration)
-    current_slot_start = open_start_utc
-    
-    sp_tz = ZoneInfo("America/Sao_Paulo")
+    # Convert Business Hours (doctor's timezone) to UTC for the specific date
+    open_start_utc, open_end_utc = local_window_to_utc(day, business_hour.start_time, business_hour.end_time, tz)
 
-    def utc_to_sp(dt: datetime) -> datetime:
-        return dt.astimezone(sp_tz)
+    # 4. Fetch Busy Intervals in one round-trip
+    # Only active appointments count as busy; blocked periods are filtered by doctor
+    window_start = open_start_utc.replace(tzinfo=None)
+    window_end = open_end_utc.replace(tzinfo=None)
+    busy_query = union_all(
+        select(Appointment.start_time, Appointment.end_time).where(
+            Appointment.doctor_id == doctor_id,
+            ACTIVE_APPOINTMENT,
+            Appointment.start_time < window_end,
+            Appointment.end_time > window_start
+        ),
+        select(BlockedPeriod.start_time, BlockedPeriod.end_time).where(
+            BlockedPeriod.doctor_id == doctor_id,
+            BlockedPeriod.start_time < window_end,
+            BlockedPeriod.end_time > window_start
+        ),
+    )
+    busy_intervals = [
+        (to_aware_utc(start), to_aware_utc(end))
+        for start, end in (await db.execute(busy_query)).all()
+    ]
+    # Recurring blocked periods are stored as rules and expanded for this day only
+    rules = await _load_recurring_blocks(db, [doctor_id], day, day)
+    busy_intervals.extend(interval for _, interval in expand_all(rules, day, day, tz))
 
-    while current_slot_start + duration <= open_end_utc:
-        current_slot_end = current_slot_start + duration
-        is_conflicted = False
-        
-        for busy_start, busy_end in busy_intervals:
-            if busy_start < current_slot_end and busy_end > current_slot_start:
-                is_conflicted = True
+    # 5. Generate fixed slots based on Service Duration
+    return compute_free_slots(open_start_utc, open_end_utc, duration, busy_intervals)
+
+
+MAX_AVAILABILITY_RANGE_DAYS = 62
+AVAILABILITY_RANGE_CHUNK_DAYS = 7
+
+@router.get("/available-slots/range", response_model=AvailabilityRangeResponse)
+async def get_available_slots_range(
+    *,
+    db: AsyncSession = Depends(get_async_db),
+    user_id: str = Query(..., alias="userId"),
+    start_date: date = Query(..., alias="startDate"),
+    end_date: date = Query(..., alias="endDate"),
+    service_id: str = Query(..., alias="serviceId"),
+    doctor_ids: Optional[List[str]] = Query(None, alias="doctorIds"),
+    first: Optional[int] = Query(None, ge=1, description="Stop after this many slots (earliest first)"),
+    timezone_name: Optional[str] = Query(None, alias="timezone", max_length=64),
+    bot_id: Optional[str] = Query(None, alias="botId")
+):
+    """
+    Get available time slots for several days and doctors at once.
+
+    The service selects what is being booked: every doctor of the user that
+    offers a service with the same name is considered (or only `doctorIds`),
+    each with its own service duration. Days missing from the availability
+    cache are computed with one query per table. With `first`, days are
+    scanned in weekly chunks and the search stops as soon as enough slots
+    were found. Days are local to each doctor's timezone, resolved as in
+    get_available_slots.
+    """
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="endDate must not be before startDate")
+    if (end_date - start_date).days >= MAX_AVAILABILITY_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {MAX_AVAILABILITY_RANGE_DAYS} days")
+
+    # 1. Doctors offering the service, with their own service row
+    service_name = select(Service.name).where(Service.id == service_id, Service.user_id == user_id).scalar_subquery()
+    services_query = select(Service, Doctor.timezone).join(Doctor, Doctor.id == Service.doctor_id).where(
+        Service.user_id == user_id, Service.name == service_name
+    )
+    if doctor_ids:
+        services_query = services_query.where(Service.doctor_id.in_(doctor_ids))
+    services = (await db.execute(services_query.order_by(Service.doctor_id))).all()
+    if not services:
+        raise HTTPException(status_code=404, detail="Service not found for this user")
+
+    service_by_doctor = {}
+    timezone_by_doctor = {}
+    for service, doctor_timezone in services:
+        # The requested service wins if a doctor has several with the same name
+        if service.doctor_id not in service_by_doctor or str(service.id) == service_id:
+            service_by_doctor[service.doctor_id] = service
+        timezone_by_doctor[service.doctor_id] = timezone_name or doctor_timezone
+    doctors = list(service_by_doctor)
+    bot_timezone = None
+    if not all(timezone_by_doctor.values()):
+        bot_timezone = await _bot_timezone(db, user_id, bot_id)
+    tz_by_doctor = {doctor_id: _timezone(timezone_by_doctor[doctor_id] or bot_timezone) for doctor_id in doctors}
+
+    # 2. Walk the range in chunks (the whole range unless `first` may stop early).
+    # Each chunk is served from the availability cache and only missing
+    # (doctor, day) pairs are computed, with one query per table.
+    hours = None
+    days_by_doctor = {doctor_id: [] for doctor_id in doctors}
+    remaining = first
+    chunk_days = AVAILABILITY_RANGE_CHUNK_DAYS if first else MAX_AVAILABILITY_RANGE_DAYS
+    chunk_start = start_date
+    while chunk_start <= end_date and remaining != 0:
+        chunk_end = min(end_date, chunk_start + timedelta(days=chunk_days - 1))
+        days = [chunk_start + timedelta(days=i) for i in range((chunk_end - chunk_start).days + 1)]
+        pairs = [(doctor_id, day) for day in days for doctor_id in doctors]
+        cache_keys = await availability_cache.keys(
+            (doctor_id, day, service_by_doctor[doctor_id].duration, tz_by_doctor[doctor_id].key) for doctor_id, day in pairs
+        )
+        slots_by_pair = dict(zip(pairs, await availability_cache.get_many(cache_keys)))
+
+        misses = [pair for pair, slots in slots_by_pair.items() if slots is None]
+        if misses:
+            if hours is None:
+                hours = await _load_business_hours(db, doctors)
+            timelines = await _load_busy_timelines(
+                db, {doctor_id: tz_by_doctor[doctor_id] for doctor_id, _ in misses},
+                min(day for _, day in misses), max(day for _, day in misses)
+            )
+            for (doctor_id, day), cache_key in zip(pairs, cache_keys):
+                if slots_by_pair[(doctor_id, day)] is not None:
+                    continue
+                business_hour = hours.get((doctor_id, (day.weekday() + 1) % 7))
+                duration = timedelta(minutes=service_by_doctor[doctor_id].duration)
+                slots = []
+                if business_hour and duration > timedelta(0):
+                    # Converted once per (timezone, day, hours) and shared by doctors with the same schedule
+                    open_start, open_end = local_window_to_utc(day, business_hour.start_time, business_hour.end_time, tz_by_doctor[doctor_id])
+                    slots = timelines[doctor_id].free_slots(open_start, open_end, duration)
+                slots_by_pair[(doctor_id, day)] = slots
+                await availability_cache.set(cache_key, slots)
+
+        # 3. Collect day by day so that `first` returns the earliest slots across doctors
+        for day in days:
+            day_slots = [
+                (start, end, doctor_id)
+                for doctor_id in doctors
+                for start, end in slots_by_pair[(doctor_id, day)]
+            ]
+            if remaining is not None:
+                day_slots = heapq.nsmallest(remaining, day_slots, key=lambda slot: slot[0])
+                remaining -= len(day_slots)
+
+            slots_by_doctor = {}
+            for start, end, doctor_id in sorted(day_slots, key=lambda slot: slot[0]):
+                slots_by_doctor.setdefault(doctor_id, []).append(
+                    {"start": start.astimezone(tz_by_doctor[doctor_id]), "end": end.astimezone(tz_by_doctor[doctor_id])}
+                )
+            for doctor_id, slots in slots_by_doctor.items():
+                days_by_doctor[doctor_id].append({"day": day, "available_slots": slots})
+            if remaining == 0:
                 break
-        
-        if not is_conflicted:
-            available_slots.append(AvailableTimeSlot(start=utc_to_sp(current_slot_start), end=utc_to_sp(current_slot_end)))
-            
-        current_slot_start += duration
+        chunk_start = chunk_end + timedelta(days=1)
+
+    return {
+        "doctors": [
+            {
+                "doctor_id": doctor_id,
+                "service_id": service_by_doctor[doctor_id].id,
+                "days": days_by_doctor[doctor_id],
+            }
+            for doctor_id in doctors
+        ]
+    }
+
+
+async def _load_business_hours(db: AsyncSession, doctor_ids) -> dict:
+    # First available entry per (doctor, weekday), as in get_available_slots
+    hours = {}
+    for business_hour in (await db.scalars(select(BusinessHour).where(
+        BusinessHour.doctor_id.in_(doctor_ids),
+        BusinessHour.is_available == True
+    ))).all():
+        hours.setdefault((business_hour.doctor_id, business_hour.weekday), business_hour)
+    return hours
+
+
+async def _load_busy_timelines(db: AsyncSession, tz_by_doctor: dict, first_day: date, last_day: date) -> dict:
+    # Busy intervals of several doctors for whole local days (each in its own timezone), in one round-trip
+    bounds = [local_days_to_utc(first_day, last_day, tz) for tz in set(tz_by_doctor.values())]
+    window_start = min(start for start, _ in bounds)
+    window_end = max(end for _, end in bounds)
+    doctor_ids = list(tz_by_doctor)
+    busy_query = union_all(
+        select(Appointment.doctor_id, Appointment.start_time, Appointment.end_time).where(
+            Appointment.doctor_id.in_(doctor_ids),
+            ACTIVE_APPOINTMENT,
+            Appointment.start_time < window_end,
+            Appointment.end_time > window_start
+        ),
+        select(BlockedPeriod.doctor_id, BlockedPeriod.start_time, BlockedPeriod.end_time).where(
+            BlockedPeriod.doctor_id.in_(doctor_ids),
+            BlockedPeriod.start_time < window_end,
+            BlockedPeriod.end_time > window_start
+        ),
+    )
+    busy_by_doctor = {doctor_id: [] for doctor_id in doctor_ids}
+    for doctor_id, start, end in (await db.execute(busy_query)).all():
+        busy_by_doctor[doctor_id].append((to_aware_utc(start), to_aware_utc(end)))
+    rules = await _load_recurring_blocks(db, doctor_ids, first_day, last_day)
+    for rule in rules:
+        busy_by_doctor[rule.doctor_id].extend(expand(rule, first_day, last_day, tz_by_doctor[rule.doctor_id]))
+    return {doctor_id: BusyTimeline(busy) for doctor_id, busy in busy_by_doctor.items()}
+
+
+async def _load_recurring_blocks(db: AsyncSession, doctor_ids, first_day: date, last_day: date) -> list:
+    # Rules that may occur in the window; they are expanded in memory
+    return (await db.scalars(select(RecurringBlockedPeriod).where(
+        RecurringBlockedPeriod.doctor_id.in_(list(doctor_ids)),
+        RecurringBlockedPeriod.starts_on <= last_day,
+        or_(RecurringBlockedPeriod.until.is_(None), RecurringBlockedPeriod.until >= first_day)
+    ))).all()
+
+
+@asynccontextmanager
+async def _appointment_writes(db: AsyncSession):
+    """
+    Run appointment writes and commit them. Overlaps are rejected by the
+    appointments_doctor_period_excl constraint, which is reported as 409.
+    The constraint is not deferrable, so statements executed inside the
+    block can raise it as well as the commit.
+    """
+    try:
+        yield
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        if is_exclusion_violation(e):
+            raise HTTPException(status_code=409, detail="The doctor already has an appointment in this period")
+        raise
+
 
-    return AvailableSlotsResponse(available_slots=available_slots)
+async def _commit_appointment(db: AsyncSession) -> None:
+    """
+    Commit a new or rescheduled appointment added to the session (see _appointment_writes).
+    """
+    async with _appointment_writes(db):
+        pass
 
 
 @router.post("/", response_model=AppointmentResponse)
-def create_appointment(
+async def create_appointment(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     appointment_in: AppointmentCreate,
     current_user: User = Depends(get_current_user)
 ):
@@ -176,14 +427,14 @@ def create_appointment(
     Create new appointment.
     """
     # Verify contact belongs to current user
-    contact = db.query(Contact).filter(Contact.id == appointment_in.contact_id, Contact.user_id == current_user.id).first()
+    contact = await db.scalar(select(Contact).where(Contact.id == appointment_in.contact_id, Contact.user_id == current_user.id))
     if not contact:
         raise HTTPException(status_code=404, detail="Contact not found")
 
     if not appointment_in.doctor_id:
          raise HTTPException(status_code=400, detail="Doctor ID is required")
          
-    doctor = db.query(Doctor).filter(Doctor.id == appointment_in.doctor_id, Doctor.user_id == current_user.id).first()
+    doctor = await db.scalar(select(Doctor).where(Doctor.id == appointment_in.doctor_id, Doctor.user_id == current_user.id))
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found or authorization failed")
 
@@ -192,38 +443,176 @@ def create_appointment(
          raise HTTPException(status_code=400, detail="Service ID is required")
          
     # Service must belong to the doctor
-    service = db.query(Service).filter(Service.id == appointment_in.service_id, Service.doctor_id == doctor.id).first()
+    service = await db.scalar(select(Service).where(Service.id == appointment_in.service_id, Service.doctor_id == doctor.id))
     if not service:
         raise HTTPException(status_code=404, detail="Service not found or does not belong to this doctor")
 
+    if appointment_in.end_time <= appointment_in.start_time:
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
+
     appointment = Appointment(
         **appointment_in.model_dump(),
         user_id=current_user.id
     )
     db.add(appointment)
-    db.commit()
-    db.refresh(appointment)
+    await _commit_appointment(db)
+    await db.refresh(appointment)
+    await availability_cache.invalidate_range(appointment.doctor_id, appointment.start_time, appointment.end_time)
     return appointment
 
+async def _owned_ids(db: AsyncSession, column, ids: set, *criteria) -> set:
+    # One IN (...) query for a whole batch of referenced rows
+    if not ids:
+        return set()
+    return set(await db.scalars(select(column).where(column.in_(ids), *criteria)))
+
+@router.post("/batch", response_model=AppointmentBatchResponse)
+async def batch_appointments(
+    *,
+    db: AsyncSession = Depends(get_async_db),
+    response: Response,
+    batch_in: AppointmentBatchRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Create, update and cancel appointments in one transaction.
+    Either every operation is applied or none is: if any operation is invalid
+    the batch answers 400 and the per-operation results say which and why.
+    A batch that would overlap another appointment is rejected with 409.
+    Cancellations run first, then updates, then creations, so a batch can
+    free a slot and book it again.
+    """
+    operations = batch_in.operations
+    if not operations:
+        raise HTTPException(status_code=400, detail="No operations")
+    if len(operations) > settings.APPOINTMENT_BATCH_MAX_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.APPOINTMENT_BATCH_MAX_OPERATIONS} operations per batch")
+
+    results = [AppointmentBatchResult(index=index, op=operation.op, status_code=200) for index, operation in enumerate(operations)]
+
+    def fail(index: int, status_code: int, error: str) -> None:
+        results[index].status_code = status_code
+        results[index].error = error
+
+    # Ownership of everything referenced, one query per entity type
+    creates = [operation.appointment for operation in operations if operation.op == "create"]
+    target_ids = [operation.id for operation in operations if operation.op != "create"]
+    existing = {}
+    if target_ids:
+        existing = {row.id: row for row in (await db.execute(
+            select(Appointment.id, Appointment.doctor_id, Appointment.start_time, Appointment.end_time)
+            .where(Appointment.id.in_(target_ids), Appointment.user_id == current_user.id)
+        )).all()}
+    contact_ids = await _owned_ids(db, Contact.id, {a.contact_id for a in creates}, Contact.user_id == current_user.id)
+    doctor_ids = await _owned_ids(db, Doctor.id, {a.doctor_id for a in creates if a.doctor_id}, Doctor.user_id == current_user.id)
+    service_doctors = {}
+    service_ids = {a.service_id for a in creates if a.service_id}
+    if service_ids:
+        service_doctors = dict((await db.execute(
+            select(Service.id, Service.doctor_id).where(Service.id.in_(service_ids), Service.doctor_id.in_(doctor_ids))
+        )).all())
+
+    now = datetime.utcnow()
+    cancel_rows, update_rows, create_rows = [], [], []
+    seen = set()
+    for index, operation in enumerate(operations):
+        if operation.op == "create":
+            appointment_in = operation.appointment
+            if not appointment_in.doctor_id:
+                fail(index, 400, "Doctor ID is required")
+            elif not appointment_in.service_id:
+                fail(index, 400, "Service ID is required")
+            elif appointment_in.contact_id not in contact_ids:
+                fail(index, 404, "Contact not found")
+            elif appointment_in.doctor_id not in doctor_ids:
+                fail(index, 404, "Doctor not found or authorization failed")
+            elif service_doctors.get(appointment_in.service_id) != appointment_in.doctor_id:
+                fail(index, 404, "Service not found or does not belong to this doctor")
+            elif appointment_in.end_time <= appointment_in.start_time:
+                fail(index, 400, "end_time must be after start_time")
+            else:
+                results[index].status_code = 201
+                create_rows.append({
+                    **appointment_in.model_dump(),
+                    "id": uuid.uuid4(),
+                    "user_id": current_user.id,
+                    "created_at": now,
+                    "updated_at": now,
+                })
+            continue
+
+        current = existing.get(operation.id)
+        if operation.id in seen:
+            fail(index, 400, "Appointment appears more than once in the batch")
+        elif current is None:
+            fail(index, 404, "Appointment not found")
+        elif operation.op == "cancel":
+            cancel_rows.append({"id": operation.id, "status": "cancelled", "updated_at": now})
+        else:
+            changes = operation.changes.model_dump(exclude_unset=True)
+            start_time = changes.get("start_time", current.start_time)
+            end_time = changes.get("end_time", current.end_time)
+            if start_time is None or end_time is None or end_time <= start_time:
+                fail(index, 400, "end_time must be after start_time")
+            else:
+                update_rows.append({**changes, "id": operation.id, "updated_at": now})
+        seen.add(operation.id)
+
+    if any(result.error for result in results):
+        for result in results:
+            if not result.error:
+                result.status_code = 424
+                result.error = "Not applied: another operation in the batch failed"
+        response.status_code = 400
+        return {"applied": False, "results": results}
+
+    # executemany: one statement per kind of change, all in one transaction
+    async with _appointment_writes(db):
+        if cancel_rows:
+            await db.execute(update(Appointment), cancel_rows)
+        if update_rows:
+            await db.execute(update(Appointment), update_rows)
+        if create_rows:
+            await db.execute(insert(Appointment), create_rows)
+
+    # Read back every touched row in one query for the results
+    row_ids = [operation.id for operation in operations if operation.op != "create"] + [row["id"] for row in create_rows]
+    appointments = {
+        appointment.id: appointment
+        for appointment in await db.scalars(select(Appointment).where(Appointment.id.in_(row_ids)))
+    }
+    created = iter(row["id"] for row in create_rows)
+    for result, operation in zip(results, operations):
+        row_id = next(created) if operation.op == "create" else operation.id
+        result.appointment = AppointmentResponse.model_validate(appointments[row_id])
+
+    for row_id in row_ids:
+        previous = existing.get(row_id)
+        if previous is not None:
+            await availability_cache.invalidate_range(previous.doctor_id, previous.start_time, previous.end_time)
+        appointment = appointments[row_id]
+        await availability_cache.invalidate_range(appointment.doctor_id, appointment.start_time, appointment.end_time)
+    return {"applied": True, "results": results}
+
 @router.get("/{appointment_id}", response_model=AppointmentResponse)
-def read_appointment(
+async def read_appointment(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     appointment_id: str,
     current_user: User = Depends(get_current_user)
 ):
     """
     Get appointment by ID.
     """
-    appointment = db.query(Appointment).filter(Appointment.id == appointment_id, Appointment.user_id == current_user.id).first()
+    appointment = await db.scalar(select(Appointment).where(Appointment.id == appointment_id, Appointment.user_id == current_user.id))
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
     return appointment
 
 @router.patch("/{appointment_id}", response_model=AppointmentResponse)
-def update_appointment(
+async def update_appointment(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     appointment_id: str,
     appointment_in: AppointmentUpdate,
     current_user: User = Depends(get_current_user)
@@ -231,35 +620,42 @@ def update_appointment(
     """
     Update an appointment.
     """
-    appointment = db.query(Appointment).filter(Appointment.id == appointment_id, Appointment.user_id == current_user.id).first()
+    appointment = await db.scalar(select(Appointment).where(Appointment.id == appointment_id, Appointment.user_id == current_user.id))
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
         
+    previous_range = (appointment.start_time, appointment.end_time)
     update_data = appointment_in.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(appointment, field, value)
+
+    if appointment.end_time <= appointment.start_time:
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
         
     db.add(appointment)
-    db.commit()
-    db.refresh(appointment)
+    await _commit_appointment(db)
+    await db.refresh(appointment)
+    await availability_cache.invalidate_range(appointment.doctor_id, *previous_range)
+    await availability_cache.invalidate_range(appointment.doctor_id, appointment.start_time, appointment.end_time)
     return appointment
 
 @router.delete("/{appointment_id}", response_model=AppointmentResponse)
-def delete_appointment(
+async def delete_appointment(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     appointment_id: str,
     current_user: User = Depends(get_current_user)
 ):
     """
     Soft delete an appointment (set status to cancelled).
     """
-    appointment = db.query(Appointment).filter(Appointment.id == appointment_id, Appointment.user_id == current_user.id).first()
+    appointment = await db.scalar(select(Appointment).where(Appointment.id == appointment_id, Appointment.user_id == current_user.id))
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
         
     appointment.status = "cancelled"
     db.add(appointment)
-    db.commit()
-    db.refresh(appointment)
+    await db.commit()
+    await db.refresh(appointment)
+    await availability_cache.invalidate_range(appointment.doctor_id, appointment.start_time, appointment.end_time)
     return appointment
@@ -1,33 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
 from app.models.user import User
 from app.schemas.user import UserCreate, User as UserSchema, UserResponse
+from app.api.responses import FastJSONRoute
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 security = HTTPBearer()
 
 from app.core.security import verify_firebase_token
+from app.services.users import resolve_user
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: AsyncSession = Depends(get_async_db)):
     token = credentials.credentials
     try:
         # Use centralized security module for verification (handles initialization)
         decoded_token = await verify_firebase_token(token)
-        uid = decoded_token['uid']
-        user = db.query(User).filter(User.firebase_uid == uid).first()
-        if not user:
-            # Auto-create user if valid firebase token but no DB record exists
-            user = User(
-                firebase_uid=uid, 
-                email=decoded_token.get('email'),
-                name=decoded_token.get('name') or decoded_token.get('email', '').split('@')[0]
-            )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-        return user
+        # Auto-creates the user if valid firebase token but no DB record exists
+        return await resolve_user(db, decoded_token)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,31 +1,86 @@
+from anyio import from_thread
 from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import date
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.core.database import get_db
 from app.models.user import User
 from app.models.bot import Bot
-from app.models.doctor import Doctor
 from app.models.blocked_period import BlockedPeriod
-from app.schemas.blocked_period import BlockedPeriodCreate, BlockedPeriodUpdate, BlockedPeriod as BlockedPeriodSchema
+from app.models.recurring_blocked_period import RecurringBlockedPeriod
+from app.schemas.blocked_period import (
+    BlockedPeriodCreate, BlockedPeriodUpdate, BlockedPeriod as BlockedPeriodSchema,
+    RecurringBlockedPeriodCreate, RecurringBlockedPeriodUpdate, RecurringBlockedPeriod as RecurringBlockedPeriodSchema,
+)
 from app.api.api_v1.endpoints.auth import get_current_user
+from app.api.ownership import delete_owned, get_owned, get_owned_doctor
+from app.core.timezones import get_timezone, local_days_to_utc
+from app.services.availability_cache import availability_cache
+from app.services.recurrence import expand
+from app.api.responses import FastJSONRoute
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+
+MAX_BLOCKED_PERIOD_WINDOW_DAYS = 366
 
 @router.get("/doctors/{doctor_id}/blocked-periods", response_model=List[BlockedPeriodSchema])
 def read_blocked_periods(
     *,
     db: Session = Depends(get_db),
     doctor_id: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
     current_user: User = Depends(get_current_user)
 ):
     """
     Get blocked periods for a specific doctor.
+    With `start_date` and/or `end_date` (inclusive days in the doctor's timezone), only the
+    periods in that window are returned, together with the occurrences of
+    recurring blocked periods (without an `id`, marked with `recurring_id`), in time order.
     """
-    doctor = db.query(Doctor).filter(Doctor.id == doctor_id, Doctor.user_id == current_user.id).first()
+    doctor = get_owned_doctor(db, doctor_id, current_user.id)
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
 
-    return db.query(BlockedPeriod).filter(BlockedPeriod.doctor_id == doctor_id).all()
+    if start_date is None and end_date is None:
+        return db.query(BlockedPeriod).filter(BlockedPeriod.doctor_id == doctor_id).all()
+
+    first_day, last_day = start_date or end_date, end_date or start_date
+    if last_day < first_day:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if (last_day - first_day).days >= MAX_BLOCKED_PERIOD_WINDOW_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {MAX_BLOCKED_PERIOD_WINDOW_DAYS} days")
+
+    # Days are local to the doctor's timezone
+    tz = get_timezone(doctor.timezone)
+    window_start, window_end = local_days_to_utc(first_day, last_day, tz)
+    periods = [
+        BlockedPeriodSchema.model_validate(period)
+        for period in db.query(BlockedPeriod).filter(
+            BlockedPeriod.doctor_id == doctor_id,
+            BlockedPeriod.start_time < window_end,
+            BlockedPeriod.end_time > window_start
+        )
+    ]
+    rules = db.query(RecurringBlockedPeriod).filter(
+        RecurringBlockedPeriod.doctor_id == doctor_id,
+        RecurringBlockedPeriod.starts_on <= last_day,
+        or_(RecurringBlockedPeriod.until.is_(None), RecurringBlockedPeriod.until >= first_day)
+    ).all()
+    for rule in rules:
+        for start, end in expand(rule, first_day, last_day, tz):
+            periods.append(BlockedPeriodSchema(
+                recurring_id=rule.id,
+                doctor_id=rule.doctor_id,
+                # Naive UTC, like stored blocked periods
+                start_time=start.replace(tzinfo=None),
+                end_time=end.replace(tzinfo=None),
+                reason=rule.reason,
+                created_at=rule.created_at,
+                updated_at=rule.updated_at,
+            ))
+    return sorted(periods, key=lambda period: period.start_time)
 
 @router.post("/doctors/{doctor_id}/blocked-periods", response_model=BlockedPeriodSchema)
 def create_blocked_period(
@@ -38,8 +93,7 @@ def create_blocked_period(
     """
     Create a blocked period for a doctor.
     """
-    doctor = db.query(Doctor).filter(Doctor.id == doctor_id, Doctor.user_id == current_user.id).first()
-    if not doctor:
+    if not get_owned_doctor(db, doctor_id, current_user.id):
         raise HTTPException(status_code=404, detail="Doctor not found")
         
     blocked_period = BlockedPeriod(
@@ -49,6 +103,7 @@ def create_blocked_period(
     db.add(blocked_period)
     db.commit()
     db.refresh(blocked_period)
+    from_thread.run(availability_cache.invalidate_range, blocked_period.doctor_id, blocked_period.start_time, blocked_period.end_time)
     return blocked_period
 
 @router.patch("/blocked-periods/{id}", response_model=BlockedPeriodSchema)
@@ -62,15 +117,12 @@ def update_blocked_period(
     """
     Update a blocked period.
     """
-    period = db.query(BlockedPeriod).filter(BlockedPeriod.id == id).first()
+    # Loaded first (scoped to the user's doctors) for the range it is moved from
+    period = get_owned(db, BlockedPeriod, id, current_user.id)
     if not period:
         raise HTTPException(status_code=404, detail="Blocked period not found")
         
-    # Verify ownership
-    doctor = db.query(Doctor).filter(Doctor.id == period.doctor_id, Doctor.user_id == current_user.id).first()
-    if not doctor:
-         raise HTTPException(status_code=404, detail="Doctor not found for this period")
-        
+    previous_range = (period.start_time, period.end_time)
     update_data = period_in.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(period, field, value)
@@ -78,6 +130,8 @@ def update_blocked_period(
     db.add(period)
     db.commit()
     db.refresh(period)
+    from_thread.run(availability_cache.invalidate_range, period.doctor_id, *previous_range)
+    from_thread.run(availability_cache.invalidate_range, period.doctor_id, period.start_time, period.end_time)
     return period
 
 @router.delete("/blocked-periods/{id}", response_model=BlockedPeriodSchema)
@@ -90,15 +144,104 @@ def delete_blocked_period(
     """
     Delete a blocked period.
     """
-    period = db.query(BlockedPeriod).filter(BlockedPeriod.id == id).first()
+    period = delete_owned(db, BlockedPeriod, id, current_user.id)
     if not period:
         raise HTTPException(status_code=404, detail="Blocked period not found")
-        
-    # Verify ownership
-    doctor = db.query(Doctor).filter(Doctor.id == period.doctor_id, Doctor.user_id == current_user.id).first()
-    if not doctor:
-         raise HTTPException(status_code=404, detail="Doctor not found for this period")
-        
-    db.delete(period)
     db.commit()
+    from_thread.run(availability_cache.invalidate_range, period.doctor_id, period.start_time, period.end_time)
     return period
+
+
+def _check_recurring_rule(rule) -> None:
+    if rule.repeat_interval is None or rule.repeat_interval < 1:
+        raise HTTPException(status_code=400, detail="repeat_interval must be at least 1")
+    if rule.end_time <= rule.start_time:
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
+    if rule.weekdays is not None and any(not 0 <= weekday <= 6 for weekday in rule.weekdays):
+        raise HTTPException(status_code=400, detail="weekdays must be between 0 and 6")
+    if rule.until is not None and rule.until < rule.starts_on:
+        raise HTTPException(status_code=400, detail="until must not be before starts_on")
+    if rule.count is not None and rule.count < 1:
+        raise HTTPException(status_code=400, detail="count must be at least 1")
+
+@router.get("/doctors/{doctor_id}/recurring-blocked-periods", response_model=List[RecurringBlockedPeriodSchema])
+def read_recurring_blocked_periods(
+    *,
+    db: Session = Depends(get_db),
+    doctor_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get the recurring blocked period rules of a doctor.
+    """
+    if not get_owned_doctor(db, doctor_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Doctor not found")
+
+    return db.query(RecurringBlockedPeriod).filter(RecurringBlockedPeriod.doctor_id == doctor_id).all()
+
+@router.post("/doctors/{doctor_id}/recurring-blocked-periods", response_model=RecurringBlockedPeriodSchema)
+def create_recurring_blocked_period(
+    *,
+    db: Session = Depends(get_db),
+    doctor_id: str,
+    rule_in: RecurringBlockedPeriodCreate,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Create a recurring blocked period (e.g. every Friday from 13:00 to 18:00) for a doctor.
+    """
+    _check_recurring_rule(rule_in)
+    if not get_owned_doctor(db, doctor_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Doctor not found")
+
+    rule = RecurringBlockedPeriod(
+        **rule_in.model_dump(),
+        doctor_id=doctor_id
+    )
+    db.add(rule)
+    db.commit()
+    db.refresh(rule)
+    from_thread.run(availability_cache.invalidate_doctor, rule.doctor_id)
+    return rule
+
+@router.patch("/recurring-blocked-periods/{id}", response_model=RecurringBlockedPeriodSchema)
+def update_recurring_blocked_period(
+    *,
+    db: Session = Depends(get_db),
+    id: str,
+    rule_in: RecurringBlockedPeriodUpdate,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Update a recurring blocked period.
+    """
+    rule = get_owned(db, RecurringBlockedPeriod, id, current_user.id)
+    if not rule:
+        raise HTTPException(status_code=404, detail="Recurring blocked period not found")
+
+    for field, value in rule_in.model_dump(exclude_unset=True).items():
+        setattr(rule, field, value)
+    _check_recurring_rule(rule)
+
+    db.add(rule)
+    db.commit()
+    db.refresh(rule)
+    from_thread.run(availability_cache.invalidate_doctor, rule.doctor_id)
+    return rule
+
+@router.delete("/recurring-blocked-periods/{id}", response_model=RecurringBlockedPeriodSchema)
+def delete_recurring_blocked_period(
+    *,
+    db: Session = Depends(get_db),
+    id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Delete a recurring blocked period and all its occurrences.
+    """
+    rule = delete_owned(db, RecurringBlockedPeriod, id, current_user.id)
+    if not rule:
+        raise HTTPException(status_code=404, detail="Recurring blocked period not found")
+    db.commit()
+    from_thread.run(availability_cache.invalidate_doctor, rule.doctor_id)
+    return rule
@@ -1,47 +1,100 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List, Any
-import requests
-from app.core.database import get_db
+import asyncio
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.core.database import get_async_db
 from app.models.user import User
 from app.models.bot import Bot
-from app.schemas.bot import Bot as BotSchema, BotCreate, BotUpdate, BotResponse
+from app.schemas.bot import Bot as BotSchema, BotCreate, BotUpdate, BotResponse, InstanceStatus, InstanceStatusListResponse
 from app.api.api_v1.endpoints.auth import get_current_user
+from app.api.pagination import paginate, set_next_cursor
+from app.api.api_v1.endpoints.webhooks import evolution_webhook_url
 from app.core.config import settings
+from app.services.bots import etag_matches, get_bot_payload, invalidate_bot_instance
+from app.services.evolution import EvolutionAPIError, evolution_client
+from app.api.responses import FastJSONRoute
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+
+BOT_ORDER = (Bot.created_at, Bot.id)
 
 @router.get("/", response_model=List[BotResponse])
-def read_bots(
-    db: Session = Depends(get_db),
+async def read_bots(
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_user)
 ):
     """
-    Retrieve bots.
+    Retrieve bots, oldest first.
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one.
     """
-    bots = db.query(Bot).filter(Bot.user_id == current_user.id).offset(skip).limit(limit).all()
+    query = select(Bot).where(Bot.user_id == current_user.id)
+    bots = (await db.scalars(paginate(query, BOT_ORDER, cursor=cursor, skip=skip, limit=limit))).all()
+    set_next_cursor(response, bots, BOT_ORDER, limit)
     return bots
 
+@router.get("/instances/status", response_model=InstanceStatusListResponse)
+async def get_instances_status(
+    *,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get the connection status of all the current user's bot instances.
+    Instances are queried concurrently; a failure is reported in that
+    instance's `error` instead of failing the whole request.
+    """
+    bots = (await db.scalars(select(Bot).where(Bot.user_id == current_user.id).order_by(*BOT_ORDER))).all()
+    semaphore = asyncio.Semaphore(settings.EVOLUTION_API_STATUS_CONCURRENCY)
+
+    async def fetch_status(bot: Bot) -> InstanceStatus:
+        item = InstanceStatus(bot_id=bot.id, instance_name=bot.instance_name)
+        if not bot.instance_name:
+            item.error = "Instance not created yet"
+            return item
+        async with semaphore:
+            try:
+                item.status = await asyncio.wait_for(
+                    evolution_client.get_instance_state(bot.instance_name),
+                    timeout=settings.EVOLUTION_API_STATUS_TIMEOUT,
+                )
+            except asyncio.TimeoutError:
+                item.error = "Timed out waiting for Evolution API"
+            except HTTPException as e:
+                item.error = e.detail
+        if item.status is None and item.error is None:
+            item.error = "Instance not found"
+        return item
+
+    return InstanceStatusListResponse(instances=await asyncio.gather(*(fetch_status(bot) for bot in bots)))
+
 @router.get("/by-instance", response_model=BotResponse)
-def get_bot_by_instance(
+async def get_bot_by_instance(
     *,
-    db: Session = Depends(get_db),
-    instance_name: str = Query(..., alias="instanceName")
+    db: AsyncSession = Depends(get_async_db),
+    instance_name: str = Query(..., alias="instanceName"),
+    if_none_match: Optional[str] = Header(None)
 ):
     """
     Get bot by instance name (public/service access).
+    Supports If-None-Match: an unchanged bot is answered with 304.
     """
-    bot = db.query(Bot).filter(Bot.instance_name == instance_name).first()
-    if not bot:
+    payload = await get_bot_payload(db, instance_name)
+    if payload is None:
         raise HTTPException(status_code=404, detail="Bot not found")
-    return bot
+    body, etag = payload
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 @router.post("/", response_model=BotResponse)
-def create_bot(
+async def create_bot(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     bot_in: BotCreate,
     current_user: User = Depends(get_current_user)
 ):
@@ -53,32 +106,33 @@ def create_bot(
         user_id=current_user.id
     )
     db.add(bot)
-    db.commit()
-    db.refresh(bot)
+    await db.commit()
+    await db.refresh(bot)
+    invalidate_bot_instance(bot.instance_name)
 
-    create_instance(db=db, bot_id=bot.id, current_user=current_user)
+    await create_instance(db=db, bot_id=bot.id, current_user=current_user)
 
     return bot
 
 @router.get("/{bot_id}", response_model=BotResponse)
-def read_bot(
+async def read_bot(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     bot_id: str,
     current_user: User = Depends(get_current_user)
 ):
     """
     Get bot by ID.
     """
-    bot = db.query(Bot).filter(Bot.id == bot_id, Bot.user_id == current_user.id).first()
+    bot = await db.scalar(select(Bot).where(Bot.id == bot_id, Bot.user_id == current_user.id))
     if not bot:
         raise HTTPException(status_code=404, detail="Bot not found")
     return bot
 
 @router.patch("/{bot_id}", response_model=BotResponse)
-def update_bot(
+async def update_bot(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     bot_id: str,
     bot_in: BotUpdate,
     current_user: User = Depends(get_current_user)
@@ -86,80 +140,56 @@ def update_bot(
     """
     Update a bot.
     """
-    bot = db.query(Bot).filter(Bot.id == bot_id, Bot.user_id == current_user.id).first()
+    bot = await db.scalar(select(Bot).where(Bot.id == bot_id, Bot.user_id == current_user.id))
     if not bot:
         raise HTTPException(status_code=404, detail="Bot not found")
     
+    previous_instance_name = bot.instance_name
     update_data = bot_in.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(bot, field, value)
     
     db.add(bot)
-    db.commit()
-    db.refresh(bot)
+    await db.commit()
+    await db.refresh(bot)
+    invalidate_bot_instance(previous_instance_name, bot.instance_name)
     return bot
 
 @router.delete("/{bot_id}", response_model=BotResponse)
-def delete_bot(
+async def delete_bot(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     bot_id: str,
     current_user: User = Depends(get_current_user)
 ):
     """
     Delete a bot.
     """
-    bot = db.query(Bot).filter(Bot.id == bot_id, Bot.user_id == current_user.id).first()
+    bot = await db.scalar(select(Bot).where(Bot.id == bot_id, Bot.user_id == current_user.id))
     if not bot:
         raise HTTPException(status_code=404, detail="Bot not found")
     
-    delete_instance(db=db, bot_id=bot.id, current_user=current_user)
+    instance_name = bot.instance_name
+    await delete_instance(db=db, bot_id=bot.id, current_user=current_user)
     # Hard delete for now, or use soft delete (enabled=False) if preferred
-    db.delete(bot)
-    db.commit()
+    await db.delete(bot)
+    await db.commit()
+    invalidate_bot_instance(instance_name)
     return bot
 
 # Instance Management Endpoints
 
-def _call_evolution_api(method: str, endpoint: str, json: Any = None):
-    url = f"{settings.EVOLUTION_API_URL}{endpoint}"
-    headers = {
-        "Content-Type": "application/json",
-        "apikey": settings.EVOLUTION_API_KEY
-    }
-    
-    try:
-        if method.upper() == "GET":
-            response = requests.get(url, headers=headers)
-        elif method.upper() == "POST":
-            response = requests.post(url, headers=headers, json=json)
-        elif method.upper() == "DELETE":
-            response = requests.delete(url, headers=headers)
-        else:
-            raise ValueError(f"Unsupported method: {method}")
-            
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        # Log error here if logging is set up
-        print(f"Error calling Evolution API: {e}")
-        if hasattr(e, 'response') and e.response is not None:
-             print(f"Evolution API Response: {e.response.text}")
-             if e.response.status_code == 404:
-                  return None # Or handle specific 404 cases
-        raise HTTPException(status_code=502, detail=f"Error communicating with Evolution API: {str(e)}")
-
 @router.post("/{bot_id}/instance", response_model=BotResponse)
-def create_instance(
+async def create_instance(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     bot_id: str,
     current_user: User = Depends(get_current_user)
 ):
     """
     Create an instance on the Evolution API matching this bot.
     """
-    bot = db.query(Bot).filter(Bot.id == bot_id, Bot.user_id == current_user.id).first()
+    bot = await db.scalar(select(Bot).where(Bot.id == bot_id, Bot.user_id == current_user.id))
     if not bot:
         raise HTTPException(status_code=404, detail="Bot not found")
     
@@ -173,7 +203,7 @@ def create_instance(
         "integration": "WHATSAPP-BAILEYS",
         "groupsIgnore": True,
         "webhook": {
-          "url": settings.N8N_WEBHOOK_URL, 
+          "url": evolution_webhook_url(),
           "byEvents": False,
           "base64": True,
           "events": ["MESSAGES_UPSERT"]
@@ -181,48 +211,49 @@ def create_instance(
     }
     
     try:
-        _call_evolution_api("POST", "/instance/create", json=payload)
-    except HTTPException as e:
+        await evolution_client.post("/instance/create", json=payload)
+    except EvolutionAPIError as e:
          # If instance already exists, we might want to just return the bot or check status
-         # For now, let's assume if it fails it might be because it exists or connection error
-         if "403" in str(e) or "422" in str(e): # Adjust based on Evolution API error for 'already exists'
+         # Evolution API answers 403/422 when the instance name is already taken
+         if e.upstream_status in (403, 422):
               pass
          else:
               raise e
 
     db.add(bot)
-    db.commit()
-    db.refresh(bot)
+    await db.commit()
+    await db.refresh(bot)
+    invalidate_bot_instance(bot.instance_name)
     return bot
 
 @router.get("/{bot_id}/instance/status")
-def get_instance_status(
+async def get_instance_status(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     bot_id: str,
     current_user: User = Depends(get_current_user)
 ):
     """
     Get the connection status of the bot's instance.
     """
-    bot = db.query(Bot).filter(Bot.id == bot_id, Bot.user_id == current_user.id).first()
+    bot = await db.scalar(select(Bot).where(Bot.id == bot_id, Bot.user_id == current_user.id))
     if not bot or not bot.instance_name:
         raise HTTPException(status_code=404, detail="Bot or instance not found")
 
-    result = _call_evolution_api("GET", f"/instance/connectionState/{bot.instance_name}")
+    result = await evolution_client.get_instance_state(bot.instance_name)
     return result
 
 @router.get("/{bot_id}/qrcode")
-def get_qrcode(
+async def get_qrcode(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     bot_id: str,
     current_user: User = Depends(get_current_user)
 ):
     """
     Get QR code for the bot's instance.
     """
-    bot = db.query(Bot).filter(Bot.id == bot_id, Bot.user_id == current_user.id).first()
+    bot = await db.scalar(select(Bot).where(Bot.id == bot_id, Bot.user_id == current_user.id))
     if not bot:
         raise HTTPException(status_code=404, detail="Bot not found")
         
@@ -230,44 +261,47 @@ def get_qrcode(
          # Optionally try to create it or just return error
          raise HTTPException(status_code=400, detail="Instance not created yet")
     
-    # Evolution API /instance/connect/{instance} returns the QR code (often base64 inside JSON)
-    result = _call_evolution_api("GET", f"/instance/connect/{bot.instance_name}")
+    result = await evolution_client.get_qrcode(bot.instance_name)
     return result
 
 @router.post("/{bot_id}/instance/restart")
-def restart_instance(
+async def restart_instance(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     bot_id: str,
     current_user: User = Depends(get_current_user)
 ):
     """
     Restart the bot's instance.
     """
-    bot = db.query(Bot).filter(Bot.id == bot_id, Bot.user_id == current_user.id).first()
+    bot = await db.scalar(select(Bot).where(Bot.id == bot_id, Bot.user_id == current_user.id))
     if not bot or not bot.instance_name:
          raise HTTPException(status_code=404, detail="Bot or instance not found")
          
-    result = _call_evolution_api("POST", f"/instance/restart/{bot.instance_name}")
+    result = await evolution_client.post(f"/instance/restart/{bot.instance_name}")
+    evolution_client.invalidate_instance(bot.instance_name)
     return result
 
 @router.delete("/{bot_id}/instance")
-def delete_instance(
+async def delete_instance(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     bot_id: str,
     current_user: User = Depends(get_current_user)
 ):
     """
     Delete the bot's instance from Evolution API.
     """
-    bot = db.query(Bot).filter(Bot.id == bot_id, Bot.user_id == current_user.id).first()
+    bot = await db.scalar(select(Bot).where(Bot.id == bot_id, Bot.user_id == current_user.id))
     if not bot or not bot.instance_name:
          raise HTTPException(status_code=404, detail="Bot or instance not found")
          
-    _call_evolution_api("DELETE", f"/instance/delete/{bot.instance_name}")
+    await evolution_client.delete(f"/instance/delete/{bot.instance_name}")
+    evolution_client.invalidate_instance(bot.instance_name)
     
+    instance_name = bot.instance_name
     bot.instance_name = None
     db.add(bot)
-    db.commit()
+    await db.commit()
+    invalidate_bot_instance(instance_name)
     return {"message": "Instance deleted"}
@@ -1,15 +1,20 @@
+import uuid
+from anyio import from_thread
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import delete, insert
 from sqlalchemy.orm import Session
 from typing import List
 from app.core.database import get_db
 from app.models.user import User
 from app.models.bot import Bot
-from app.models.doctor import Doctor
 from app.models.business_hour import BusinessHour
 from app.schemas.business_hour import BusinessHour as BusinessHourSchema, BusinessHourCreate, BusinessHourUpdate, BusinessHourResponse
 from app.api.api_v1.endpoints.auth import get_current_user
+from app.api.ownership import delete_owned, get_owned_doctor, update_owned
+from app.services.availability_cache import availability_cache
+from app.api.responses import FastJSONRoute
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 
 @router.get("/doctors/{doctor_id}/business-hours", response_model=List[BusinessHourResponse])
 def read_business_hours(
@@ -21,11 +26,9 @@ def read_business_hours(
     """
     Get business hours for a specific doctor.
     """
-    doctor = db.query(Doctor).filter(Doctor.id == doctor_id, Doctor.user_id == current_user.id).first()
-    if not doctor:
+    if not get_owned_doctor(db, doctor_id, current_user.id):
         raise HTTPException(status_code=404, detail="Doctor not found")
-        
-        
+
     return db.query(BusinessHour).filter(BusinessHour.doctor_id == doctor_id).all()
 
 @router.post("/doctors/{doctor_id}/business-hours", response_model=BusinessHourResponse)
@@ -39,8 +42,7 @@ def create_business_hour(
     """
     Create a business hour entry for a doctor.
     """
-    doctor = db.query(Doctor).filter(Doctor.id == doctor_id, Doctor.user_id == current_user.id).first()
-    if not doctor:
+    if not get_owned_doctor(db, doctor_id, current_user.id):
         raise HTTPException(status_code=404, detail="Doctor not found")
         
     business_hour = BusinessHour(
@@ -50,8 +52,60 @@ def create_business_hour(
     db.add(business_hour)
     db.commit()
     db.refresh(business_hour)
+    from_thread.run(availability_cache.invalidate_doctor, business_hour.doctor_id)
     return business_hour
 
+def _check_weekly_schedule(hours: List[BusinessHourCreate]) -> None:
+    by_weekday = {}
+    for hour in hours:
+        if not 0 <= hour.weekday <= 6:
+            raise HTTPException(status_code=400, detail="weekday must be between 0 and 6")
+        if hour.end_time <= hour.start_time:
+            raise HTTPException(status_code=400, detail="end_time must be after start_time")
+        by_weekday.setdefault(hour.weekday, []).append(hour)
+    for weekday, day_hours in by_weekday.items():
+        day_hours.sort(key=lambda hour: hour.start_time)
+        for previous, hour in zip(day_hours, day_hours[1:]):
+            if hour.start_time < previous.end_time:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Overlapping business hours on weekday {weekday}: "
+                           f"{previous.start_time}-{previous.end_time} and {hour.start_time}-{hour.end_time}",
+                )
+
+@router.put("/doctors/{doctor_id}/business-hours", response_model=List[BusinessHourResponse])
+def replace_business_hours(
+    *,
+    db: Session = Depends(get_db),
+    doctor_id: str,
+    hours_in: List[BusinessHourCreate],
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Replace a doctor's whole weekly schedule with the given business hours.
+    An empty list clears it.
+    """
+    _check_weekly_schedule(hours_in)
+    # Locked so concurrent replacements of the same schedule run one after the other
+    doctor = get_owned_doctor(db, doctor_id, current_user.id, for_update=True)
+    if not doctor:
+        raise HTTPException(status_code=404, detail="Doctor not found")
+
+    db.execute(delete(BusinessHour).where(BusinessHour.doctor_id == doctor.id))
+    hours = []
+    if hours_in:
+        # One multi-row INSERT ... RETURNING for the whole week
+        hours = db.scalars(
+            insert(BusinessHour)
+            .values([{**hour.model_dump(), "id": uuid.uuid4(), "doctor_id": doctor.id} for hour in hours_in])
+            .returning(BusinessHour)
+        ).all()
+    # Keep the returned rows loaded instead of reloading each one after commit
+    db.expunge_all()
+    db.commit()
+    from_thread.run(availability_cache.invalidate_doctor, doctor.id)
+    return sorted(hours, key=lambda hour: (hour.weekday, hour.start_time))
+
 @router.patch("/business-hours/{id}", response_model=BusinessHourResponse)
 def update_business_hour(
     *,
@@ -63,22 +117,12 @@ def update_business_hour(
     """
     Update a business hour entry.
     """
-    hour = db.query(BusinessHour).filter(BusinessHour.id == id).first()
+    # One statement: the row is only updated if its doctor belongs to the user
+    hour = update_owned(db, BusinessHour, id, current_user.id, hour_in.model_dump(exclude_unset=True))
     if not hour:
         raise HTTPException(status_code=404, detail="Business hour not found")
-        
-    # Verify ownership via doctor -> bot
-    doctor = db.query(Doctor).filter(Doctor.id == hour.doctor_id, Doctor.user_id == current_user.id).first()
-    if not doctor:
-         raise HTTPException(status_code=404, detail="Doctor not found for this business hour")
-        
-    update_data = hour_in.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(hour, field, value)
-        
-    db.add(hour)
     db.commit()
-    db.refresh(hour)
+    from_thread.run(availability_cache.invalidate_doctor, hour.doctor_id)
     return hour
 
 @router.delete("/business-hours/{id}", response_model=BusinessHourResponse)
@@ -91,15 +135,9 @@ def delete_business_hour(
     """
     Delete a business hour entry.
     """
-    hour = db.query(BusinessHour).filter(BusinessHour.id == id).first()
+    hour = delete_owned(db, BusinessHour, id, current_user.id)
     if not hour:
         raise HTTPException(status_code=404, detail="Business hour not found")
-        
-    # Verify ownership
-    doctor = db.query(Doctor).filter(Doctor.id == hour.doctor_id, Doctor.user_id == current_user.id).first()
-    if not doctor:
-         raise HTTPException(status_code=404, detail="Doctor not found for this business hour")
-        
-    db.delete(hour)
     db.commit()
+    from_thread.run(availability_cache.invalidate_doctor, hour.doctor_id)
     return hour
@@ -1,72 +1,208 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_async_db, is_unique_violation
+from app.core.phone import normalize_phone
 from app.models.user import User
 from app.models.contact import Contact
-from app.schemas.contact import Contact as ContactSchema, ContactCreate, ContactUpdate, ContactResponse
+from app.schemas.contact import Contact as ContactSchema, ContactCreate, ContactUpdate, ContactResponse, ContactImportResponse
 from app.api.api_v1.endpoints.auth import get_current_user
+from app.api.export import export_response
+from app.api.pagination import paginate, set_next_cursor
+from app.api.search import contains_pattern, phone_digits, search_page
+from app.services.contact_import import import_contacts, iter_csv_rows, iter_lines, iter_ndjson_rows
+from app.services.ingestion import message_ingestor
+from app.api.responses import FastJSONRoute
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+
+CONTACT_ORDER = (Contact.created_at, Contact.id)
 
 @router.get("/", response_model=List[ContactResponse])
-def read_contacts(
+async def read_contacts(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    response: Response,
+    q: Optional[str] = Query(None, min_length=1, max_length=100),
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_user)
 ):
     """
-    Retrieve contacts for the current user.
+    Retrieve contacts for the current user, oldest first.
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one.
+    With `q`, only contacts whose name or phone contains it, best matches
+    first, paged with `skip`.
+    """
+    query = select(Contact).where(Contact.user_id == current_user.id)
+    if q:
+        query, rank = search_contacts(query, q)
+        return (await db.scalars(search_page(query, rank, CONTACT_ORDER, cursor=cursor, skip=skip, limit=limit))).all()
+    contacts = (await db.scalars(paginate(query, CONTACT_ORDER, cursor=cursor, skip=skip, limit=limit))).all()
+    set_next_cursor(response, contacts, CONTACT_ORDER, limit)
+    return contacts
+
+def search_contacts(query, q: str):
+    """
+    Filter a contacts query to names or phones containing `q`; returns the query and its rank expression.
+    """
+    conditions = [Contact.name.ilike(contains_pattern(q))]
+    ranks = [func.similarity(Contact.name, q)]
+    digits = phone_digits(q)
+    if digits:
+        conditions.append(Contact.phone_e164.like(contains_pattern(digits)))
+        ranks.append(func.similarity(Contact.phone_e164, digits))
+    # greatest() skips NULLs, e.g. contacts without a name
+    return query.where(or_(*conditions)), func.greatest(*ranks)
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_contacts(
+    *,
+    q: Optional[str] = Query(None, min_length=1, max_length=100),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Export all contacts of the current user as NDJSON or CSV, oldest first.
+    `q` filters as in the listing.
+    """
+    query = select(Contact).where(Contact.user_id == current_user.id)
+    if q:
+        query, _ = search_contacts(query, q)
+    query = query.order_by(*CONTACT_ORDER)
+    return export_response(query, ContactResponse, format, "contacts")
+
+async def _commit_contact(db: AsyncSession) -> None:
+    # Only a duplicate (user_id, phone_e164) is a conflict; other integrity errors are bugs
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        if is_unique_violation(e, "uq_contacts_user_id_phone_e164"):
+            raise HTTPException(status_code=409, detail="A contact with this phone already exists")
+        raise
+
+@router.get("/by-phone", response_model=ContactResponse)
+async def read_contact_by_phone(
+    *,
+    db: AsyncSession = Depends(get_async_db),
+    phone: str = Query(...),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get a contact by phone number, in any format (normalized to E.164).
+    """
+    phone_e164 = normalize_phone(phone)
+    if not phone_e164:
+        raise HTTPException(status_code=400, detail="Invalid phone number")
+    contact = await db.scalar(select(Contact).where(Contact.user_id == current_user.id, Contact.phone_e164 == phone_e164))
+    if not contact:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    return contact
+
+@router.put("/upsert", response_model=ContactResponse)
+async def upsert_contact(
+    *,
+    db: AsyncSession = Depends(get_async_db),
+    contact_in: ContactCreate,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Create a contact, or return the existing one with the same phone number.
+    A given name replaces the stored one; the stored phone is kept as is.
     """
-    query = db.query(Contact).filter(Contact.user_id == current_user.id)
-    return query.offset(skip).limit(limit).all()
+    phone_e164 = normalize_phone(contact_in.phone)
+    if not phone_e164:
+        raise HTTPException(status_code=400, detail="Invalid phone number")
+    stmt = insert(Contact).values(
+        **contact_in.model_dump(),
+        user_id=current_user.id,
+        phone_e164=phone_e164,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Contact.user_id, Contact.phone_e164],
+        set_={"name": func.coalesce(stmt.excluded.name, Contact.name)},
+    ).returning(Contact)
+    contact = await db.scalar(stmt, execution_options={"populate_existing": True})
+    await db.commit()
+    return contact
 
 @router.post("/", response_model=ContactResponse)
-def create_contact(
+async def create_contact(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     contact_in: ContactCreate,
     current_user: User = Depends(get_current_user)
 ):
     """
     Create a contact for the current user.
     """
-    # Check if contact already exists for this user? Optional, but good practice.
-    # contact = Contact(
-    #     **contact_in.model_dump(),
-    #     user_id=current_user.id
-    # )
-    
+    # Phone numbers are unique per user; PUT /contacts/upsert is the idempotent variant
     contact = Contact(
         **contact_in.model_dump(),
-        user_id=current_user.id
+        user_id=current_user.id,
+        phone_e164=normalize_phone(contact_in.phone)
     )
     db.add(contact)
-    db.commit()
-    db.refresh(contact)
+    await _commit_contact(db)
+    await db.refresh(contact)
     return contact
 
+@router.post("/import", response_model=ContactImportResponse)
+async def import_contacts_file(
+    *,
+    db: AsyncSession = Depends(get_async_db),
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Import contacts from a CSV or NDJSON request body, read as it streams in.
+    The format is `format`, or else taken from the Content-Type header.
+    Invalid rows are skipped and reported; the rest are imported in one transaction.
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "ndjson" if "ndjson" in content_type or "jsonl" in content_type else "csv"
+    lines = iter_lines(request.stream())
+    rows = iter_csv_rows(lines) if format == "csv" else iter_ndjson_rows(lines)
+    try:
+        return await import_contacts(
+            db,
+            current_user.id,
+            rows,
+            batch_size=settings.CONTACT_IMPORT_BATCH_SIZE,
+            max_errors=settings.CONTACT_IMPORT_MAX_ERRORS,
+        )
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/{contact_id}", response_model=ContactResponse)
-def read_contact(
+async def read_contact(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     contact_id: str,
     current_user: User = Depends(get_current_user)
 ):
     """
     Get contact by ID.
     """
-    contact = db.query(Contact).filter(Contact.id == contact_id, Contact.user_id == current_user.id).first()
+    contact = await db.scalar(select(Contact).where(Contact.id == contact_id, Contact.user_id == current_user.id))
     if not contact:
         raise HTTPException(status_code=404, detail="Contact not found")
     return contact
 
 @router.patch("/{contact_id}", response_model=ContactResponse)
-def update_contact(
+async def update_contact(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     contact_id: str,
     contact_in: ContactUpdate,
     current_user: User = Depends(get_current_user)
@@ -74,33 +210,39 @@ def update_contact(
     """
     Update a contact.
     """
-    contact = db.query(Contact).filter(Contact.id == contact_id, Contact.user_id == current_user.id).first()
+    contact = await db.scalar(select(Contact).where(Contact.id == contact_id, Contact.user_id == current_user.id))
     if not contact:
         raise HTTPException(status_code=404, detail="Contact not found")
         
+    previous_phone_e164 = contact.phone_e164
     update_data = contact_in.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(contact, field, value)
+    if "phone" in update_data:
+        contact.phone_e164 = normalize_phone(contact.phone)
         
     db.add(contact)
-    db.commit()
-    db.refresh(contact)
+    await _commit_contact(db)
+    if contact.phone_e164 != previous_phone_e164:
+        message_ingestor.invalidate_contact(current_user.id, previous_phone_e164, contact.phone_e164)
+    await db.refresh(contact)
     return contact
 
 @router.delete("/{contact_id}", response_model=ContactResponse)
-def delete_contact(
+async def delete_contact(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     contact_id: str,
     current_user: User = Depends(get_current_user)
 ):
     """
     Delete a contact.
     """
-    contact = db.query(Contact).filter(Contact.id == contact_id, Contact.user_id == current_user.id).first()
+    contact = await db.scalar(select(Contact).where(Contact.id == contact_id, Contact.user_id == current_user.id))
     if not contact:
         raise HTTPException(status_code=404, detail="Contact not found")
         
-    db.delete(contact)
-    db.commit()
+    await db.delete(contact)
+    await db.commit()
+    message_ingestor.invalidate_contact(current_user.id, contact.phone_e164)
     return contact
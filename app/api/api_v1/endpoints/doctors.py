@@ -1,32 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app.core.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.core.database import get_async_db
 from app.models.user import User
 from app.models.doctor import Doctor
 from app.schemas.doctor import DoctorCreate, DoctorResponse
 from app.api.api_v1.endpoints.auth import get_current_user
+from app.api.pagination import paginate, set_next_cursor
+from app.api.responses import FastJSONRoute
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+
+DOCTOR_ORDER = (Doctor.created_at, Doctor.id)
 
 @router.get("/", response_model=List[DoctorResponse])
-def read_doctors(
+async def read_doctors(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    response: Response,
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_user)
 ):
     """
-    Retrieve doctors for the current user.
+    Retrieve doctors for the current user, oldest first.
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one.
     """
-    query = db.query(Doctor).filter(Doctor.user_id == current_user.id)
-    return query.offset(skip).limit(limit).all()
+    query = select(Doctor).where(Doctor.user_id == current_user.id)
+    doctors = (await db.scalars(paginate(query, DOCTOR_ORDER, cursor=cursor, skip=skip, limit=limit))).all()
+    set_next_cursor(response, doctors, DOCTOR_ORDER, limit)
+    return doctors
 
 @router.post("/", response_model=DoctorResponse)
-def create_doctor(
+async def create_doctor(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     doctor_in: DoctorCreate,
     current_user: User = Depends(get_current_user)
 ):
@@ -38,14 +48,14 @@ def create_doctor(
         user_id=current_user.id
     )
     db.add(doctor)
-    db.commit()
-    db.refresh(doctor)
+    await db.commit()
+    await db.refresh(doctor)
     return doctor
 
 @router.put("/{doctor_id}", response_model=DoctorResponse)
-def update_doctor(
+async def update_doctor(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     doctor_id: str,
     doctor_in: DoctorCreate,
     current_user: User = Depends(get_current_user)
@@ -53,7 +63,7 @@ def update_doctor(
     """
     Update a doctor.
     """
-    doctor = db.query(Doctor).filter(Doctor.id == doctor_id).filter(Doctor.user_id == current_user.id).first()
+    doctor = await db.scalar(select(Doctor).where(Doctor.id == doctor_id, Doctor.user_id == current_user.id))
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
         
@@ -62,24 +72,24 @@ def update_doctor(
         setattr(doctor, field, value)
     
     db.add(doctor)
-    db.commit()
-    db.refresh(doctor)
+    await db.commit()
+    await db.refresh(doctor)
     return doctor
 
 @router.delete("/{doctor_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_doctor(
+async def delete_doctor(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     doctor_id: str,
     current_user: User = Depends(get_current_user)
 ):
     """
     Delete a doctor.
     """
-    doctor = db.query(Doctor).filter(Doctor.id == doctor_id).filter(Doctor.user_id == current_user.id).first()
+    doctor = await db.scalar(select(Doctor).where(Doctor.id == doctor_id, Doctor.user_id == current_user.id))
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
         
-    db.delete(doctor)
-    db.commit()
+    await db.delete(doctor)
+    await db.commit()
     return None
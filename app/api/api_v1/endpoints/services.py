@@ -1,37 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.core.database import get_db
 from app.models.user import User
-from app.models.doctor import Doctor
 from app.models.service import Service
 from app.schemas.service import ServiceCreate, ServiceResponse
 from app.api.api_v1.endpoints.auth import get_current_user
+from app.api.ownership import delete_owned, get_owned_doctor, update_owned
+from app.api.pagination import paginate, set_next_cursor
+from app.api.responses import FastJSONRoute
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+
+SERVICE_ORDER = (Service.created_at, Service.id)
 
 @router.get("/doctors/{doctor_id}/services", response_model=List[ServiceResponse])
 def read_services(
     *,
     db: Session = Depends(get_db),
+    response: Response,
     doctor_id: str,
+    cursor: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_user)
 ):
     """
-    Retrieve services for a specific doctor.
+    Retrieve services for a specific doctor, oldest first.
+    Pass the X-Next-Cursor header of a page as `cursor` to get the next one.
     """
-    doctor = db.query(Doctor).filter(Doctor.id == doctor_id).first()
-    if not doctor:
+    if not get_owned_doctor(db, doctor_id, current_user.id):
         raise HTTPException(status_code=404, detail="Doctor not found")
 
-    # Verify ownership
-    if doctor.user_id != current_user.id:
-         raise HTTPException(status_code=404, detail="Doctor not found or not authorized")
-
-    query = db.query(Service).filter(Service.doctor_id == doctor_id)
-    return query.offset(skip).limit(limit).all()
+    query = select(Service).where(Service.doctor_id == doctor_id)
+    services = db.scalars(paginate(query, SERVICE_ORDER, cursor=cursor, skip=skip, limit=limit)).all()
+    set_next_cursor(response, services, SERVICE_ORDER, limit)
+    return services
 
 @router.post("/doctors/{doctor_id}/services", response_model=ServiceResponse)
 def create_service(
@@ -44,14 +49,9 @@ def create_service(
     """
     Create a new service for a doctor.
     """
-    doctor = db.query(Doctor).filter(Doctor.id == doctor_id).first()
-    if not doctor:
+    if not get_owned_doctor(db, doctor_id, current_user.id):
         raise HTTPException(status_code=404, detail="Doctor not found")
         
-    # Verify ownership
-    if doctor.user_id != current_user.id:
-         raise HTTPException(status_code=404, detail="Doctor not found or not authorized")
-        
     service = Service(
         **service_in.model_dump(),
         doctor_id=doctor_id,
@@ -73,22 +73,11 @@ def update_service(
     """
     Update a service.
     """
-    service = db.query(Service).filter(Service.id == service_id).first()
+    # One statement: the row is only updated if its doctor belongs to the user
+    service = update_owned(db, Service, service_id, current_user.id, service_in.model_dump(exclude_unset=True))
     if not service:
         raise HTTPException(status_code=404, detail="Service not found")
-        
-    # Verify ownership through doctor -> user
-    doctor = db.query(Doctor).filter(Doctor.id == service.doctor_id).first()
-    if not doctor or doctor.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to update this service")
-    
-    update_data = service_in.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(service, field, value)
-    
-    db.add(service)
     db.commit()
-    db.refresh(service)
     return service
 
 @router.delete("/services/{service_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -101,15 +90,7 @@ def delete_service(
     """
     Delete a service.
     """
-    service = db.query(Service).filter(Service.id == service_id).first()
-    if not service:
+    if not delete_owned(db, Service, service_id, current_user.id):
         raise HTTPException(status_code=404, detail="Service not found")
-        
-    # Verify ownership through doctor -> user
-    doctor = db.query(Doctor).filter(Doctor.id == service.doctor_id).first()
-    if not doctor or doctor.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this service")
-    
-    db.delete(service)
     db.commit()
     return None
@@ -0,0 +1,86 @@
+import hmac
+import uuid
+from datetime import datetime
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, Optional
+from app.core.config import settings
+from app.core.database import get_async_db
+from app.services.bots import get_bot_snapshot
+from app.services.ingestion import message_ingestor, parse_messages_upsert
+from app.api.responses import FastJSONRoute
+
+router = APIRouter(route_class=FastJSONRoute)
+
+
+def evolution_webhook_url() -> str:
+    """
+    URL new Evolution API instances deliver their webhooks to: this API when
+    PUBLIC_API_URL is set, otherwise n8n directly.
+    """
+    if not settings.PUBLIC_API_URL:
+        return settings.N8N_WEBHOOK_URL
+    url = f"{settings.PUBLIC_API_URL.rstrip('/')}{settings.API_V1_PREFIX}/webhooks/evolution"
+    if settings.WEBHOOK_SECRET:
+        url += f"?token={settings.WEBHOOK_SECRET}"
+    return url
+
+
+@router.post("/evolution")
+async def receive_evolution_webhook(
+    *,
+    db: AsyncSession = Depends(get_async_db),
+    background_tasks: BackgroundTasks,
+    payload: Dict[str, Any] = Body(...),
+    token: Optional[str] = Query(None)
+):
+    """
+    Receive Evolution API webhook events (service access).
+
+    MESSAGES_UPSERT events are stored in batches and forwarded to n8n with the
+    bot and contact attached, so the workflow does not need to look them up.
+    Other events and unknown instances are acknowledged and ignored.
+    """
+    if settings.WEBHOOK_SECRET and not hmac.compare_digest(token or "", settings.WEBHOOK_SECRET):
+        raise HTTPException(status_code=401, detail="Invalid webhook token")
+
+    event = str(payload.get("event") or "").lower().replace("_", ".")
+    if event != "messages.upsert":
+        return {"status": "ignored"}
+
+    instance_name = payload.get("instance")
+    bot = await get_bot_snapshot(db, instance_name) if isinstance(instance_name, str) else None
+    if not bot:
+        return {"status": "ignored"}
+
+    user_id = uuid.UUID(bot["user_id"])
+    contacts = []
+    messages = parse_messages_upsert(payload)
+    for message in messages:
+        contact = await message_ingestor.resolve_contact(
+            db, user_id, message["phone"], message["phone_e164"], message["push_name"]
+        )
+        contacts.append({"id": str(contact["id"]), "phone": contact["phone"], "name": contact["name"]})
+        await message_ingestor.submit_message({
+            "id": uuid.uuid4(),
+            "user_id": user_id,
+            "bot_id": uuid.UUID(bot["id"]),
+            "contact_id": contact["id"],
+            "external_id": message["external_id"],
+            "remote_jid": message["remote_jid"],
+            "from_me": message["from_me"],
+            "message_type": message["message_type"],
+            "text": message["text"],
+            "payload": message["payload"],
+            "sent_at": message["sent_at"],
+            "created_at": datetime.utcnow(),
+        })
+
+    if messages:
+        background_tasks.add_task(message_ingestor.forward, {
+            **payload,
+            "bot": bot,
+            "contact": contacts[0] if len(contacts) == 1 else None,
+            "contacts": contacts,
+        })
+    return {"status": "accepted", "messages": len(messages)}
@@ -1,21 +1,21 @@
 from fastapi import Depends, HTTPException, status, Header
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.security import verify_firebase_token
 from app.models.user import User as UserModel
-from app.schemas.user import UserCreate
+from app.services.users import resolve_user
 
 
 async def get_current_user(
     authorization: Optional[str] = Header(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> UserModel:
     """
     Dependency to get the current authenticated user.
     
     1. Verifies Firebase token from Authorization header
-    2. Fetches or creates user in PostgreSQL
+    2. Fetches or creates user in PostgreSQL (cached after the first request)
     3. Returns user object
     """
 
@@ -28,10 +28,6 @@ async def get_current_user(
     # Verify Firebase token
     decoded_token = await verify_firebase_token(authorization)
     firebase_uid = decoded_token.get("uid")
-    email = decoded_token.get("email")
-    name = decoded_token.get("name")
-    
-    # print(f"good! {firebase_uid}, {email}, {name}")
 
     if not firebase_uid:
         raise HTTPException(
@@ -39,21 +35,8 @@ async def get_current_user(
             detail="Invalid token: missing uid"
         )
     
-    # Check if user exists in database
-    user = db.query(UserModel).filter(UserModel.firebase_uid == firebase_uid).first()
-
-    # Create user if doesn't exist
-    if not user:
-        user = UserModel(
-            firebase_uid=firebase_uid,
-            email=email,
-            name=name
-        )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-    
-    return user
+    # Fetch or create user (cached per firebase_uid)
+    return await resolve_user(db, decoded_token)
 
 
 def get_current_active_user(
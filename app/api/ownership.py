@@ -0,0 +1,71 @@
+"""
+Ownership-scoped statements for resources nested under a doctor
+(services, business hours, blocked periods).
+
+A child row belongs to the current user when its doctor does, so every
+statement here filters on `doctor_id IN (SELECT id FROM doctors WHERE
+user_id = :uid)`. Loading, updating or deleting an owned row is then one
+statement instead of a lookup of the row followed by a lookup of its doctor.
+Rows of other users are indistinguishable from missing ones (None, so 404).
+"""
+from typing import Optional
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+from app.models.doctor import Doctor
+
+
+def _detach(db: Session, row):
+    # RETURNING loaded every column; detached, the row keeps them past the
+    # commit instead of being reloaded (or failing to, once deleted)
+    if row is not None:
+        db.expunge(row)
+    return row
+
+
+def owned_doctor_ids(user_id):
+    return select(Doctor.id).where(Doctor.user_id == user_id)
+
+
+def get_owned_doctor(db: Session, doctor_id, user_id, for_update: bool = False) -> Optional[Doctor]:
+    """
+    The user's doctor, or None. `for_update` locks its row until the transaction ends.
+    """
+    query = select(Doctor).where(Doctor.id == doctor_id, Doctor.user_id == user_id)
+    if for_update:
+        query = query.with_for_update()
+    return db.scalar(query)
+
+
+def owned_by(model, user_id):
+    """
+    WHERE clause limiting `model` (which has a doctor_id) to rows of `user_id`.
+    """
+    return model.doctor_id.in_(owned_doctor_ids(user_id))
+
+
+def get_owned(db: Session, model, id, user_id):
+    return db.scalar(select(model).where(model.id == id, owned_by(model, user_id)))
+
+
+def update_owned(db: Session, model, id, user_id, values: dict):
+    """
+    UPDATE an owned row and return it (RETURNING), or None if it is not the user's.
+    """
+    if not values:
+        return get_owned(db, model, id, user_id)
+    row = db.scalar(
+        update(model).where(model.id == id, owned_by(model, user_id)).values(**values).returning(model),
+        execution_options={"synchronize_session": False, "populate_existing": True},
+    )
+    return _detach(db, row)
+
+
+def delete_owned(db: Session, model, id, user_id):
+    """
+    DELETE an owned row and return it as it was (RETURNING), or None if it is not the user's.
+    """
+    row = db.scalar(
+        delete(model).where(model.id == id, owned_by(model, user_id)).returning(model),
+        execution_options={"synchronize_session": False},
+    )
+    return _detach(db, row)
@@ -0,0 +1,69 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+A cursor is the sort key of the last row of a page, encoded as opaque
+base64. The next page is read with a row comparison on the sort key, so
+any page costs one index range scan no matter how deep it is, and rows
+inserted meanwhile cannot shift or repeat results.
+
+List endpoints keep `skip`/`limit` for backward compatibility. Both modes
+are ordered by the same key, and a full page always carries the cursor of
+the next one in the X-Next-Cursor response header.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence
+from fastapi import HTTPException, Response
+from sqlalchemy import Select, tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _decode_value(column, value):
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(row, order_by: Sequence) -> str:
+    values = [_encode_value(getattr(row, column.key)) for column in order_by]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order_by: Sequence) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(order_by):
+            raise ValueError("cursor does not match the sort key")
+        return tuple(_decode_value(column, value) for column, value in zip(order_by, values))
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+
+def paginate(query: Select, order_by: Sequence, *, cursor: Optional[str] = None, skip: int = 0, limit: int = 100) -> Select:
+    """
+    Order `query` by `order_by` (unique, e.g. ending with the primary key) and
+    select one page: the rows after `cursor` if given, otherwise `skip` rows in.
+    """
+    if cursor:
+        query = query.where(tuple_(*order_by) > decode_cursor(cursor, order_by))
+    elif skip:
+        query = query.offset(skip)
+    return query.order_by(*order_by).limit(limit)
+
+
+def set_next_cursor(response: Response, items: Sequence, order_by: Sequence, limit: int) -> None:
+    """
+    Expose the cursor of the next page when this page is full.
+    """
+    if limit > 0 and len(items) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(items[-1], order_by)
@@ -0,0 +1,111 @@
+"""
+Fast JSON responses (opt-in with FAST_JSON_RESPONSES).
+
+For an endpoint with a `response_model`, FastAPI validates the returned ORM
+objects into models, dumps those to JSON-compatible Python objects (every
+UUID and datetime becomes a string, in Python) and the default JSONResponse
+encodes the result once more with the stdlib `json` module. For lists of a
+hundred appointments or contacts that is most of the CPU of a request.
+
+With the setting on, FastJSONResponse is the app's default response class
+and the endpoint routers use FastJSONRoute. Such routes validate the return
+value against the response model once and render it straight to bytes:
+orjson encodes the plain model dump (it handles UUIDs and datetimes itself)
+when it is installed, else pydantic-core's dump_json does. Responses without
+a response model are rendered with the same encoders. The OpenAPI schema,
+status codes and headers set on the injected Response are unchanged.
+
+The JSON is equivalent to the default one; only floats may use another
+exponent notation (1e20 instead of 1e+20).
+"""
+import asyncio
+import copy
+from typing import Any
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.exceptions import ResponseValidationError
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute, get_request_handler
+from pydantic import TypeAdapter, ValidationError
+from pydantic_core import to_json, to_jsonable_python
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+class _RenderedJSON(str):
+    # An encoded body; FastAPI passes str content to the response class untouched
+    pass
+
+
+def _dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, default=to_jsonable_python, option=orjson.OPT_UTC_Z)
+    return to_json(value)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, _RenderedJSON):
+            return content.encode("utf-8")
+        return _dumps(content)
+
+
+class FastJSONRoute(APIRoute):
+    """
+    Route whose return value is validated once against its response model
+    and rendered straight to JSON, when its response class is FastJSONResponse.
+    Other routes (and response_model_include/exclude options) keep FastAPI's path.
+    """
+
+    def get_route_handler(self):
+        response_class = self.response_class
+        if isinstance(response_class, DefaultPlaceholder):
+            response_class = response_class.value
+        if (
+            self.response_field is None
+            or not issubclass(response_class, FastJSONResponse)
+            or not self.response_model_by_alias
+            or self.response_model_include is not None
+            or self.response_model_exclude is not None
+            or self.response_model_exclude_unset
+            or self.response_model_exclude_defaults
+            or self.response_model_exclude_none
+        ):
+            return super().get_route_handler()
+
+        adapter = TypeAdapter(self.response_model)
+
+        def render(content: Any) -> Any:
+            if isinstance(content, Response):
+                return content
+            try:
+                value = adapter.validate_python(content, from_attributes=True)
+            except ValidationError as e:
+                raise ResponseValidationError(errors=e.errors(), body=content)
+            if orjson is not None:
+                body = _dumps(adapter.dump_python(value, by_alias=True))
+            else:
+                body = adapter.dump_json(value, by_alias=True)
+            return _RenderedJSON(body.decode("utf-8"))
+
+        endpoint = self.dependant.call
+        if asyncio.iscoroutinefunction(endpoint):
+            async def call(**values):
+                return render(await endpoint(**values))
+        else:
+            def call(**values):
+                return render(endpoint(**values))
+
+        dependant = copy.copy(self.dependant)
+        dependant.call = call
+        # Without a response field FastAPI hands the rendered body to the response class as is
+        return get_request_handler(
+            dependant=dependant,
+            body_field=self.body_field,
+            status_code=self.status_code,
+            response_class=self.response_class,
+            response_field=None,
+            dependency_overrides_provider=self.dependency_overrides_provider,
+        )
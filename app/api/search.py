@@ -0,0 +1,42 @@
+"""
+Substring search (`?q=`) for list endpoints.
+
+Matching uses ILIKE '%q%', which the pg_trgm GIN indexes serve for terms of
+three characters or more; shorter terms still work but scan the owner's rows.
+Matches are ranked by trigram similarity() to the term, best first.
+
+Rank is not a stable sort key between requests, so search results are paged
+with `skip`/`limit` rather than cursors.
+"""
+import re
+from fastapi import HTTPException
+from sqlalchemy import Select
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def contains_pattern(term: str) -> str:
+    """
+    ILIKE pattern matching `term` anywhere, with its wildcards escaped.
+    """
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def phone_digits(term: str) -> str:
+    """
+    The digits of `term` when it looks like a (partial) phone number, otherwise "".
+    """
+    digits = _NON_DIGITS.sub("", term)
+    if len(digits) < 3 or re.search(r"[^\d\s()+\-.]", term):
+        return ""
+    return digits
+
+
+def search_page(query: Select, rank, order_by, *, cursor=None, skip: int = 0, limit: int = 100) -> Select:
+    """
+    Order `query` by `rank`, best first (ties by `order_by`), and select one page.
+    """
+    if cursor:
+        raise HTTPException(status_code=400, detail="cursor cannot be combined with q; use skip")
+    return query.order_by(rank.desc(), *order_by).offset(skip).limit(limit)
@@ -0,0 +1,193 @@
+"""
+Small caches shared by the API.
+
+TTLCache and InMemoryBackend are process-local: each uvicorn worker keeps its
+own copy, so entries must always be safe to serve slightly stale or to lose.
+RedisBackend offers the same async interface as InMemoryBackend for caches
+that should be shared between workers.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after a TTL.
+
+    Each entry can carry its own expiry (for example a token's `exp` claim);
+    it is capped by the cache-wide `ttl`. When `maxsize` is reached the least
+    recently used entry is evicted.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Store a value. `ttl` shortens the lifetime of this entry only;
+        it never extends it past the cache-wide TTL.
+        """
+        lifetime = self.ttl if ttl is None else min(ttl, self.ttl)
+        if lifetime <= 0:
+            return
+        expires_at = time.monotonic() + lifetime
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        return entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+class InMemoryBackend:
+    """
+    Async key/value backend over a TTLCache, the default for shared caches.
+    Values are stored as given; callers keep them JSON-compatible so the
+    Redis backend can be swapped in.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 86400.0):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str) -> Any:
+        return self._cache.get(key)
+
+    async def get_many(self, keys: list) -> list:
+        return [self._cache.get(key) for key in keys]
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._cache.set(key, value, ttl=ttl)
+
+    async def add(self, key: str, value: Any, ttl: float) -> bool:
+        # No await between the check and the write, so this is atomic on the event loop
+        if self._cache.get(key) is not None:
+            return False
+        self._cache.set(key, value, ttl=ttl)
+        return True
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._cache.pop(key)
+
+
+class RedisBackend:
+    """
+    Async key/value backend over a `redis.asyncio.Redis`-compatible client
+    (get, mget, set with ex/nx, delete). Values are JSON-encoded.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBackend":
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("The redis package is required for the redis cache backend") from e
+        return cls(redis.from_url(url))
+
+    async def get(self, key: str) -> Any:
+        raw = await self._client.get(key)
+        return None if raw is None else json.loads(raw)
+
+    async def get_many(self, keys: list) -> list:
+        if not keys:
+            return []
+        return [None if raw is None else json.loads(raw) for raw in await self._client.mget(keys)]
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self._client.set(key, json.dumps(value), ex=max(1, int(ttl)))
+
+    async def add(self, key: str, value: Any, ttl: float) -> bool:
+        return bool(await self._client.set(key, json.dumps(value), ex=max(1, int(ttl)), nx=True))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._client.delete(*keys)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one.
+
+    The first caller for a key starts the call; callers arriving while it
+    runs await the same result (or exception). Waiters are shielded, so one
+    cancelled request does not cancel the call for the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {"inflight": len(self._inflight), "calls": self.calls, "coalesced": self.coalesced}
@@ -5,6 +5,12 @@ from typing import Optional
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
+    DB_POOL_MODE: str = "null"  # "null" behind an external transaction-mode pooler, "queue" for direct Postgres
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds before a pooled connection is replaced
+    DB_POOL_PRE_PING: bool = True
     
     # Firebase
     FIREBASE_PROJECT_ID: str
@@ -13,15 +19,69 @@ class Settings(BaseSettings):
     FIREBASE_SERVICE_ACCOUNT: str
     # n8n
     N8N_WEBHOOK_URL: str
+    N8N_FORWARD_TIMEOUT: float = 10.0  # seconds to forward an inbound message to n8n
+    
+    # Inbound messages (Evolution API webhooks)
+    PUBLIC_API_URL: Optional[str] = None  # when set, new instances send webhooks here instead of to n8n
+    WEBHOOK_SECRET: Optional[str] = None  # required as ?token= on webhook calls when set
+    INGEST_BATCH_SIZE: int = 500  # rows per write batch
+    INGEST_FLUSH_INTERVAL: float = 0.5  # seconds before a partial batch is written
+    INGEST_QUEUE_MAXSIZE: int = 10000  # webhook calls wait when this many rows are pending
+    INGEST_RETRY_ATTEMPTS: int = 3  # retries of a write failing with a transient error
+    INGEST_RETRY_BACKOFF: float = 0.5  # seconds before the first retry, doubled on each one
+    INGEST_DEAD_LETTER_PATH: Optional[str] = "ingest_dead_letters.ndjson"  # rows that could not be written
+    CONTACT_INDEX_MAXSIZE: int = 100000
+    CONTACT_INDEX_TTL: int = 3600  # seconds
+    
+    # Contacts
+    DEFAULT_PHONE_COUNTRY_CODE: str = "55"  # prepended to phone numbers without one
+    CONTACT_IMPORT_BATCH_SIZE: int = 5000  # rows per COPY into the import staging table
+    CONTACT_IMPORT_MAX_ERRORS: int = 1000  # row errors listed in an import report
     
     # API Settings
     API_V1_PREFIX: str = "/api/v1"
     PROJECT_NAME: str = "n8n Bot Hub Backend"
     DEBUG: bool = False
+    EXPORT_BATCH_SIZE: int = 1000  # rows fetched per round-trip by /export endpoints
+    FAST_JSON_RESPONSES: bool = False  # render responses with orjson/pydantic-core instead of the stdlib json
+    METRICS_TOKEN: Optional[str] = None  # required as "Authorization: Bearer <token>" on GET /metrics, which is disabled when unset
+    
+    # Auth caching
+    TOKEN_CACHE_MAXSIZE: int = 4096
+    TOKEN_CACHE_TTL: int = 300  # seconds; entries never outlive the token's exp claim
+    USER_CACHE_MAXSIZE: int = 10000
+    USER_CACHE_TTL: int = 600  # seconds
+    
+    # Bot lookups by instance name (called by n8n on every message)
+    BOT_INSTANCE_CACHE_MAXSIZE: int = 10000
+    BOT_INSTANCE_CACHE_TTL: int = 30  # seconds; bounds staleness in other workers
+    
+    # Appointments
+    APPOINTMENT_BATCH_MAX_OPERATIONS: int = 200  # operations per POST /appointments/batch
+    
+    # Availability caching
+    AVAILABILITY_CACHE_BACKEND: str = "memory"  # "memory" or "redis"
+    AVAILABILITY_CACHE_REDIS_URL: Optional[str] = None
+    AVAILABILITY_CACHE_TTL: int = 300  # seconds
+    AVAILABILITY_CACHE_MAXSIZE: int = 20000
+    RECURRENCE_CACHE_MAXSIZE: int = 10000  # expansions of recurring blocked periods, per (rule, window)
+    RECURRENCE_CACHE_TTL: int = 3600  # seconds
+    DEFAULT_TIMEZONE: str = "America/Sao_Paulo"  # when neither the doctor nor the bot sets one
     
     # Evolution API
     EVOLUTION_API_URL: str
     EVOLUTION_API_KEY: str
+    EVOLUTION_API_TIMEOUT: float = 10.0  # seconds per call
+    EVOLUTION_API_CONNECT_TIMEOUT: float = 5.0
+    EVOLUTION_API_MAX_CONNECTIONS: int = 50
+    EVOLUTION_API_MAX_KEEPALIVE: int = 20
+    EVOLUTION_API_RETRIES: int = 2  # extra attempts for idempotent calls
+    EVOLUTION_API_RETRY_BACKOFF: float = 0.2  # seconds, doubled per attempt
+    EVOLUTION_API_BREAKER_THRESHOLD: int = 5  # consecutive failures before the circuit opens
+    EVOLUTION_API_BREAKER_RESET: float = 30.0  # seconds before a trial call is allowed
+    EVOLUTION_API_STATUS_CONCURRENCY: int = 10  # parallel calls per bulk status request
+    EVOLUTION_API_STATUS_TIMEOUT: float = 5.0  # seconds per instance in a bulk status request
+    EVOLUTION_API_STATE_CACHE_TTL: float = 2.0  # seconds connection states and QR codes are reused
     
     class Config:
         env_file = ".env"
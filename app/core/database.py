@@ -1,23 +1,244 @@
-from sqlalchemy import create_engine
+import threading
+import time
+import uuid
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from app.core.config import settings
 
-# Create SQLAlchemy engine for Supabase connection pooler (transaction mode)
-# Using NullPool to let Supabase's server-side pooler handle all connection management
+
+class PoolMetrics:
+    """
+    Counters for connection checkouts, shared by every pool the app creates.
+    `checkout_seconds` covers waiting for a free connection plus opening a new
+    one when the pool has none, which is the whole cost under NullPool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.timeouts = 0
+            self.waits = 0
+            self.checkout_seconds_total = 0.0
+            self.checkout_seconds_max = 0.0
+
+    def incr(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def record_checkout(self, seconds: float):
+        with self._lock:
+            self.waits += 1
+            self.checkout_seconds_total += seconds
+            self.checkout_seconds_max = max(self.checkout_seconds_max, seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "mode": settings.DB_POOL_MODE,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "timeouts": self.timeouts,
+                "checkout_seconds_avg": self.checkout_seconds_total / (self.waits or 1),
+                "checkout_seconds_max": self.checkout_seconds_max,
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class _TimedPoolMixin:
+    # Pool events fire after a checkout, never before it, so the wait for a free
+    # connection can only be timed around the private _do_get. SQLAlchemy is
+    # pinned in requirements.txt for this; tests/test_pool_metrics.py fails if
+    # an upgrade stops calling it.
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.incr("timeouts")
+            raise
+        finally:
+            pool_metrics.record_checkout(time.perf_counter() - start)
+
+
+class TimedNullPool(_TimedPoolMixin, NullPool):
+    pass
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(mode: str = None, use_async: bool = False) -> dict:
+    """
+    Engine keyword arguments for the configured pool mode.
+
+    - "null": no app-side pooling; for an external transaction-mode pooler
+      such as Supabase's, which handles all connection management.
+    - "queue": keep up to DB_POOL_SIZE + DB_MAX_OVERFLOW connections open,
+      for direct connections to Postgres.
+    """
+    mode = mode or settings.DB_POOL_MODE
+    if mode == "null":
+        return {"poolclass": TimedNullPool}
+    if mode == "queue":
+        return {
+            "poolclass": TimedAsyncAdaptedQueuePool if use_async else TimedQueuePool,
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        }
+    raise ValueError(f"Unsupported DB_POOL_MODE: {mode}")
+
+
+def instrument_pool(target_engine):
+    event.listen(target_engine, "connect", _on_connect)
+    event.listen(target_engine, "checkout", _on_checkout)
+    event.listen(target_engine, "checkin", _on_checkin)
+
+
+def _on_connect(dbapi_connection, connection_record):
+    pool_metrics.incr("connects")
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_metrics.incr("checkouts")
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    pool_metrics.incr("checkins")
+
+
+def get_pool_metrics() -> dict:
+    metrics = pool_metrics.snapshot()
+    metrics["status"] = engine.pool.status()
+    metrics["async_status"] = async_engine.pool.status()
+    return metrics
+
+
+def async_database_url(url: str) -> str:
+    """
+    Same database as DATABASE_URL, reached through the asyncpg driver.
+    """
+    url = make_url(url)
+    if url.drivername in ("postgresql", "postgresql+psycopg2"):
+        url = url.set(drivername="postgresql+asyncpg")
+    return url.render_as_string(hide_password=False)
+
+
+def async_connect_args() -> dict:
+    connect_args = {
+        "server_settings": {"statement_timeout": "60000"}  # 60 second timeout
+    }
+    if settings.DB_POOL_MODE == "null":
+        # Transaction-mode poolers hand each transaction a different backend,
+        # so prepared statements must not be cached or reuse names
+        connect_args["statement_cache_size"] = 0
+        connect_args["prepared_statement_cache_size"] = 0
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+    return connect_args
+
+
+# Create SQLAlchemy engine; pooling depends on DB_POOL_MODE (see pool_options)
 engine = create_engine(
     settings.DATABASE_URL,
-    poolclass=NullPool,  # Disable app-side pooling
     echo=settings.DEBUG,
     connect_args={
         "options": "-c statement_timeout=60000"  # 60 second timeout
-    }
+    },
+    **pool_options()
+)
+instrument_pool(engine)
+
+# Async engine for routers ported to AsyncSession; same pooling rules as the sync engine.
+# Always built (see README): imports, exports and webhook ingestion depend on asyncpg.
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    echo=settings.DEBUG,
+    connect_args=async_connect_args(),
+    **pool_options(use_async=True)
 )
+instrument_pool(async_engine.sync_engine)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Objects stay loaded after commit: async sessions cannot lazy-load expired attributes
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+# SQLSTATEs raised when a row conflicts with an exclusion, unique or foreign key constraint
+EXCLUSION_VIOLATION = "23P01"
+UNIQUE_VIOLATION = "23505"
+FOREIGN_KEY_VIOLATION = "23503"
+
+
+def sqlstate(error: Exception):
+    """
+    SQLSTATE of a database error (usually wrapped by SQLAlchemy), or None.
+    Works for both psycopg2 (pgcode) and asyncpg (sqlstate).
+    """
+    orig = getattr(error, "orig", error)
+    return getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+
+
+def is_exclusion_violation(error: Exception) -> bool:
+    """
+    True if `error` (usually an IntegrityError) was raised by an exclusion constraint.
+    """
+    return sqlstate(error) == EXCLUSION_VIOLATION
+
+
+def constraint_name(error: Exception):
+    """
+    Name of the constraint (or unique index) a database error is about, or None.
+    psycopg2 reports it in `diag`; asyncpg on its own exception, which
+    SQLAlchemy's adapter chains as the cause.
+    """
+    orig = getattr(error, "orig", error)
+    diag = getattr(orig, "diag", None)
+    if diag is not None:
+        return diag.constraint_name
+    return getattr(orig.__cause__, "constraint_name", None)
+
+
+def is_unique_violation(error: Exception, constraint: str) -> bool:
+    """
+    True if `error` (usually an IntegrityError) was raised by the unique constraint or index `constraint`.
+    """
+    return sqlstate(error) == UNIQUE_VIOLATION and constraint_name(error) == constraint
+
+
+def is_foreign_key_violation(error: Exception, constraint: str) -> bool:
+    """
+    True if `error` (usually an IntegrityError) was raised by the foreign key constraint `constraint`.
+    """
+    return sqlstate(error) == FOREIGN_KEY_VIOLATION and constraint_name(error) == constraint
+
+
 # Create Base class for models
 Base = declarative_base()
 
@@ -29,3 +250,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Dependency to get an async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,48 @@
+"""
+Phone number normalization to E.164 ("+5511999999999").
+
+This is deliberately lightweight (no numbering-plan metadata): it strips
+formatting, honours an explicit international prefix ("+" or "00"), drops a
+national trunk "0" and prepends the default country code to national numbers.
+It is good enough to give every way of writing one number the same key.
+"""
+import re
+from typing import Optional
+from app.core.config import settings
+
+_NON_DIGITS = re.compile(r"\D")
+
+# E.164 numbers have at most 15 digits; shorter than 8 is not a phone number
+_MIN_DIGITS = 8
+_MAX_DIGITS = 15
+# Longest national number (area code included) of the default country
+_MAX_NATIONAL_DIGITS = 11
+
+
+def normalize_phone(raw: Optional[str], default_country_code: Optional[str] = None) -> Optional[str]:
+    """
+    Return `raw` in E.164 form, or None if it does not look like a phone number.
+    Numbers without an international prefix that are short enough to be
+    national get `default_country_code` (DEFAULT_PHONE_COUNTRY_CODE) prepended.
+    """
+    if not raw:
+        return None
+    country_code = default_country_code or settings.DEFAULT_PHONE_COUNTRY_CODE
+    # WhatsApp JIDs: "5511999999999@s.whatsapp.net", "5511999999999:12@..."
+    raw = raw.split("@", 1)[0].split(":", 1)[0].strip()
+
+    international = raw.startswith("+")
+    digits = _NON_DIGITS.sub("", raw)
+    if not international and digits.startswith("00"):
+        international = True
+        digits = digits[2:]
+
+    if not international:
+        national = digits.lstrip("0")
+        already_prefixed = digits.startswith(country_code) and len(digits) > _MAX_NATIONAL_DIGITS
+        if not already_prefixed and len(national) <= _MAX_NATIONAL_DIGITS:
+            digits = country_code + national
+
+    if not _MIN_DIGITS <= len(digits) <= _MAX_DIGITS:
+        return None
+    return f"+{digits}"
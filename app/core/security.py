@@ -1,9 +1,13 @@
 import firebase_admin
 from firebase_admin import credentials, auth
 from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from app.core.config import settings
+from app.core.cache import TTLCache
+import hashlib
 import os
 import json
+import time
 
 if not firebase_admin._apps:
     firebase_cred = os.environ.get("FIREBASE_SERVICE_ACCOUNT")
@@ -23,6 +27,33 @@ if not firebase_admin._apps:
         print(f"Warning: Firebase Admin initialization failed in security module: {e}")
 
 
+# Verified tokens, keyed by SHA-256 of the raw token so the cache never holds credentials
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_MAXSIZE, ttl=settings.TOKEN_CACHE_TTL)
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+async def _verify_id_token_cached(token: str) -> dict:
+    """
+    Verify a raw ID token, reusing a previous verification while it is still valid.
+    Entries expire at the token's `exp` claim or after TOKEN_CACHE_TTL, whichever comes first.
+    """
+    key = _token_key(token)
+    decoded_token = token_cache.get(key)
+    if decoded_token is not None:
+        return decoded_token
+
+    # Verification may fetch Google's public keys; keep it off the event loop
+    decoded_token = await run_in_threadpool(auth.verify_id_token, token)
+
+    exp = decoded_token.get("exp")
+    if exp is not None:
+        token_cache.set(key, decoded_token, ttl=exp - time.time())
+    return decoded_token
+
+
 async def verify_firebase_token(token: str) -> dict:
     """
     Verify Firebase ID token and return decoded token.
@@ -39,7 +70,7 @@ async def verify_firebase_token(token: str) -> dict:
     try:
         if token.startswith('Bearer '):
             token = token[7:]
-        decoded_token = auth.verify_id_token(token)
+        decoded_token = await _verify_id_token_cached(token)
         return decoded_token
     except auth.InvalidIdTokenError:
         raise HTTPException(
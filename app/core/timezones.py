@@ -0,0 +1,65 @@
+"""
+Timezone lookups and local-to-UTC conversions shared by the scheduling code.
+
+Zone objects are resolved once per name. Opening windows are converted once
+per (timezone, date, start, end): a weekly schedule only has a handful of
+distinct windows, so availability over many days and doctors reuses the same
+converted values instead of redoing the conversion for every slot query.
+
+Daylight saving transitions are resolved per date. A window starting or
+ending in a skipped hour is moved forward by the gap; a window ending in a
+repeated hour ends at its second occurrence, so it keeps its full length.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from app.core.config import settings
+
+UTC = timezone.utc
+
+# Distinct (timezone, date, window) conversions kept per worker
+_WINDOW_CACHE_SIZE = 16384
+
+
+@lru_cache(maxsize=None)
+def _zone(name: str) -> ZoneInfo:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name}")
+
+
+def get_timezone(name: Optional[str] = None) -> ZoneInfo:
+    """
+    The zone named `name` (an IANA name such as "America/Manaus"), or the
+    default timezone when it is empty. Raises ValueError for unknown names.
+    """
+    return _zone(name or settings.DEFAULT_TIMEZONE)
+
+
+DEFAULT_TZ = get_timezone()
+
+
+@lru_cache(maxsize=_WINDOW_CACHE_SIZE)
+def local_window_to_utc(day: date, start: time, end: time, tz: ZoneInfo = DEFAULT_TZ) -> Tuple[datetime, datetime]:
+    """
+    Convert a wall-clock window on `day` in `tz` to aware UTC datetimes.
+    """
+    open_start = datetime.combine(day, start).replace(tzinfo=tz)
+    open_end = datetime.combine(day, end).replace(tzinfo=tz)
+    return open_start.astimezone(UTC), max(open_end.astimezone(UTC), open_end.replace(fold=1).astimezone(UTC))
+
+
+def local_day_start_utc(day: date, tz: ZoneInfo = DEFAULT_TZ) -> datetime:
+    """
+    Naive UTC instant at which local `day` starts in `tz`, for comparing with timestamp columns.
+    """
+    return local_window_to_utc(day, time.min, time.min, tz)[0].replace(tzinfo=None)
+
+
+def local_days_to_utc(first_day: date, last_day: date, tz: ZoneInfo = DEFAULT_TZ) -> Tuple[datetime, datetime]:
+    """
+    Naive UTC bounds [start, end) of the local days first_day..last_day in `tz`.
+    """
+    return local_day_start_utc(first_day, tz), local_day_start_utc(last_day + timedelta(days=1), tz)
@@ -1,11 +1,36 @@
-from fastapi import FastAPI
+import hmac
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.database import get_pool_metrics
+from app.core.security import token_cache
+from app.services.users import user_cache
+from app.services.bots import bot_instance_cache
+from app.services.availability_cache import availability_cache
+from app.services.evolution import evolution_client
+from app.services.ingestion import message_ingestor
 from app.api.api_v1.api import api_router
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.api.responses import FastJSONResponse
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await evolution_client.start()
+    await message_ingestor.start()
+    yield
+    await message_ingestor.stop()
+    await evolution_client.close()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    debug=settings.DEBUG
+    debug=settings.DEBUG,
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse if settings.FAST_JSON_RESPONSES else JSONResponse
 )
 
 # Configure CORS
@@ -15,6 +40,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Include API router
@@ -41,6 +67,27 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics(authorization: Optional[str] = Header(None)):
+    """
+    In-process cache and connection pool counters for this worker.
+    Requires METRICS_TOKEN as a bearer token; not served when it is unset.
+    """
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest((authorization or "").encode(), f"Bearer {settings.METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return {
+        "db_pool": get_pool_metrics(),
+        "token_cache": token_cache.stats(),
+        "user_cache": user_cache.stats(),
+        "bot_instance_cache": bot_instance_cache.stats(),
+        "availability_cache": availability_cache.stats(),
+        "evolution_api": evolution_client.stats(),
+        "message_ingestion": message_ingestor.stats(),
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
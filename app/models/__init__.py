@@ -4,5 +4,7 @@ from app.models.business_hour import BusinessHour
 from app.models.contact import Contact
 from app.models.appointment import Appointment
 from app.models.blocked_period import BlockedPeriod
+from app.models.recurring_blocked_period import RecurringBlockedPeriod
 from app.models.doctor import Doctor
 from app.models.service import Service
+from app.models.message import Message
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Index, func, literal_column, text
+from sqlalchemy.dialects.postgresql import UUID, ExcludeConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -30,5 +30,32 @@ class Appointment(Base):
     service = relationship("Service", back_populates="appointments")
     contact = relationship("Contact", back_populates="appointments")
     
+    __table_args__ = (
+        # A doctor cannot have two non-cancelled appointments overlapping in time
+        ExcludeConstraint(
+            (doctor_id, "="),
+            (func.tsrange(start_time, end_time), "&&"),
+            name="appointments_doctor_period_excl",
+            using="gist",
+            where=text("status <> 'cancelled'"),
+        ),
+        # Busy-time lookups: one doctor, a time range, active appointments only
+        Index(
+            "ix_appointments_doctor_id_start_time_active",
+            doctor_id,
+            start_time,
+            postgresql_where=text("status <> 'cancelled'"),
+        ),
+        # Listings: one user's appointments in time order, keyset paginated
+        Index("ix_appointments_user_id_start_time_id", user_id, start_time, id),
+        # Substring search (?q=) on titles; needs the pg_trgm extension
+        Index("ix_appointments_title_trgm", title, postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+    )
+    
     def __repr__(self):
         return f"<Appointment {self.title}>"
+
+
+# Renders the literal instead of a bind parameter so the planner can match the
+# partial indexes above even with generic (prepared statement) plans
+ACTIVE_APPOINTMENT = Appointment.status != literal_column("'cancelled'")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -20,5 +20,10 @@ class BlockedPeriod(Base):
     # Relationships
     doctor = relationship("Doctor", back_populates="blocked_periods")
     
+    __table_args__ = (
+        # Busy-time lookups: one doctor, periods overlapping a time range
+        Index("ix_blocked_periods_doctor_id_start_time_end_time", doctor_id, start_time, end_time),
+    )
+    
     def __repr__(self):
         return f"<BlockedPeriod {self.start_time} - {self.end_time}>"
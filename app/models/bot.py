@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey, Text, Integer
+from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey, Text, Integer, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -17,7 +17,7 @@ class Bot(Base):
     description = Column(Text, nullable=True)
     
     # Instance Info
-    instance_name = Column(String, nullable=True)
+    instance_name = Column(String, nullable=True, index=True)
     
     # Settings
     personality = Column(Text, nullable=True)
@@ -33,5 +33,10 @@ class Bot(Base):
     # Relationships
     user = relationship("User", back_populates="bots")
     
+    __table_args__ = (
+        # Keyset pagination of a user's bots
+        Index("ix_bots_user_id_created_at_id", user_id, created_at, id),
+    )
+    
     def __repr__(self):
         return f"<Bot {self.name}>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Time, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, Time, ForeignKey, Boolean, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
@@ -18,5 +18,9 @@ class BusinessHour(Base):
     # Relationships
     doctor = relationship("Doctor", back_populates="business_hours")
     
+    __table_args__ = (
+        Index("ix_business_hours_doctor_id_weekday", doctor_id, weekday),
+    )
+    
     def __repr__(self):
         return f"<BusinessHour {self.weekday} {self.start_time}-{self.end_time}>"
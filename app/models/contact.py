@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -12,6 +12,7 @@ class Contact(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     phone = Column(String, nullable=False)  # Renamed from external_contact_id
+    phone_e164 = Column(String, nullable=True)  # normalized phone, unique per user (see app.core.phone)
     name = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
@@ -19,5 +20,15 @@ class Contact(Base):
     user = relationship("User", back_populates="contacts")
     appointments = relationship("Appointment", back_populates="contact", cascade="all, delete-orphan")
     
+    __table_args__ = (
+        # Keyset pagination of a user's contacts
+        Index("ix_contacts_user_id_created_at_id", user_id, created_at, id),
+        # Lookups and upserts by phone
+        Index("uq_contacts_user_id_phone_e164", user_id, phone_e164, unique=True),
+        # Substring search (?q=) on name and phone; needs the pg_trgm extension
+        Index("ix_contacts_name_trgm", name, postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_contacts_phone_e164_trgm", phone_e164, postgresql_using="gin", postgresql_ops={"phone_e164": "gin_trgm_ops"}),
+    )
+    
     def __repr__(self):
         return f"<Contact {self.name or self.phone}>"
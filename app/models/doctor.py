@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -16,6 +16,7 @@ class Doctor(Base):
     email = Column(String, nullable=False)
     specialties = Column(Text, nullable=True)
     crm = Column(Text, nullable=True)
+    timezone = Column(String, nullable=True)  # IANA name; falls back to the bot's or the default timezone
     
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -25,7 +26,13 @@ class Doctor(Base):
     appointments = relationship("Appointment", back_populates="doctor", cascade="all, delete-orphan")
     business_hours = relationship("BusinessHour", back_populates="doctor", cascade="all, delete-orphan")
     blocked_periods = relationship("BlockedPeriod", back_populates="doctor", cascade="all, delete-orphan")
+    recurring_blocked_periods = relationship("RecurringBlockedPeriod", back_populates="doctor", cascade="all, delete-orphan")
     services = relationship("Service", back_populates="doctor", cascade="all, delete-orphan")
     
+    __table_args__ = (
+        # Keyset pagination of a user's doctors
+        Index("ix_doctors_user_id_created_at_id", user_id, created_at, id),
+    )
+    
     def __repr__(self):
         return f"<Doctor {self.name}>"
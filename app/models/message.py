@@ -0,0 +1,35 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Boolean, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from datetime import datetime
+import uuid
+from app.core.database import Base
+
+
+class Message(Base):
+    __tablename__ = "messages"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    bot_id = Column(UUID(as_uuid=True), ForeignKey("bots.id", ondelete="CASCADE"), nullable=False)
+    contact_id = Column(UUID(as_uuid=True), ForeignKey("contacts.id", ondelete="CASCADE"), nullable=False)
+    
+    # WhatsApp message as received from the Evolution API webhook
+    external_id = Column(String, nullable=False)  # key.id
+    remote_jid = Column(String, nullable=False)
+    from_me = Column(Boolean, default=False, nullable=False)
+    message_type = Column(String, nullable=True)
+    text = Column(Text, nullable=True)
+    payload = Column(JSONB, nullable=True)
+    
+    sent_at = Column(DateTime, nullable=False)  # messageTimestamp, UTC
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        # Webhook deliveries can be retried; the same message is stored once
+        UniqueConstraint("bot_id", "external_id", name="uq_messages_bot_id_external_id"),
+        # A contact's conversation in time order
+        Index("ix_messages_contact_id_sent_at", contact_id, sent_at),
+    )
+    
+    def __repr__(self):
+        return f"<Message {self.external_id}>"
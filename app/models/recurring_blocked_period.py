@@ -0,0 +1,35 @@
+from sqlalchemy import Column, String, Date, DateTime, ForeignKey, Integer, Time
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.orm import relationship
+from datetime import datetime
+import uuid
+from app.core.database import Base
+
+
+class RecurringBlockedPeriod(Base):
+    """
+    A blocked period that repeats (e.g. every Friday afternoon), stored as a
+    rule and expanded for the queried window (see app.services.recurrence).
+    """
+    __tablename__ = "recurring_blocked_periods"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    doctor_id = Column(UUID(as_uuid=True), ForeignKey("doctors.id", ondelete="CASCADE"), nullable=False, index=True)
+    frequency = Column(String, nullable=False)  # daily | weekly
+    repeat_interval = Column(Integer, default=1, nullable=False)  # every N days or weeks
+    weekdays = Column(ARRAY(Integer), nullable=True)  # weekly: 0=Sunday ... 6=Saturday; default the weekday of starts_on
+    start_time = Column(Time, nullable=False)  # wall-clock time in the doctor's timezone
+    end_time = Column(Time, nullable=False)
+    starts_on = Column(Date, nullable=False)
+    until = Column(Date, nullable=True)  # last day it may occur, inclusive
+    count = Column(Integer, nullable=True)  # number of occurrences, exceptions included
+    exceptions = Column(ARRAY(Date), nullable=True)  # days it does not occur
+    reason = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    # Relationships
+    doctor = relationship("Doctor", back_populates="recurring_blocked_periods")
+    
+    def __repr__(self):
+        return f"<RecurringBlockedPeriod {self.frequency} {self.start_time}-{self.end_time}>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Float, Integer
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Float, Integer, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -26,5 +26,10 @@ class Service(Base):
     doctor = relationship("Doctor", back_populates="services")
     appointments = relationship("Appointment", back_populates="service", cascade="all, delete-orphan")
     
+    __table_args__ = (
+        # Keyset pagination of a doctor's services
+        Index("ix_services_doctor_id_created_at_id", doctor_id, created_at, id),
+    )
+    
     def __repr__(self):
         return f"<Service {self.name}>"
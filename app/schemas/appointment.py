@@ -1,8 +1,15 @@
-from pydantic import BaseModel, UUID4
-from datetime import datetime
-from typing import Optional
+from pydantic import BaseModel, Field, UUID4, field_validator
+from datetime import date, datetime, timezone
+from typing import Annotated, List, Literal, Optional, Union
 from uuid import UUID
 
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Appointment columns are naive UTC timestamps
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 class AppointmentBase(BaseModel):
     contact_id: UUID
     doctor_id: Optional[UUID] = None
@@ -13,6 +20,11 @@ class AppointmentBase(BaseModel):
     end_time: datetime
     status: str = "active"
 
+    @field_validator("start_time", "end_time")
+    @classmethod
+    def normalize_times(cls, value):
+        return to_naive_utc(value)
+
 class AppointmentCreate(AppointmentBase):
     pass
 
@@ -23,6 +35,11 @@ class AppointmentUpdate(BaseModel):
     end_time: Optional[datetime] = None
     status: Optional[str] = None
 
+    @field_validator("start_time", "end_time")
+    @classmethod
+    def normalize_times(cls, value):
+        return to_naive_utc(value)
+
 class AppointmentInDBBase(AppointmentBase):
     id: UUID
     user_id: UUID
@@ -38,9 +55,53 @@ class Appointment(AppointmentInDBBase):
 class AppointmentResponse(AppointmentInDBBase):
     pass
 
+class AppointmentBatchCreate(BaseModel):
+    op: Literal["create"]
+    appointment: AppointmentCreate
+
+class AppointmentBatchUpdate(BaseModel):
+    op: Literal["update"]
+    id: UUID
+    changes: AppointmentUpdate
+
+class AppointmentBatchCancel(BaseModel):
+    op: Literal["cancel"]
+    id: UUID
+
+AppointmentBatchOperation = Annotated[
+    Union[AppointmentBatchCreate, AppointmentBatchUpdate, AppointmentBatchCancel],
+    Field(discriminator="op"),
+]
+
+class AppointmentBatchRequest(BaseModel):
+    operations: List[AppointmentBatchOperation]
+
+class AppointmentBatchResult(BaseModel):
+    index: int  # position of the operation in the request
+    op: str
+    status_code: int
+    appointment: Optional[AppointmentResponse] = None
+    error: Optional[str] = None
+
+class AppointmentBatchResponse(BaseModel):
+    applied: bool  # operations are applied all together or not at all
+    results: List[AppointmentBatchResult]
+
 class AvailableTimeSlot(BaseModel):
     start: datetime
     end: datetime
 
 class AvailableSlotsResponse(BaseModel):
     available_slots: list[AvailableTimeSlot]
+
+class DayAvailability(BaseModel):
+    day: date
+    available_slots: list[AvailableTimeSlot]
+
+class DoctorAvailability(BaseModel):
+    doctor_id: UUID
+    service_id: UUID
+    days: list[DayAvailability]
+
+class AvailabilityRangeResponse(BaseModel):
+    doctors: list[DoctorAvailability]
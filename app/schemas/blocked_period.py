@@ -1,6 +1,6 @@
 from pydantic import BaseModel
-from typing import Optional
-from datetime import datetime
+from typing import List, Literal, Optional
+from datetime import date, datetime, time
 from uuid import UUID
 
 class BlockedPeriodBase(BaseModel):
@@ -26,4 +26,43 @@ class BlockedPeriodInDBBase(BlockedPeriodBase):
         from_attributes = True
 
 class BlockedPeriod(BlockedPeriodInDBBase):
+    # Occurrences expanded from a recurring blocked period are not rows of their own:
+    # they have no id, and recurring_id is the handle to edit or delete their rule
+    id: Optional[UUID] = None
+    recurring_id: Optional[UUID] = None
+
+class RecurringBlockedPeriodBase(BaseModel):
+    frequency: Literal["daily", "weekly"]
+    repeat_interval: int = 1
+    weekdays: Optional[List[int]] = None  # 0=Sunday ... 6=Saturday
+    start_time: time
+    end_time: time
+    starts_on: date
+    until: Optional[date] = None
+    count: Optional[int] = None
+    exceptions: Optional[List[date]] = None
+    reason: Optional[str] = None
+
+class RecurringBlockedPeriodCreate(RecurringBlockedPeriodBase):
     pass
+
+class RecurringBlockedPeriodUpdate(BaseModel):
+    frequency: Optional[Literal["daily", "weekly"]] = None
+    repeat_interval: Optional[int] = None
+    weekdays: Optional[List[int]] = None
+    start_time: Optional[time] = None
+    end_time: Optional[time] = None
+    starts_on: Optional[date] = None
+    until: Optional[date] = None
+    count: Optional[int] = None
+    exceptions: Optional[List[date]] = None
+    reason: Optional[str] = None
+
+class RecurringBlockedPeriod(RecurringBlockedPeriodBase):
+    id: UUID
+    doctor_id: UUID
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
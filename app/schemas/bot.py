@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Optional, List
 from datetime import datetime, time
 from uuid import UUID
 
@@ -44,3 +44,13 @@ class Bot(BotInDBBase):
 
 class BotResponse(BotInDBBase):
     pass
+
+# Connection state of one bot's instance, as part of a bulk status response
+class InstanceStatus(BaseModel):
+    bot_id: UUID
+    instance_name: Optional[str] = None
+    status: Optional[Any] = None  # Evolution API connectionState payload
+    error: Optional[str] = None
+
+class InstanceStatusListResponse(BaseModel):
+    instances: List[InstanceStatus]
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, UUID4
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 
 class ContactBase(BaseModel):
@@ -17,6 +17,7 @@ class ContactUpdate(BaseModel):
 class ContactInDBBase(ContactBase):
     id: UUID
     user_id: UUID
+    phone_e164: Optional[str] = None
     created_at: datetime
 
     class Config:
@@ -27,3 +28,16 @@ class Contact(ContactInDBBase):
 
 class ContactResponse(ContactInDBBase):
     pass
+
+class ContactImportError(BaseModel):
+    row: int  # line number in the uploaded file
+    error: str
+
+class ContactImportResponse(BaseModel):
+    total_rows: int
+    inserted: int
+    updated: int  # existing contacts that got a name from the file
+    unchanged: int
+    invalid: int
+    errors: List[ContactImportError]
+    errors_truncated: bool
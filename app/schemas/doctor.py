@@ -1,12 +1,21 @@
-from pydantic import BaseModel, EmailStr, UUID4
+from pydantic import BaseModel, EmailStr, UUID4, field_validator
 from typing import Optional, List
 from datetime import datetime
+from app.core.timezones import get_timezone
 
 class DoctorBase(BaseModel):
     name: str
     email: EmailStr
     specialties: str
     crm: Optional[str] = None
+    timezone: Optional[str] = None
+
+    @field_validator("timezone")
+    @classmethod
+    def check_timezone(cls, value):
+        if value is not None:
+            get_timezone(value)
+        return value
 
 class DoctorCreate(DoctorBase):
     pass
@@ -0,0 +1,98 @@
+"""
+Free-slot computation for doctor calendars.
+
+Busy time (appointments and blocked periods) is merged once into sorted,
+disjoint intervals. Candidate slots are laid on a fixed grid from the opening
+time in steps of the service duration, and a single forward sweep over the
+merged intervals finds the free ones: O(slots + busy) instead of checking
+every slot against every busy interval.
+"""
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Iterable, List, Tuple
+from app.core.timezones import UTC
+
+Interval = Tuple[datetime, datetime]
+
+
+def to_aware_utc(dt: datetime) -> datetime:
+    # Naive values come from timestamp columns, which store UTC
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=UTC)
+    return dt.astimezone(UTC)
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """
+    Sort and merge overlapping or touching intervals into disjoint ones.
+    Inverted intervals (end before start) are ignored.
+    """
+    merged: List[Interval] = []
+    for start, end in sorted(i for i in intervals if i[1] >= i[0]):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class BusyTimeline:
+    """
+    Merged busy intervals for one doctor, queryable for any opening window.
+
+    Build it once per doctor and call `free_slots` for each day; each call
+    bisects to the first relevant interval, so a timeline covering a whole
+    date range is as cheap to query as one covering a single day.
+    """
+
+    def __init__(self, intervals: Iterable[Interval]):
+        merged = merge_intervals(intervals)
+        self.starts = [start for start, _ in merged]
+        self.ends = [end for _, end in merged]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def free_slots(self, open_start: datetime, open_end: datetime, duration: timedelta) -> List[Interval]:
+        """
+        Slots of `duration` laid from `open_start` that end by `open_end`
+        and do not overlap any busy interval.
+        """
+        if duration <= timedelta(0):
+            raise ValueError("duration must be positive")
+
+        starts, ends = self.starts, self.ends
+        count = len(starts)
+        # First interval that ends after the opening time
+        i = bisect_right(ends, open_start)
+
+        slots: List[Interval] = []
+        slot_start = open_start
+        while slot_start + duration <= open_end:
+            slot_end = slot_start + duration
+
+            while i < count and ends[i] <= slot_start:
+                i += 1
+
+            if i < count and starts[i] < slot_end:
+                # Overlaps interval i: jump to the first grid slot starting at or after its end
+                slot_start += duration * -((slot_start - ends[i]) // duration)
+                continue
+
+            slots.append((slot_start, slot_end))
+            slot_start = slot_end
+
+        return slots
+
+
+def compute_free_slots(
+    open_start: datetime,
+    open_end: datetime,
+    duration: timedelta,
+    busy_intervals: Iterable[Interval],
+) -> List[Interval]:
+    """
+    Free slots for one opening window; all datetimes must be aware.
+    """
+    return BusyTimeline(busy_intervals).free_slots(open_start, open_end, duration)
@@ -0,0 +1,135 @@
+"""
+Cache of computed free slots per (doctor, day, service duration, timezone).
+
+Entries are addressed through version tokens instead of being deleted:
+
+- a per-doctor token, replaced when business hours change, and
+- a per-(doctor, day) token, replaced when an appointment or blocked period
+  overlapping that day changes.
+
+A reader resolves the tokens before querying the database, so a result
+computed from data that changed meanwhile is written under a key nobody
+reads again. Tokens are random and never reused, so losing one (eviction,
+TTL) only orphans the entries that referenced it.
+"""
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+from app.core.cache import InMemoryBackend, RedisBackend
+from app.core.config import settings
+from app.core.timezones import UTC
+from app.services.availability import Interval, to_aware_utc
+
+# Local dates an interval can fall on in any timezone (UTC-12 to UTC+14)
+_TZ_MARGIN = timedelta(hours=14)
+# Longer intervals invalidate the doctor instead of day by day
+_MAX_INVALIDATED_DAYS = 62
+
+
+class AvailabilityCache:
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        # Version tokens must outlive every entry that references them
+        self.version_ttl = ttl * 10
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _doctor_version_key(doctor_id) -> str:
+        return f"availability:v:{doctor_id}"
+
+    @staticmethod
+    def _day_version_key(doctor_id, day: date) -> str:
+        return f"availability:v:{doctor_id}:{day.isoformat()}"
+
+    async def _versions(self, keys: List[str]) -> List[str]:
+        versions = await self.backend.get_many(keys)
+        for i, version in enumerate(versions):
+            if version is None:
+                token = uuid.uuid4().hex
+                if not await self.backend.add(keys[i], token, self.version_ttl):
+                    token = await self.backend.get(keys[i]) or token
+                versions[i] = token
+        return versions
+
+    async def keys(self, requests: Iterable[Tuple[object, date, int, str]]) -> List[str]:
+        """
+        Resolve entry keys for (doctor_id, day, duration_minutes, timezone_name) requests.
+        The day is local to the timezone.
+        Resolve them before reading the data the entries are computed from.
+        """
+        requests = list(requests)
+        version_keys = []
+        for doctor_id, day, _, _ in requests:
+            version_keys.append(self._doctor_version_key(doctor_id))
+            version_keys.append(self._day_version_key(doctor_id, day))
+        versions = await self._versions(version_keys)
+        return [
+            f"availability:{doctor_id}:{day.isoformat()}:{duration}:{tz_name}:{versions[2 * i]}:{versions[2 * i + 1]}"
+            for i, (doctor_id, day, duration, tz_name) in enumerate(requests)
+        ]
+
+    async def key(self, doctor_id, day: date, duration: int, tz_name: str) -> str:
+        return (await self.keys([(doctor_id, day, duration, tz_name)]))[0]
+
+    async def get_many(self, keys: List[str]) -> List[Optional[List[Interval]]]:
+        results = []
+        for value in await self.backend.get_many(keys):
+            if value is None:
+                self.misses += 1
+                results.append(None)
+            else:
+                self.hits += 1
+                results.append([
+                    (datetime.fromtimestamp(start, UTC), datetime.fromtimestamp(end, UTC))
+                    for start, end in value
+                ])
+        return results
+
+    async def get(self, key: str) -> Optional[List[Interval]]:
+        return (await self.get_many([key]))[0]
+
+    async def set(self, key: str, slots: List[Interval]) -> None:
+        value = [[start.timestamp(), end.timestamp()] for start, end in slots]
+        await self.backend.set(key, value, self.ttl)
+
+    async def invalidate_range(self, doctor_id, start: datetime, end: datetime) -> None:
+        """
+        Drop entries for every day the interval [start, end] may touch.
+        Naive datetimes are UTC, as stored in the database.
+        """
+        if doctor_id is None or start is None or end is None:
+            return
+        first_day = (to_aware_utc(start) - _TZ_MARGIN).date()
+        last_day = (to_aware_utc(max(start, end)) + _TZ_MARGIN).date()
+        if (last_day - first_day).days >= _MAX_INVALIDATED_DAYS:
+            await self.invalidate_doctor(doctor_id)
+            return
+        day = first_day
+        while day <= last_day:
+            await self.backend.set(self._day_version_key(doctor_id, day), uuid.uuid4().hex, self.version_ttl)
+            day += timedelta(days=1)
+
+    async def invalidate_doctor(self, doctor_id) -> None:
+        await self.backend.set(self._doctor_version_key(doctor_id), uuid.uuid4().hex, self.version_ttl)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+def _create_backend():
+    if settings.AVAILABILITY_CACHE_BACKEND == "redis":
+        return RedisBackend.from_url(settings.AVAILABILITY_CACHE_REDIS_URL)
+    if settings.AVAILABILITY_CACHE_BACKEND == "memory":
+        return InMemoryBackend(maxsize=settings.AVAILABILITY_CACHE_MAXSIZE)
+    raise ValueError(f"Unsupported AVAILABILITY_CACHE_BACKEND: {settings.AVAILABILITY_CACHE_BACKEND}")
+
+
+availability_cache = AvailabilityCache(_create_backend(), ttl=settings.AVAILABILITY_CACHE_TTL)
@@ -0,0 +1,67 @@
+import hashlib
+from typing import Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.bot import Bot
+from app.schemas.bot import BotResponse
+
+# instance_name -> (BotResponse as a JSON-compatible dict, serialized body, ETag)
+# Process-local: other workers only see an update once their entry expires
+bot_instance_cache = TTLCache(maxsize=settings.BOT_INSTANCE_CACHE_MAXSIZE, ttl=settings.BOT_INSTANCE_CACHE_TTL)
+# Bumped on invalidation so a row read before it is not cached after it. Bounded like
+# the cache itself: a generation only has to outlive the reads in flight when it changes
+_generations = TTLCache(maxsize=settings.BOT_INSTANCE_CACHE_MAXSIZE, ttl=settings.BOT_INSTANCE_CACHE_TTL)
+
+
+async def _get_cached_bot(db: AsyncSession, instance_name: str) -> Optional[Tuple[dict, bytes, str]]:
+    entry = bot_instance_cache.get(instance_name)
+    if entry is None:
+        generation = _generations.get(instance_name, 0)
+        bot = await db.scalar(select(Bot).where(Bot.instance_name == instance_name).limit(1))
+        if not bot:
+            return None
+        response = BotResponse.model_validate(bot)
+        body = response.model_dump_json().encode()
+        entry = (response.model_dump(mode="json"), body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+        if _generations.get(instance_name, 0) == generation:
+            bot_instance_cache.set(instance_name, entry)
+    return entry
+
+
+async def get_bot_payload(db: AsyncSession, instance_name: str) -> Optional[Tuple[bytes, str]]:
+    """
+    Return the JSON body and ETag of the bot owning `instance_name`, or None.
+
+    n8n loads the bot on every inbound message, so the serialized response is
+    cached and served without touching the database or re-validating it.
+    """
+    entry = await _get_cached_bot(db, instance_name)
+    return None if entry is None else entry[1:]
+
+
+async def get_bot_snapshot(db: AsyncSession, instance_name: str) -> Optional[dict]:
+    """
+    Return the bot owning `instance_name` as a BotResponse dict, or None.
+    Shares the cache (and its invalidation) with get_bot_payload; do not mutate it.
+    """
+    entry = await _get_cached_bot(db, instance_name)
+    return None if entry is None else entry[0]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def invalidate_bot_instance(*instance_names: Optional[str]) -> None:
+    for instance_name in instance_names:
+        if instance_name:
+            _generations.set(instance_name, _generations.get(instance_name, 0) + 1)
+            bot_instance_cache.pop(instance_name)
@@ -0,0 +1,185 @@
+"""
+Bulk contact import from a streamed CSV or NDJSON body.
+
+The body is parsed as it arrives, so memory stays flat regardless of file
+size. Valid rows are loaded with COPY (asyncpg `copy_records_to_table`) into a
+temporary staging table in batches, then merged into contacts with a single
+INSERT ... SELECT ... ON CONFLICT (user_id, phone_e164):
+
+- a phone listed several times in the file is imported once (its last row wins),
+- a phone the user already has is not duplicated; the existing contact only
+  gets the imported name if it has none.
+
+Everything runs in one transaction, so a failed import leaves no rows behind.
+"""
+import codecs
+import csv
+import json
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.phone import normalize_phone
+
+STAGING_TABLE = "contact_import_staging"
+
+_MERGE = text(f"""
+    WITH latest AS (
+        SELECT DISTINCT ON (phone_e164) id, phone, phone_e164, name
+        FROM {STAGING_TABLE}
+        ORDER BY phone_e164, row_number DESC
+    )
+    INSERT INTO contacts (id, user_id, phone, phone_e164, name, created_at)
+    SELECT id, CAST(:user_id AS uuid), phone, phone_e164, name, CAST(:created_at AS timestamp)
+    FROM latest
+    ORDER BY phone_e164
+    ON CONFLICT (user_id, phone_e164) DO UPDATE
+        SET name = EXCLUDED.name
+        WHERE contacts.name IS NULL AND EXCLUDED.name IS NOT NULL
+    RETURNING (xmax = 0) AS inserted
+""")
+
+
+class ImportReport:
+    def __init__(self, max_errors: int):
+        self.max_errors = max_errors
+        self.total_rows = 0
+        self.valid_rows = 0
+        self.invalid_rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.errors: List[dict] = []
+
+    def error(self, row: int, message: str) -> None:
+        self.invalid_rows += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "total_rows": self.total_rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            # Valid rows that matched an existing contact or repeated a phone of the file
+            "unchanged": self.valid_rows - self.inserted - self.updated,
+            "invalid": self.invalid_rows,
+            "errors": self.errors,
+            "errors_truncated": self.invalid_rows > len(self.errors),
+        }
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Decode a UTF-8 byte stream (with or without BOM) into lines, keeping line endings.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, dict]]:
+    """
+    Yield (line number, row) for each CSV record; the first line is the header
+    and must name a `phone` column (`name` is optional).
+    Quoted fields may span lines: lines are handed to the csv module once
+    their quotes balance.
+    """
+    header: Optional[List[str]] = None
+    pending: List[str] = []
+    quotes = 0
+    line_number = 0
+    start = 1
+    async for line in lines:
+        line_number += 1
+        pending.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        for record in csv.reader(pending):
+            if header is None:
+                header = [column.strip().lower() for column in record]
+                if "phone" not in header:
+                    raise ValueError("The CSV header must have a 'phone' column")
+            elif any(field.strip() for field in record):
+                yield start, dict(zip(header, record))
+        pending = []
+        quotes = 0
+        start = line_number + 1
+    if pending:
+        raise ValueError(f"Unterminated quoted field starting at line {start}")
+
+
+async def iter_ndjson_rows(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, object]]:
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError:
+            yield line_number, None
+
+
+async def import_contacts(
+    db: AsyncSession,
+    user_id,
+    rows: AsyncIterator[Tuple[int, object]],
+    *,
+    batch_size: int = 5000,
+    max_errors: int = 1000,
+) -> dict:
+    """
+    Validate, stage and merge contact rows for `user_id`, then commit.
+    Returns the import report.
+    """
+    report = ImportReport(max_errors)
+    await db.execute(text(
+        f"CREATE TEMP TABLE {STAGING_TABLE} "
+        "(row_number integer, id uuid, phone text, phone_e164 text, name text) ON COMMIT DROP"
+    ))
+    # The asyncpg connection behind the session, for COPY
+    raw_connection = await (await db.connection()).get_raw_connection()
+    copy_connection = raw_connection.driver_connection
+
+    batch = []
+    async for row_number, row in rows:
+        report.total_rows += 1
+        if not isinstance(row, dict):
+            report.error(row_number, "Invalid JSON object")
+            continue
+        phone = str(row.get("phone") or "").strip()
+        if not phone:
+            report.error(row_number, "Missing phone")
+            continue
+        phone_e164 = normalize_phone(phone)
+        if not phone_e164:
+            report.error(row_number, f"Invalid phone number: {phone[:50]}")
+            continue
+        name = str(row.get("name") or "").strip() or None
+
+        report.valid_rows += 1
+        batch.append((row_number, uuid.uuid4(), phone, phone_e164, name))
+        if len(batch) >= batch_size:
+            await copy_connection.copy_records_to_table(STAGING_TABLE, records=batch)
+            batch = []
+    if batch:
+        await copy_connection.copy_records_to_table(STAGING_TABLE, records=batch)
+
+    if report.valid_rows:
+        for (inserted,) in (await db.execute(_MERGE, {"user_id": user_id, "created_at": datetime.utcnow()})).all():
+            if inserted:
+                report.inserted += 1
+            else:
+                report.updated += 1
+    await db.commit()
+    return report.as_dict()
@@ -0,0 +1,244 @@
+"""
+Async client for the Evolution API (WhatsApp instances behind each bot).
+
+One `httpx.AsyncClient` is shared by all requests, so connections and TLS
+sessions are kept alive between calls. Every call has a timeout. Idempotent
+calls (GET, PUT, DELETE) are retried with exponential backoff on transport errors
+and 502/503/504 responses; other calls are only retried when the connection
+could not be opened, since the request never reached the server.
+
+A circuit breaker stops calling the API after repeated failures and answers
+503 until `reset_timeout` has passed; then a single trial call decides
+whether it closes again.
+
+Instance connection states and QR codes are polled every few seconds by the
+frontend, often from several tabs. `get_instance_state` and `get_qrcode`
+reuse answers for a short TTL and coalesce concurrent identical calls into
+one upstream request.
+"""
+import asyncio
+import random
+import time
+from typing import Any, Optional
+import httpx
+from fastapi import HTTPException
+from app.core.cache import SingleFlight, TTLCache
+from app.core.config import settings
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE"}
+RETRY_STATUS_CODES = {502, 503, 504}
+
+_MISSING = object()
+
+
+class EvolutionAPIError(HTTPException):
+    """
+    The Evolution API failed or rejected a call; reported to clients as 502.
+    `upstream_status` is the Evolution API's status code, if it answered.
+    """
+
+    def __init__(self, detail: str, upstream_status: Optional[int] = None):
+        super().__init__(status_code=502, detail=detail)
+        self.upstream_status = upstream_status
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        # When the half-open trial call started; a trial that never reports
+        # back (e.g. cancelled) stops blocking new trials after reset_timeout
+        self._trial_started: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        now = time.monotonic()
+        if state == "half-open" and (self._trial_started is None or now - self._trial_started >= self.reset_timeout):
+            self._trial_started = now
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_started = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial_started is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._trial_started = None
+
+
+class EvolutionClient:
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        *,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        max_connections: int = 50,
+        max_keepalive_connections: int = 20,
+        retries: int = 2,
+        retry_backoff: float = 0.2,
+        breaker: Optional[CircuitBreaker] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        state_cache_ttl: float = 2.0,
+        state_cache_maxsize: int = 10000,
+    ):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self.state_cache = TTLCache(maxsize=state_cache_maxsize, ttl=state_cache_ttl)
+        self._single_flight = SingleFlight()
+        # Bumped on invalidation so a call started before it is not cached after it
+        self._generations: dict = {}
+
+    async def start(self) -> None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"apikey": self.api_key},
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self.transport,
+            )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _backoff(self, attempt: int) -> None:
+        delay = self.retry_backoff * (2 ** attempt)
+        await asyncio.sleep(delay + random.uniform(0, delay))
+
+    async def request(self, method: str, endpoint: str, json: Any = None) -> Any:
+        """
+        Call the Evolution API and return the decoded JSON body.
+        Returns None for 404 or an empty body.
+        """
+        method = method.upper()
+        if not self.breaker.allow():
+            raise HTTPException(status_code=503, detail="Evolution API temporarily unavailable")
+        await self.start()
+
+        attempt = 0
+        while True:
+            try:
+                response = await self._client.request(method, endpoint, json=json)
+            except httpx.TransportError as e:
+                # A failed connect never reached the server, so any method can be retried
+                retryable = method in IDEMPOTENT_METHODS or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                if retryable and attempt < self.retries:
+                    await self._backoff(attempt)
+                    attempt += 1
+                    continue
+                self.breaker.record_failure()
+                raise EvolutionAPIError(f"Error communicating with Evolution API: {e!r}") from e
+
+            if response.status_code in RETRY_STATUS_CODES and method in IDEMPOTENT_METHODS and attempt < self.retries:
+                await self._backoff(attempt)
+                attempt += 1
+                continue
+            break
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+        if response.status_code == 404:
+            return None
+        if response.is_error:
+            raise EvolutionAPIError(
+                f"Error communicating with Evolution API: {response.status_code} {response.text[:500]}",
+                upstream_status=response.status_code,
+            )
+        if not response.content:
+            return None
+        try:
+            return response.json()
+        except ValueError as e:
+            raise EvolutionAPIError("Evolution API returned an invalid JSON body", upstream_status=response.status_code) from e
+
+    async def _get_cached(self, instance_name: str, endpoint: str) -> Any:
+        cached = self.state_cache.get(endpoint, _MISSING)
+        if cached is not _MISSING:
+            return cached
+
+        generation = self._generations.get(instance_name, 0)
+
+        async def fetch():
+            result = await self.get(endpoint)
+            if self._generations.get(instance_name, 0) == generation:
+                self.state_cache.set(endpoint, result)
+            return result
+
+        # Calls started before an invalidation are not joined after it
+        return await self._single_flight.do((endpoint, generation), fetch)
+
+    async def get_instance_state(self, instance_name: str) -> Any:
+        return await self._get_cached(instance_name, f"/instance/connectionState/{instance_name}")
+
+    async def get_qrcode(self, instance_name: str) -> Any:
+        # /instance/connect/{instance} returns the QR code (often base64 inside JSON)
+        return await self._get_cached(instance_name, f"/instance/connect/{instance_name}")
+
+    def invalidate_instance(self, instance_name: str) -> None:
+        """
+        Drop cached state and QR code of an instance, e.g. after a restart or delete.
+        """
+        self._generations[instance_name] = self._generations.get(instance_name, 0) + 1
+        self.state_cache.pop(f"/instance/connectionState/{instance_name}")
+        self.state_cache.pop(f"/instance/connect/{instance_name}")
+
+    async def get(self, endpoint: str) -> Any:
+        return await self.request("GET", endpoint)
+
+    async def post(self, endpoint: str, json: Any = None) -> Any:
+        return await self.request("POST", endpoint, json=json)
+
+    async def delete(self, endpoint: str) -> Any:
+        return await self.request("DELETE", endpoint)
+
+    def stats(self) -> dict:
+        return {
+            "breaker_state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "state_cache": self.state_cache.stats(),
+            "single_flight": self._single_flight.stats(),
+        }
+
+
+evolution_client = EvolutionClient(
+    settings.EVOLUTION_API_URL,
+    settings.EVOLUTION_API_KEY,
+    timeout=settings.EVOLUTION_API_TIMEOUT,
+    connect_timeout=settings.EVOLUTION_API_CONNECT_TIMEOUT,
+    max_connections=settings.EVOLUTION_API_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.EVOLUTION_API_MAX_KEEPALIVE,
+    retries=settings.EVOLUTION_API_RETRIES,
+    retry_backoff=settings.EVOLUTION_API_RETRY_BACKOFF,
+    breaker=CircuitBreaker(settings.EVOLUTION_API_BREAKER_THRESHOLD, settings.EVOLUTION_API_BREAKER_RESET),
+    state_cache_ttl=settings.EVOLUTION_API_STATE_CACHE_TTL,
+)
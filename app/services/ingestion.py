@@ -0,0 +1,521 @@
+"""
+Ingestion of inbound WhatsApp messages delivered by Evolution API webhooks.
+
+The webhook handler resolves the bot and the contact from in-memory indexes
+(the bot cache and a (user_id, phone_e164) -> contact index), queues the rows to
+write and returns. A single background task drains the queue and writes
+contacts and messages to Postgres in batches, whenever `batch_size` rows are
+waiting or `flush_interval` seconds have passed.
+
+New contacts get their id when first seen, so the id can be forwarded to n8n
+before the row is written. Contacts are written before the messages that
+reference them: a contact is queued before its first message, and the queue
+is FIFO. Contacts are keyed by (user_id, phone_e164) and inserted with
+ON CONFLICT; if another worker created the same contact meanwhile, the
+existing row wins and later messages are remapped to it.
+
+The webhook has already been answered when a batch is written, so a failed
+write must not lose the batch. Transient errors (lost connections,
+deadlocks, timeouts) are retried with exponential backoff. Other errors come
+from bad rows: the batch is bisected until the rows that fail on their own
+are isolated, and only those are dropped. Dropped rows are appended to the
+dead-letter file (one JSON object per line) so they can be inspected and
+replayed. Messages whose contact was dropped are re-resolved to the stored
+contact with the same phone, if there is one, instead of being written with
+an id that does not exist.
+
+The contact index can also hold contacts deleted since they were cached: the
+contacts endpoints invalidate the index of their own worker, but not of the
+others. A message rejected by the messages -> contacts foreign key is
+therefore treated as a cache miss: the entry is dropped and the message is
+pointed at the stored contact with its phone, created if there is none.
+"""
+import asyncio
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, List, Optional
+import httpx
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, is_foreign_key_violation, sqlstate
+from app.core.phone import normalize_phone
+from app.models.contact import Contact
+from app.models.message import Message
+
+# Message content types that carry text, and where the text lives
+_TEXT_FIELDS = (
+    ("conversation", None),
+    ("extendedTextMessage", "text"),
+    ("imageMessage", "caption"),
+    ("videoMessage", "caption"),
+    ("documentMessage", "caption"),
+    ("buttonsResponseMessage", "selectedDisplayText"),
+    ("listResponseMessage", "title"),
+)
+
+
+# SQLSTATEs worth retrying: connection loss, serialization failure, deadlock,
+# lack of resources, statement timeout and server shutdown or restart
+_TRANSIENT_SQLSTATE_CLASSES = ("08", "53")
+_TRANSIENT_SQLSTATES = ("40001", "40P01", "55P03", "57014", "57P01", "57P02", "57P03")
+
+
+# Raised when a message references a contact that no longer exists
+MESSAGE_CONTACT_FK = "messages_contact_id_fkey"
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    True if writing the same rows again may succeed.
+    """
+    if isinstance(error, (OperationalError, InterfaceError, PoolTimeoutError, OSError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, DBAPIError) and error.connection_invalidated:
+        return True
+    code = sqlstate(error) or ""
+    return code.startswith(_TRANSIENT_SQLSTATE_CLASSES) or code in _TRANSIENT_SQLSTATES
+
+
+def _message_text(message: dict) -> Optional[str]:
+    for field, attribute in _TEXT_FIELDS:
+        value = message.get(field)
+        if value and attribute is None:
+            return value
+        if isinstance(value, dict) and value.get(attribute):
+            return value[attribute]
+    return None
+
+
+def _sent_at(timestamp: Any) -> datetime:
+    try:
+        return datetime.utcfromtimestamp(int(timestamp))
+    except (TypeError, ValueError, OverflowError):
+        return datetime.utcnow()
+
+
+def parse_messages_upsert(payload: dict) -> List[dict]:
+    """
+    Extract the direct (non-group) messages of a MESSAGES_UPSERT event.
+    `data` is a single message or, in some Evolution API versions, a list.
+    """
+    data = payload.get("data")
+    items = data if isinstance(data, list) else [data]
+    messages = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        key = item.get("key") or {}
+        remote_jid = key.get("remoteJid")
+        if not remote_jid or not key.get("id"):
+            continue
+        if not remote_jid.endswith("@s.whatsapp.net"):
+            # Groups, broadcasts and status updates are not conversations with a contact
+            continue
+        # "5511999999999:12@s.whatsapp.net" -> "5511999999999", always with its country code
+        phone = remote_jid.split("@", 1)[0].split(":", 1)[0]
+        phone_e164 = normalize_phone(f"+{phone}")
+        if not phone_e164:
+            continue
+        messages.append({
+            "external_id": key["id"],
+            "remote_jid": remote_jid,
+            "phone": phone,
+            "phone_e164": phone_e164,
+            "from_me": bool(key.get("fromMe")),
+            "push_name": item.get("pushName"),
+            "message_type": item.get("messageType"),
+            "text": _message_text(item.get("message") or {}),
+            "sent_at": _sent_at(item.get("messageTimestamp")),
+            "payload": item,
+        })
+    return messages
+
+
+class MessageIngestor:
+    def __init__(
+        self,
+        *,
+        batch_size: int = 500,
+        flush_interval: float = 0.5,
+        queue_maxsize: int = 10000,
+        contact_index_maxsize: int = 100000,
+        contact_index_ttl: float = 3600,
+        forward_url: Optional[str] = None,
+        forward_timeout: float = 10.0,
+        retry_attempts: int = 3,
+        retry_backoff: float = 0.5,
+        dead_letter_path: Optional[str] = None,
+        session_factory=AsyncSessionLocal,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_attempts = retry_attempts
+        self.retry_backoff = retry_backoff
+        self.dead_letter_path = dead_letter_path
+        self.forward_url = forward_url
+        self.forward_timeout = forward_timeout
+        self.session_factory = session_factory
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_maxsize)
+        # (user_id, phone_e164) -> {"id", "phone", "name"}
+        self.contact_index = TTLCache(maxsize=contact_index_maxsize, ttl=contact_index_ttl)
+        # Generated contact id -> id of the row another worker created first
+        self._remapped = TTLCache(maxsize=contact_index_maxsize, ttl=contact_index_ttl)
+        # Generated id of a dropped contact -> (user_id, phone_e164), to re-resolve its messages
+        self._dropped_contacts = TTLCache(maxsize=contact_index_maxsize, ttl=contact_index_ttl)
+        self._closing = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self.counters = {
+            "messages_queued": 0,
+            "messages_written": 0,
+            "contacts_created": 0,
+            "batches": 0,
+            "retries": 0,
+            "failed_batches": 0,
+            "dead_lettered": 0,
+            "forward_errors": 0,
+        }
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._closing.clear()
+            self._client = httpx.AsyncClient(timeout=self.forward_timeout)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Write everything still queued, then stop the background task.
+        """
+        if self._task is not None:
+            self._closing.set()
+            await self._task
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def resolve_contact(self, db: AsyncSession, user_id, phone: str, phone_e164: str, name: Optional[str]) -> dict:
+        """
+        Return the contact for (user_id, phone_e164), queueing its creation if it is new.
+        """
+        key = (user_id, phone_e164)
+        contact = self.contact_index.get(key)
+        if contact is not None:
+            return contact
+
+        row = (await db.execute(
+            select(Contact.id, Contact.name).where(Contact.user_id == user_id, Contact.phone_e164 == phone_e164)
+        )).first()
+        if row:
+            contact = {"id": row.id, "phone": phone, "name": row.name}
+        else:
+            contact = {"id": uuid.uuid4(), "phone": phone, "name": name}
+            await self.queue.put(("contact", {
+                "id": contact["id"],
+                "user_id": user_id,
+                "phone": phone,
+                "phone_e164": phone_e164,
+                "name": name,
+                "created_at": datetime.utcnow(),
+            }))
+        self.contact_index.set(key, contact)
+        return contact
+
+    def invalidate_contact(self, user_id, *phones_e164: Optional[str]) -> None:
+        """
+        Forget cached contacts, e.g. after a contact is deleted or its phone changes.
+        """
+        for phone_e164 in phones_e164:
+            if phone_e164:
+                self.contact_index.pop((user_id, phone_e164))
+
+    async def submit_message(self, row: dict) -> None:
+        """
+        Queue a messages row; it is written with the next batch.
+        """
+        await self.queue.put(("message", row))
+        self.counters["messages_queued"] += 1
+
+    async def forward(self, payload: dict) -> None:
+        if not self.forward_url:
+            return
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.forward_timeout)
+        try:
+            response = await self._client.post(self.forward_url, json=payload)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            self.counters["forward_errors"] += 1
+            print(f"Error forwarding message to n8n: {e!r}")
+
+    async def _run(self) -> None:
+        while True:
+            items = await self._collect()
+            if items:
+                await self._flush(items)
+            elif self._closing.is_set():
+                return
+
+    async def _collect(self) -> list:
+        items = []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(items) < self.batch_size:
+            if self._closing.is_set() and self.queue.empty():
+                break
+            try:
+                items.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(self.queue.get(), timeout=min(timeout, 0.1)))
+            except asyncio.TimeoutError:
+                pass
+        return items
+
+    async def _flush(self, items: list) -> None:
+        contacts = [row for kind, row in items if kind == "contact"]
+        messages = [row for kind, row in items if kind == "message"]
+        # Contacts first, so that messages can reference them
+        if contacts:
+            await self._write_rows("contact", contacts, self._insert_contacts)
+        if messages:
+            messages = await self._resolve_contact_ids(messages)
+            if messages:
+                await self._write_rows("message", messages, self._insert_messages)
+        self.counters["batches"] += 1
+
+    async def _write_rows(
+        self,
+        kind: str,
+        rows: List[dict],
+        insert: Callable[[AsyncSession, List[dict]], Awaitable],
+        recover: bool = True,
+    ) -> None:
+        """
+        Write `rows`, bisecting on persistent errors so that only the rows
+        failing on their own are dead-lettered. A message whose contact no
+        longer exists is re-pointed at the current contact and written once more.
+        """
+        try:
+            await self._with_retries(insert, rows)
+        except Exception as e:
+            if len(rows) > 1 and not is_transient_error(e):
+                middle = len(rows) // 2
+                await self._write_rows(kind, rows[:middle], insert, recover)
+                await self._write_rows(kind, rows[middle:], insert, recover)
+                return
+            if recover and kind == "message" and is_foreign_key_violation(e, MESSAGE_CONTACT_FK):
+                try:
+                    recovered = await self._recover_contact(rows[0])
+                except Exception as recover_error:
+                    print(f"Error recovering the contact of a message: {recover_error!r}")
+                    recovered = False
+                if recovered:
+                    await self._write_rows(kind, rows, insert, recover=False)
+                    return
+            self.counters["failed_batches"] += 1
+            await self._dead_letter(kind, rows, e)
+
+    async def _with_retries(self, insert, rows: List[dict]) -> None:
+        # One transaction per attempt; in-memory state changes only after the commit
+        async def attempt():
+            async with self.session_factory() as db:
+                on_commit = await insert(db, rows)
+                await db.commit()
+            return on_commit
+
+        on_commit = await self._retrying(attempt)
+        on_commit()
+
+    async def _retrying(self, operation: Callable[[], Awaitable]):
+        """
+        Await `operation()`, retrying transient errors with exponential backoff.
+        """
+        for attempt in range(self.retry_attempts + 1):
+            try:
+                return await operation()
+            except Exception as e:
+                if attempt == self.retry_attempts or not is_transient_error(e):
+                    raise
+                self.counters["retries"] += 1
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+
+    async def _insert_contacts(self, db: AsyncSession, contacts: List[dict]) -> Callable[[], None]:
+        # One row per key: ON CONFLICT DO UPDATE cannot touch a row twice in one statement
+        rows = {}
+        for row in contacts:
+            rows.setdefault((row["user_id"], row["phone_e164"]), row)
+
+        stmt = pg_insert(Contact).values(list(rows.values()))
+        # The no-op update makes RETURNING include contacts that already existed
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Contact.user_id, Contact.phone_e164],
+            set_={"phone_e164": stmt.excluded.phone_e164},
+        ).returning(Contact.id, Contact.user_id, Contact.phone_e164, Contact.name)
+
+        stored = {}
+        for contact_id, user_id, phone_e164, name in (await db.execute(stmt)).all():
+            stored[(user_id, phone_e164)] = (contact_id, name)
+
+        def on_commit():
+            for row in contacts:
+                key = (row["user_id"], row["phone_e164"])
+                contact_id, name = stored[key]
+                if contact_id == row["id"]:
+                    self.counters["contacts_created"] += 1
+                else:
+                    # Created by another worker, or twice in this batch
+                    self._remapped.set(row["id"], contact_id)
+                    self.contact_index.set(key, {"id": contact_id, "phone": row["phone"], "name": name})
+        return on_commit
+
+    async def _insert_messages(self, db: AsyncSession, messages: List[dict]) -> Callable[[], None]:
+        result = await db.execute(
+            pg_insert(Message).values(messages).on_conflict_do_nothing(
+                index_elements=[Message.bot_id, Message.external_id]
+            )
+        )
+
+        def on_commit():
+            self.counters["messages_written"] += max(result.rowcount, 0)
+        return on_commit
+
+    async def _lookup_contacts(self, keys: set) -> dict:
+        # Stored contact ids by (user_id, phone_e164)
+        async with self.session_factory() as db:
+            rows = (await db.execute(
+                select(Contact.id, Contact.user_id, Contact.phone_e164)
+                .where(tuple_(Contact.user_id, Contact.phone_e164).in_(list(keys)))
+            )).all()
+        return {(user_id, phone_e164): contact_id for contact_id, user_id, phone_e164 in rows}
+
+    async def _recover_contact(self, row: dict) -> bool:
+        """
+        Point a message whose contact row no longer exists at the stored
+        contact with its phone, creating one if there is none. Returns False
+        if the phone cannot be recovered from the message.
+        """
+        stale_id = row["contact_id"]
+        contact_id = self._remapped.get(stale_id)
+        if contact_id is None:
+            phone = row["remote_jid"].split("@", 1)[0].split(":", 1)[0]
+            phone_e164 = normalize_phone(f"+{phone}")
+            if not phone_e164:
+                return False
+            key = (row["user_id"], phone_e164)
+            cached = self.contact_index.get(key)
+            if cached is not None and cached["id"] == stale_id:
+                self.contact_index.pop(key)
+
+            stored = await self._retrying(lambda: self._lookup_contacts({key}))
+            contact_id = stored.get(key)
+            if contact_id is None:
+                name = (row.get("payload") or {}).get("pushName")
+                contact = {
+                    "id": uuid.uuid4(),
+                    "user_id": row["user_id"],
+                    "phone": phone,
+                    "phone_e164": phone_e164,
+                    "name": name,
+                    "created_at": datetime.utcnow(),
+                }
+                await self._with_retries(self._insert_contacts, [contact])
+                # Another worker may have created it first
+                contact_id = self._remapped.get(contact["id"], contact["id"])
+                if contact_id == contact["id"]:
+                    self.contact_index.set(key, {"id": contact_id, "phone": phone, "name": name})
+            # Messages still queued with the stale id follow too
+            self._remapped.set(stale_id, contact_id)
+        row["contact_id"] = contact_id
+        return True
+
+    async def _resolve_contact_ids(self, messages: List[dict]) -> List[dict]:
+        """
+        Point messages at the stored contact row. Messages whose contact was
+        dropped are re-resolved by phone; those still without one are dead-lettered.
+        """
+        for row in messages:
+            row["contact_id"] = self._remapped.get(row["contact_id"], row["contact_id"])
+        dropped = {
+            row["contact_id"]: key
+            for row in messages
+            if (key := self._dropped_contacts.get(row["contact_id"])) is not None
+        }
+        if not dropped:
+            return messages
+
+        try:
+            stored = await self._retrying(lambda: self._lookup_contacts(set(dropped.values())))
+        except Exception as e:
+            print(f"Error re-resolving contacts of dropped contact rows: {e!r}")
+            stored = {}
+        for dropped_id, key in dropped.items():
+            if key in stored:
+                self._remapped.set(dropped_id, stored[key])
+                self._dropped_contacts.pop(dropped_id)
+
+        resolved, orphaned = [], []
+        for row in messages:
+            row["contact_id"] = self._remapped.get(row["contact_id"], row["contact_id"])
+            (orphaned if row["contact_id"] in dropped else resolved).append(row)
+        if orphaned:
+            await self._dead_letter("message", orphaned, "contact row was not written")
+        return resolved
+
+    async def _dead_letter(self, kind: str, rows: List[dict], error) -> None:
+        self.counters["dead_lettered"] += len(rows)
+        print(f"Dropping {len(rows)} {kind} rows: {error!r}")
+        if kind == "contact":
+            for row in rows:
+                key = (row["user_id"], row["phone_e164"])
+                # Look the contact up again on its next message
+                cached = self.contact_index.get(key)
+                if cached is not None and cached["id"] == row["id"]:
+                    self.contact_index.pop(key)
+                self._dropped_contacts.set(row["id"], key)
+        if not self.dead_letter_path:
+            return
+        failed_at = datetime.utcnow().isoformat()
+        lines = "".join(
+            json.dumps({"kind": kind, "error": repr(error), "failed_at": failed_at, "row": row}, default=str) + "\n"
+            for row in rows
+        )
+        try:
+            await asyncio.to_thread(self._append_dead_letters, lines)
+        except OSError as e:
+            print(f"Error writing dead letters to {self.dead_letter_path}: {e!r}\n{lines}")
+
+    def _append_dead_letters(self, lines: str) -> None:
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "queued": self.queue.qsize(),
+            "contact_index": self.contact_index.stats(),
+        }
+
+
+message_ingestor = MessageIngestor(
+    batch_size=settings.INGEST_BATCH_SIZE,
+    flush_interval=settings.INGEST_FLUSH_INTERVAL,
+    queue_maxsize=settings.INGEST_QUEUE_MAXSIZE,
+    contact_index_maxsize=settings.CONTACT_INDEX_MAXSIZE,
+    contact_index_ttl=settings.CONTACT_INDEX_TTL,
+    forward_url=settings.N8N_WEBHOOK_URL,
+    forward_timeout=settings.N8N_FORWARD_TIMEOUT,
+    retry_attempts=settings.INGEST_RETRY_ATTEMPTS,
+    retry_backoff=settings.INGEST_RETRY_BACKOFF,
+    dead_letter_path=settings.INGEST_DEAD_LETTER_PATH,
+)
@@ -0,0 +1,107 @@
+"""
+Expansion of recurring blocked periods into concrete busy intervals.
+
+A rule repeats every `repeat_interval` days (daily) or weeks (weekly, on the
+given weekdays) from `starts_on`, bounded by `until` and/or `count`, and
+skips the dates in `exceptions`. As in RFC 5545, exceptions still count
+towards `count`.
+
+Rules are only expanded for the days being queried, and whether a day
+matches is plain arithmetic (no walk from `starts_on`), so expansion costs
+O(days in the window) however old the rule is. Expansions are cached per
+(rule version, window, timezone); editing a rule bumps `updated_at`, so
+stale expansions are never read again.
+"""
+from datetime import date, timedelta
+from typing import Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.timezones import DEFAULT_TZ, local_window_to_utc
+from app.services.availability import Interval
+
+FREQUENCIES = ("daily", "weekly")
+
+expansion_cache = TTLCache(maxsize=settings.RECURRENCE_CACHE_MAXSIZE, ttl=settings.RECURRENCE_CACHE_TTL)
+
+
+def weekday_of(day: date) -> int:
+    # 0 = Sunday, as in business_hours.weekday
+    return (day.weekday() + 1) % 7
+
+
+def _weekdays(rule) -> List[int]:
+    return sorted(set(rule.weekdays or [weekday_of(rule.starts_on)]))
+
+
+def occurrence_index(rule, day: date) -> Optional[int]:
+    """
+    Zero-based index of the rule's occurrence on `day` (ignoring until,
+    count and exceptions), or None if the pattern does not fall on it.
+    """
+    if day < rule.starts_on:
+        return None
+    every = rule.repeat_interval or 1
+    if rule.frequency == "daily":
+        offset = (day - rule.starts_on).days
+        return None if offset % every else offset // every
+
+    weekdays = _weekdays(rule)
+    weekday = weekday_of(day)
+    if weekday not in weekdays:
+        return None
+    # Weeks start on Sunday; the first one is the week of starts_on
+    first_weekday = weekday_of(rule.starts_on)
+    weeks = (day - rule.starts_on + timedelta(days=first_weekday)).days // 7
+    if weeks % every:
+        return None
+    # Days of the first week before starts_on are not occurrences
+    skipped = sum(1 for w in weekdays if w < first_weekday)
+    return (weeks // every) * len(weekdays) + weekdays.index(weekday) - skipped
+
+
+def occurrence_days(rule, first_day: date, last_day: date) -> List[date]:
+    """
+    Local days in [first_day, last_day] on which the rule occurs.
+    """
+    first_day = max(first_day, rule.starts_on)
+    if rule.until is not None:
+        last_day = min(last_day, rule.until)
+    exceptions = set(rule.exceptions or ())
+    days = []
+    day = first_day
+    while day <= last_day:
+        index = occurrence_index(rule, day)
+        if index is not None:
+            if rule.count is not None and index >= rule.count:
+                break
+            if day not in exceptions:
+                days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def expand(rule, first_day: date, last_day: date, tz: ZoneInfo = DEFAULT_TZ) -> Tuple[Interval, ...]:
+    """
+    Aware UTC intervals of the rule's occurrences on local days [first_day, last_day], cached.
+    """
+    key = (rule.id, rule.updated_at, first_day, last_day, tz.key)
+    intervals = expansion_cache.get(key)
+    if intervals is None:
+        intervals = tuple(
+            local_window_to_utc(day, rule.start_time, rule.end_time, tz)
+            for day in occurrence_days(rule, first_day, last_day)
+        )
+        expansion_cache.set(key, intervals)
+    return intervals
+
+
+def expand_all(rules: Iterable, first_day: date, last_day: date, tz: ZoneInfo = DEFAULT_TZ) -> List[Tuple[object, Interval]]:
+    """
+    (doctor_id, interval) for every occurrence of `rules` in the window.
+    """
+    return [
+        (rule.doctor_id, interval)
+        for rule in rules
+        for interval in expand(rule, first_day, last_day, tz)
+    ]
@@ -0,0 +1,54 @@
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.user import User
+
+# firebase_uid -> column snapshot of the matching users row
+user_cache = TTLCache(maxsize=settings.USER_CACHE_MAXSIZE, ttl=settings.USER_CACHE_TTL)
+
+_user_columns = [
+    User.id,
+    User.firebase_uid,
+    User.email,
+    User.name,
+    User.created_at,
+    User.updated_at,
+]
+
+
+async def resolve_user(db: AsyncSession, decoded_token: dict) -> User:
+    """
+    Return the user for a verified Firebase token, creating it on first login.
+
+    Known users are served from a process-local cache without touching the
+    database. On a miss the row is fetched or created with a single
+    INSERT ... ON CONFLICT (firebase_uid) DO UPDATE ... RETURNING, so parallel
+    first requests cannot race on the unique constraint.
+
+    The returned User is a detached snapshot: read its columns, but never add
+    it to a session.
+    """
+    firebase_uid = decoded_token["uid"]
+
+    snapshot = user_cache.get(firebase_uid)
+    if snapshot is None:
+        email = decoded_token.get("email")
+        name = decoded_token.get("name") or (email.split("@")[0] if email else None)
+
+        stmt = insert(User).values(firebase_uid=firebase_uid, email=email, name=name)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.firebase_uid],
+            set_={
+                "email": func.coalesce(stmt.excluded.email, User.email),
+                "name": func.coalesce(User.name, stmt.excluded.name),
+            },
+        ).returning(*_user_columns)
+
+        row = (await db.execute(stmt)).one()
+        await db.commit()
+        snapshot = dict(row._mapping)
+        user_cache.set(firebase_uid, snapshot)
+
+    return User(**snapshot)
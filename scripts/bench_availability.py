@@ -0,0 +1,41 @@
+"""
+Micro-benchmark for the availability engine on dense calendars.
+
+Times the sweep against the previous nested-loop algorithm (kept in
+app/services/availability_reference.py) on one randomized calendar. Their
+equivalence is checked by tests/test_availability.py.
+
+    python scripts/bench_availability.py --bookings 300 --duration 5
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.availability import compute_free_slots  # noqa: E402
+from app.services.availability_reference import random_calendar, reference_slots  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bookings", type=int, default=300)
+    parser.add_argument("--duration", type=int, default=5, help="service duration in minutes")
+    parser.add_argument("--day-minutes", type=int, default=12 * 60)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    open_start, open_end, busy = random_calendar(rng, args.bookings, args.day_minutes)
+    duration = timedelta(minutes=args.duration)
+
+    for name, func in (("nested loop", reference_slots), ("sweep", compute_free_slots)):
+        runs, total = timeit.Timer(lambda: func(open_start, open_end, duration, busy)).autorange()
+        print(f"{name:<12} {total / runs * 1000:9.3f} ms/call ({args.bookings} bookings, {args.duration}-minute slots)")
+
+
+if __name__ == "__main__":
+    main()
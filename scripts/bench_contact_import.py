@@ -0,0 +1,75 @@
+"""
+Measure POST /contacts/import throughput in rows per second.
+
+Streams a generated CSV (or NDJSON) body to a running API, so the client never
+holds the file in memory either. A share of the rows repeats earlier phones
+and a share is invalid, to exercise deduplication and error reporting.
+
+    python scripts/bench_contact_import.py --base-url http://localhost:8000/api/v1 --token <firebase id token> --rows 200000
+"""
+import argparse
+import json
+import os
+import time
+import httpx
+
+
+def generate(rows: int, fmt: str, duplicate_every: int, invalid_every: int, chunk_rows: int = 1000):
+    run = int(time.time())
+    if fmt == "csv":
+        yield b"phone,name\n"
+    chunk = []
+    for n in range(rows):
+        if invalid_every and n % invalid_every == invalid_every - 1:
+            phone = "not-a-phone"
+        elif duplicate_every and n % duplicate_every == duplicate_every - 1:
+            phone = f"+55 11 9{(run + n - 1) % 10**8:08d}"
+        else:
+            phone = f"+55 11 9{(run + n) % 10**8:08d}"
+        name = f"Bench {n}"
+        if fmt == "csv":
+            chunk.append(f"{phone},{name}\n")
+        else:
+            chunk.append(json.dumps({"phone": phone, "name": name}) + "\n")
+        if len(chunk) >= chunk_rows:
+            yield "".join(chunk).encode()
+            chunk = []
+    if chunk:
+        yield "".join(chunk).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default=os.environ.get("API_BASE_URL", "http://localhost:8000/api/v1"))
+    parser.add_argument("--token", default=os.environ.get("API_TOKEN"))
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--format", choices=("csv", "ndjson"), default="csv")
+    parser.add_argument("--duplicate-every", type=int, default=20, help="every Nth row repeats the previous phone (0: never)")
+    parser.add_argument("--invalid-every", type=int, default=100, help="every Nth row has an invalid phone (0: never)")
+    args = parser.parse_args()
+    if not args.token:
+        parser.error("--token or API_TOKEN is required")
+
+    content_type = "text/csv" if args.format == "csv" else "application/x-ndjson"
+    start = time.perf_counter()
+    response = httpx.post(
+        f"{args.base_url.rstrip('/')}/contacts/import",
+        content=generate(args.rows, args.format, args.duplicate_every, args.invalid_every),
+        headers={"Authorization": f"Bearer {args.token}", "Content-Type": content_type},
+        timeout=None,
+    )
+    elapsed = time.perf_counter() - start
+    response.raise_for_status()
+    report = response.json()
+
+    print(f"rows:      {report['total_rows']}")
+    print(f"inserted:  {report['inserted']}")
+    print(f"updated:   {report['updated']}")
+    print(f"unchanged: {report['unchanged']}")
+    print(f"invalid:   {report['invalid']}")
+    print(f"elapsed:   {elapsed:.2f}s")
+    print(f"rows/sec:  {report['total_rows'] / elapsed:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Compare list-endpoint response times with and without FAST_JSON_RESPONSES.
+
+Serves pages of appointments and contacts (ORM objects, as the list endpoints
+return them) through routes declared with the same response models, once as
+FastAPI does by default and once with FastJSONRoute/FastJSONResponse, and
+times whole requests at the ASGI level (no HTTP client or database).
+
+    python scripts/bench_json_responses.py --rows 100 --repeat 500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import APIRouter, FastAPI  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import APIRoute  # noqa: E402
+from app.api.responses import FastJSONResponse, FastJSONRoute, orjson  # noqa: E402
+from app.models import *  # noqa: E402,F401,F403 (configures relationships)
+from app.models.appointment import Appointment  # noqa: E402
+from app.models.contact import Contact  # noqa: E402
+from app.schemas.appointment import AppointmentResponse  # noqa: E402
+from app.schemas.contact import ContactResponse  # noqa: E402
+
+
+def build_rows(rows: int):
+    now = datetime.utcnow()
+    user_id = uuid.uuid4()
+    contacts = [
+        Contact(id=uuid.uuid4(), user_id=user_id, phone=f"+55119{n:08d}", phone_e164=f"+55119{n:08d}",
+                name=f"Contato {n} São Paulo", created_at=now)
+        for n in range(rows)
+    ]
+    appointments = [
+        Appointment(id=uuid.uuid4(), user_id=user_id, contact_id=contact.id, doctor_id=uuid.uuid4(),
+                    service_id=uuid.uuid4(), title=f"Consulta - {contact.name}", description="Retorno",
+                    start_time=now + timedelta(minutes=30 * n), end_time=now + timedelta(minutes=30 * n + 30),
+                    status="active", created_at=now, updated_at=now)
+        for n, contact in enumerate(contacts)
+    ]
+    return appointments, contacts
+
+
+def build_app(fast: bool, appointments, contacts) -> FastAPI:
+    router = APIRouter(route_class=FastJSONRoute if fast else APIRoute)
+
+    @router.get("/appointments", response_model=List[AppointmentResponse])
+    async def read_appointments():
+        return appointments
+
+    @router.get("/contacts", response_model=List[ContactResponse])
+    async def read_contacts():
+        return contacts
+
+    app = FastAPI(default_response_class=FastJSONResponse if fast else JSONResponse)
+    app.include_router(router)
+    return app
+
+
+async def get(app: FastAPI, path: str) -> bytes:
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+             "headers": [], "client": ("127.0.0.1", 0), "server": ("testserver", 80)}
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+def timed(loop, app: FastAPI, path: str, repeat: int) -> float:
+    loop.run_until_complete(get(app, path))  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        loop.run_until_complete(get(app, path))
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100, help="rows per page")
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    appointments, contacts = build_rows(args.rows)
+    default_app = build_app(False, appointments, contacts)
+    fast_app = build_app(True, appointments, contacts)
+    loop = asyncio.new_event_loop()
+    print(f"{args.rows} rows per page, fast path encodes with {'orjson' if orjson is not None else 'pydantic-core'}")
+    print(f"{'endpoint':<14} {'default':>10} {'fast':>10} {'speedup':>8}")
+    for path in ("/appointments", "/contacts"):
+        if loop.run_until_complete(get(default_app, path)) != loop.run_until_complete(get(fast_app, path)):
+            print(f"warning: {path} bodies differ")
+        before = timed(loop, default_app, path, args.repeat)
+        after = timed(loop, fast_app, path, args.repeat)
+        print(f"{path:<14} {before * 1000:>8.3f}ms {after * 1000:>8.3f}ms {before / after:>7.2f}x")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Race concurrent bookings of one slot against a local Postgres database.
+
+Requires DATABASE_URL to point at a scratch database with migrations applied
+(`alembic upgrade head`). Fixtures are created under a throwaway user and
+removed afterwards.
+
+    python scripts/check_appointment_overlap.py --concurrency 50
+
+Exactly one of the concurrent bookings must succeed; every other one must be
+rejected with 409. Back-to-back and cancelled appointments must be accepted.
+A batch that overlaps a booked appointment, or overlaps itself, must be
+rejected with 409 and leave nothing behind.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException, Response  # noqa: E402
+from sqlalchemy import delete, func, select  # noqa: E402
+from app.core.database import AsyncSessionLocal, async_engine  # noqa: E402
+from app.models.appointment import Appointment  # noqa: E402
+from app.models.contact import Contact  # noqa: E402
+from app.models.doctor import Doctor  # noqa: E402
+from app.models.service import Service  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.schemas.appointment import AppointmentBatchRequest  # noqa: E402
+from app.api.api_v1.endpoints.appointments import _commit_appointment, batch_appointments  # noqa: E402
+
+
+async def create_fixtures():
+    user = User(firebase_uid=f"overlap-check-{uuid.uuid4()}", email="overlap-check@example.com")
+    async with AsyncSessionLocal() as db:
+        db.add(user)
+        await db.flush()
+        doctor = Doctor(user_id=user.id, name="Overlap Check", email="overlap-check@example.com")
+        contact = Contact(user_id=user.id, phone="5500000000000")
+        db.add_all([doctor, contact])
+        await db.flush()
+        service = Service(doctor_id=doctor.id, user_id=user.id, name="Consulta", duration=30)
+        db.add(service)
+        await db.commit()
+        return user.id, doctor.id, service.id, contact.id
+
+
+async def book(ids, start: datetime, end: datetime, status: str = "active") -> int:
+    user_id, doctor_id, service_id, contact_id = ids
+    async with AsyncSessionLocal() as db:
+        db.add(Appointment(
+            user_id=user_id,
+            doctor_id=doctor_id,
+            service_id=service_id,
+            contact_id=contact_id,
+            title="Overlap check",
+            start_time=start,
+            end_time=end,
+            status=status,
+        ))
+        try:
+            await _commit_appointment(db)
+        except HTTPException as e:
+            return e.status_code
+        return 200
+
+
+async def book_batch(ids, slots) -> int:
+    user_id, doctor_id, service_id, contact_id = ids
+    batch_in = AppointmentBatchRequest(operations=[
+        {"op": "create", "appointment": {
+            "contact_id": contact_id, "doctor_id": doctor_id, "service_id": service_id,
+            "title": "Overlap check", "start_time": start, "end_time": end,
+        }}
+        for start, end in slots
+    ])
+    async with AsyncSessionLocal() as db:
+        try:
+            await batch_appointments(db=db, response=Response(), batch_in=batch_in,
+                                     current_user=SimpleNamespace(id=user_id))
+        except HTTPException as e:
+            return e.status_code
+        return 200
+
+
+async def count_appointments(ids) -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(Appointment).where(Appointment.user_id == ids[0]))
+
+
+async def run(concurrency: int):
+    ids = await create_fixtures()
+    start = datetime(2030, 1, 7, 12, 0)
+    end = start + timedelta(minutes=30)
+    try:
+        # Same slot and partially overlapping slots, all at once
+        offsets = [timedelta(minutes=(i % 3) * 10) for i in range(concurrency)]
+        results = await asyncio.gather(*(book(ids, start + o, end + o) for o in offsets))
+        accepted = results.count(200)
+        conflicts = results.count(409)
+        print(f"concurrent bookings: {accepted} accepted, {conflicts} rejected with 409")
+        assert accepted == 1, f"expected exactly one booking to succeed, got {accepted}"
+        assert conflicts == concurrency - 1, f"unexpected results: {sorted(set(results))}"
+
+        # Ranges are half-open: the next slot starts where the booked one may end
+        taken = end + max(offsets)
+        assert await book(ids, taken, taken + timedelta(minutes=30)) == 200, "back-to-back booking rejected"
+        # Cancelled appointments do not take part in the constraint
+        assert await book(ids, start, end, status="cancelled") == 200, "cancelled appointment rejected"
+        print("back-to-back and cancelled appointments accepted")
+
+        # The constraint fires on the batch's INSERT, before its commit
+        before = await count_appointments(ids)
+        free = start + timedelta(days=1)
+        overlapping = [(free, free + timedelta(minutes=30)), (start, end)]
+        assert await book_batch(ids, overlapping) == 409, "batch overlapping a booking not rejected with 409"
+        self_overlapping = [(free, free + timedelta(minutes=30)), (free + timedelta(minutes=15), free + timedelta(minutes=45))]
+        assert await book_batch(ids, self_overlapping) == 409, "self-overlapping batch not rejected with 409"
+        assert await count_appointments(ids) == before, "rejected batch left appointments behind"
+        print("overlapping batches rejected with 409")
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(User).where(User.id == ids[0]))
+            await db.commit()
+        await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
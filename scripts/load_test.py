@@ -0,0 +1,67 @@
+"""
+Fire concurrent GET requests at a running API and report throughput.
+
+Point it at a single uvicorn worker and compare runs between revisions
+(for example before and after the AsyncSession port of a router):
+
+    uvicorn app.main:app --workers 1
+    python scripts/load_test.py --path /api/v1/contacts/ --token "$ID_TOKEN" --concurrency 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import httpx
+
+
+async def worker(client: httpx.AsyncClient, path: str, deadline: float, latencies: list, errors: list):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.get(path)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(base_url: str, path: str, token: str, concurrency: int, duration: float):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies: list = []
+    errors: list = []
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            worker(client, path, deadline, latencies, errors) for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    if not latencies:
+        print("no requests completed")
+        return
+    ordered = sorted(latencies)
+    print(f"requests:    {len(latencies)} ({len(errors)} errors)")
+    print(f"throughput:  {len(latencies) / elapsed:.1f} req/s")
+    print(f"latency p50: {statistics.median(ordered) * 1000:.1f}ms")
+    print(f"latency p95: {ordered[int(len(ordered) * 0.95) - 1] * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/health")
+    parser.add_argument("--token", default=os.environ.get("ID_TOKEN"))
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.base_url, args.path, args.token, args.concurrency, args.duration))
+
+
+if __name__ == "__main__":
+    main()
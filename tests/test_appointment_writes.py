@@ -0,0 +1,50 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+
+from app.api.api_v1.endpoints.appointments import _appointment_writes
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeSession:
+    def __init__(self):
+        self.committed = False
+        self.rolled_back = False
+
+    async def commit(self):
+        self.committed = True
+
+    async def rollback(self):
+        self.rolled_back = True
+
+
+class PgError(Exception):
+    def __init__(self, sqlstate):
+        super().__init__(sqlstate)
+        self.sqlstate = sqlstate
+
+
+async def test_writes_are_committed():
+    db = FakeSession()
+    async with _appointment_writes(db):
+        pass
+    assert db.committed and not db.rolled_back
+
+
+async def test_overlap_raised_by_a_write_is_a_conflict():
+    # The exclusion constraint is not deferrable: the INSERT itself fails
+    db = FakeSession()
+    with pytest.raises(HTTPException) as exc_info:
+        async with _appointment_writes(db):
+            raise IntegrityError("INSERT INTO appointments", {}, PgError("23P01"))
+    assert exc_info.value.status_code == 409
+    assert db.rolled_back and not db.committed
+
+
+async def test_other_integrity_errors_are_reraised():
+    db = FakeSession()
+    with pytest.raises(IntegrityError):
+        async with _appointment_writes(db):
+            raise IntegrityError("INSERT INTO appointments", {}, PgError("23503"))
+    assert db.rolled_back
@@ -0,0 +1,47 @@
+import random
+from datetime import timedelta
+
+import pytest
+
+from app.services.availability import BusyTimeline, compute_free_slots, merge_intervals
+from app.services.availability_reference import OPEN, random_calendar, reference_slots
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_free_slots_match_the_reference(seed):
+    rng = random.Random(seed)
+    for _ in range(400):
+        open_start, open_end, busy = random_calendar(rng, rng.randint(0, 40), rng.randint(30, 720))
+        duration = timedelta(minutes=rng.choice([5, 10, 15, 20, 30, 45, 60, 7, 13]))
+        assert compute_free_slots(open_start, open_end, duration, busy) == \
+            reference_slots(open_start, open_end, duration, busy), f"duration={duration} busy={busy}"
+
+
+def test_one_timeline_answers_every_day_like_the_reference():
+    rng = random.Random(42)
+    days = [random_calendar(rng, 20, 480, OPEN + timedelta(days=n)) for n in range(7)]
+    timeline = BusyTimeline(interval for _, _, busy in days for interval in busy)
+    duration = timedelta(minutes=30)
+    all_busy = [interval for _, _, busy in days for interval in busy]
+    for open_start, open_end, _ in days:
+        assert timeline.free_slots(open_start, open_end, duration) == \
+            reference_slots(open_start, open_end, duration, all_busy)
+
+
+def test_touching_intervals_do_not_block_the_slot_between_them():
+    busy = [(OPEN, OPEN + timedelta(minutes=30)), (OPEN + timedelta(minutes=60), OPEN + timedelta(minutes=90))]
+    slots = compute_free_slots(OPEN, OPEN + timedelta(minutes=90), timedelta(minutes=30), busy)
+    assert slots == [(OPEN + timedelta(minutes=30), OPEN + timedelta(minutes=60))]
+
+
+def test_merge_intervals_joins_overlapping_and_touching_and_drops_inverted():
+    t = [OPEN + timedelta(minutes=m) for m in range(0, 100, 10)]
+    assert merge_intervals([(t[2], t[4]), (t[0], t[1]), (t[1], t[2]), (t[6], t[5]), (t[7], t[8])]) == [
+        (t[0], t[4]),
+        (t[7], t[8]),
+    ]
+
+
+def test_duration_must_be_positive():
+    with pytest.raises(ValueError):
+        compute_free_slots(OPEN, OPEN + timedelta(hours=1), timedelta(0), [])
@@ -0,0 +1,258 @@
+import json
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import anyio
+import pytest
+
+from app import main
+from app.api.api_v1.endpoints import appointments, blocked_periods, business_hours
+from app.core.cache import InMemoryBackend, RedisBackend
+from app.services.availability_cache import AvailabilityCache
+
+pytestmark = pytest.mark.anyio
+
+UTC = timezone.utc
+DAY = date(2024, 3, 4)
+SLOTS = [(datetime(2024, 3, 4, 12, 0, tzinfo=UTC), datetime(2024, 3, 4, 12, 30, tzinfo=UTC))]
+
+
+class FakeRedis:
+    """The subset of redis.asyncio.Redis used by RedisBackend; values are stored encoded."""
+
+    def __init__(self):
+        self.data = {}
+        self.expiries = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value.encode()
+        self.expiries[key] = ex
+        return True
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def cache(request):
+    backend = InMemoryBackend() if request.param == "memory" else RedisBackend(FakeRedis())
+    return AvailabilityCache(backend, ttl=300)
+
+
+async def day_keys(cache, doctor_id, days, duration=30, tz_name="America/Sao_Paulo"):
+    return await cache.keys([(doctor_id, day, duration, tz_name) for day in days])
+
+
+def around(day: date, before: int, after: int):
+    return [day + timedelta(days=offset) for offset in range(-before, after + 1)]
+
+
+async def test_set_then_get_under_the_same_key(cache):
+    doctor_id = uuid.uuid4()
+    key = await cache.key(doctor_id, DAY, 30, "America/Sao_Paulo")
+    assert await cache.get(key) is None
+    await cache.set(key, SLOTS)
+    assert await cache.key(doctor_id, DAY, 30, "America/Sao_Paulo") == key
+    assert await cache.get(key) == SLOTS
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+async def test_keys_differ_by_duration_and_timezone(cache):
+    doctor_id = uuid.uuid4()
+    keys = await cache.keys([
+        (doctor_id, DAY, 30, "America/Sao_Paulo"),
+        (doctor_id, DAY, 45, "America/Sao_Paulo"),
+        (doctor_id, DAY, 30, "America/Manaus"),
+    ])
+    assert len(set(keys)) == 3
+
+
+async def test_range_invalidation_bumps_the_days_within_14_hours(cache):
+    doctor_id, other_doctor_id = uuid.uuid4(), uuid.uuid4()
+    days = around(DAY, 2, 2)
+    before = await day_keys(cache, doctor_id, days)
+    other_before = await day_keys(cache, other_doctor_id, days)
+
+    # 10:00-11:00 UTC on the 4th can be the 3rd (UTC-12) up to the 5th (UTC+14) locally
+    await cache.invalidate_range(doctor_id, datetime(2024, 3, 4, 10, 0), datetime(2024, 3, 4, 11, 0))
+
+    after = await day_keys(cache, doctor_id, days)
+    changed = [day for day, old, new in zip(days, before, after) if old != new]
+    assert changed == [date(2024, 3, 3), date(2024, 3, 4), date(2024, 3, 5)]
+    assert await day_keys(cache, other_doctor_id, days) == other_before
+
+
+async def test_range_invalidation_accepts_aware_datetimes(cache):
+    doctor_id = uuid.uuid4()
+    days = around(DAY, 2, 2)
+    before = await day_keys(cache, doctor_id, days)
+    # 23:00 in UTC-3 is 02:00 UTC on the 5th; read as UTC it would also touch the 3rd
+    local = timezone(timedelta(hours=-3))
+    await cache.invalidate_range(doctor_id, datetime(2024, 3, 4, 23, 0, tzinfo=local), datetime(2024, 3, 4, 23, 30, tzinfo=local))
+
+    after = await day_keys(cache, doctor_id, days)
+    changed = [day for day, old, new in zip(days, before, after) if old != new]
+    assert changed == [date(2024, 3, 4), date(2024, 3, 5)]
+
+
+async def test_long_ranges_bump_the_doctor_token(cache):
+    doctor_id = uuid.uuid4()
+    far_day = DAY + timedelta(days=200)
+    before = await day_keys(cache, doctor_id, [DAY, far_day])
+    await cache.invalidate_range(doctor_id, datetime(2024, 1, 1), datetime(2024, 6, 1))
+    after = await day_keys(cache, doctor_id, [DAY, far_day])
+    assert before[0] != after[0] and before[1] != after[1]
+
+
+async def test_doctor_invalidation_bumps_every_day(cache):
+    doctor_id, other_doctor_id = uuid.uuid4(), uuid.uuid4()
+    days = around(DAY, 3, 30)
+    before = await day_keys(cache, doctor_id, days)
+    other_before = await day_keys(cache, other_doctor_id, days)
+
+    await cache.invalidate_doctor(doctor_id)
+
+    after = await day_keys(cache, doctor_id, days)
+    assert all(old != new for old, new in zip(before, after))
+    assert await day_keys(cache, other_doctor_id, days) == other_before
+
+
+async def test_value_computed_under_a_replaced_token_is_never_served(cache):
+    doctor_id = uuid.uuid4()
+    # A reader resolves its key, then reads the database...
+    key = await cache.key(doctor_id, DAY, 30, "America/Sao_Paulo")
+    # ...while a booking on that day changes the data...
+    await cache.invalidate_range(doctor_id, datetime(2024, 3, 4, 12, 0), datetime(2024, 3, 4, 12, 30))
+    # ...and stores what it computed from the old data
+    await cache.set(key, SLOTS)
+
+    fresh_key = await cache.key(doctor_id, DAY, 30, "America/Sao_Paulo")
+    assert fresh_key != key
+    assert await cache.get(fresh_key) is None
+
+
+async def test_redis_backend_round_trips_json():
+    client = FakeRedis()
+    backend = RedisBackend(client)
+
+    await backend.set("a", [[1.5, 2.5]], ttl=0.2)
+    assert client.data["a"] == json.dumps([[1.5, 2.5]]).encode()
+    assert client.expiries["a"] == 1  # Redis expiries are whole seconds, at least one
+    assert await backend.get("a") == [[1.5, 2.5]]
+    assert await backend.get("missing") is None
+    assert await backend.get_many(["a", "missing"]) == [[[1.5, 2.5]], None]
+    assert await backend.get_many([]) == []
+
+    assert await backend.add("b", "token-1", ttl=60) is True
+    assert await backend.add("b", "token-2", ttl=60) is False
+    assert await backend.get("b") == "token-1"
+
+    await backend.delete("a", "b")
+    await backend.delete()
+    assert client.data == {}
+
+
+async def test_in_memory_backend_add_only_sets_missing_keys():
+    backend = InMemoryBackend()
+    assert await backend.add("k", "first", ttl=60) is True
+    assert await backend.add("k", "second", ttl=60) is False
+    assert await backend.get_many(["k", "missing"]) == ["first", None]
+    await backend.delete("k")
+    assert await backend.get("k") is None
+
+
+@pytest.fixture
+def endpoint_cache(monkeypatch):
+    cache = AvailabilityCache(InMemoryBackend(), ttl=300)
+    for module in (appointments, blocked_periods, business_hours):
+        monkeypatch.setattr(module, "availability_cache", cache)
+    return cache
+
+
+class SyncSession:
+    def commit(self):
+        pass
+
+
+class AsyncSessionStub:
+    def __init__(self, row):
+        self.row = row
+
+    async def scalar(self, statement):
+        return self.row
+
+    def add(self, row):
+        pass
+
+    async def commit(self):
+        pass
+
+    async def refresh(self, row):
+        pass
+
+
+async def test_cancelling_an_appointment_bumps_its_days(endpoint_cache):
+    doctor_id = uuid.uuid4()
+    appointment = SimpleNamespace(id=uuid.uuid4(), doctor_id=doctor_id, status="active",
+                                  start_time=datetime(2024, 3, 4, 12, 0), end_time=datetime(2024, 3, 4, 12, 30))
+    days = around(DAY, 2, 2)
+    before = await day_keys(endpoint_cache, doctor_id, days)
+
+    await appointments.delete_appointment(db=AsyncSessionStub(appointment), appointment_id=str(appointment.id),
+                                          current_user=SimpleNamespace(id=uuid.uuid4()))
+
+    after = await day_keys(endpoint_cache, doctor_id, days)
+    assert [old != new for old, new in zip(before, after)] == [False, True, True, True, False]
+
+
+async def test_deleting_a_blocked_period_bumps_its_days(monkeypatch, endpoint_cache):
+    doctor_id = uuid.uuid4()
+    period = SimpleNamespace(id=uuid.uuid4(), doctor_id=doctor_id,
+                             start_time=datetime(2024, 3, 4, 12, 0), end_time=datetime(2024, 3, 4, 18, 0))
+    monkeypatch.setattr(blocked_periods, "delete_owned", lambda db, model, id, user_id: period)
+    days = around(DAY, 2, 2)
+    before = await day_keys(endpoint_cache, doctor_id, days)
+
+    # Sync endpoints run in the threadpool and reach the cache through from_thread
+    await anyio.to_thread.run_sync(lambda: blocked_periods.delete_blocked_period(
+        db=SyncSession(), id=str(period.id), current_user=SimpleNamespace(id=uuid.uuid4())))
+
+    after = await day_keys(endpoint_cache, doctor_id, days)
+    assert [old != new for old, new in zip(before, after)] == [False, True, True, True, False]
+
+
+async def test_deleting_a_business_hour_bumps_the_doctor_token(monkeypatch, endpoint_cache):
+    doctor_id = uuid.uuid4()
+    hour = SimpleNamespace(id=uuid.uuid4(), doctor_id=doctor_id)
+    monkeypatch.setattr(business_hours, "delete_owned", lambda db, model, id, user_id: hour)
+    days = around(DAY, 0, 60)
+    before = await day_keys(endpoint_cache, doctor_id, days)
+
+    await anyio.to_thread.run_sync(lambda: business_hours.delete_business_hour(
+        db=SyncSession(), id=str(hour.id), current_user=SimpleNamespace(id=uuid.uuid4())))
+
+    after = await day_keys(endpoint_cache, doctor_id, days)
+    assert all(old != new for old, new in zip(before, after))
+
+
+async def test_metrics_report_hits_and_misses(monkeypatch):
+    cache = AvailabilityCache(InMemoryBackend(), ttl=300)
+    monkeypatch.setattr(main, "availability_cache", cache)
+    monkeypatch.setattr(main.settings, "METRICS_TOKEN", "scrape")
+    key = await cache.key(uuid.uuid4(), DAY, 30, "America/Sao_Paulo")
+    await cache.get(key)
+    await cache.set(key, SLOTS)
+    await cache.get_many([key, key])
+
+    stats = (await main.metrics(authorization="Bearer scrape"))["availability_cache"]
+    assert stats == {"backend": "InMemoryBackend", "hits": 2, "misses": 1, "hit_ratio": 2 / 3}
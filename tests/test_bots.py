@@ -0,0 +1,76 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.models.bot import Bot
+from app.services import bots
+
+pytestmark = pytest.mark.anyio
+
+
+def make_bot(name: str) -> Bot:
+    now = datetime.utcnow()
+    return Bot(id=uuid.uuid4(), user_id=uuid.uuid4(), name=name, instance_name="bot-1", enabled=True,
+               timezone="America/Sao_Paulo", created_at=now, updated_at=now)
+
+
+class FakeSession:
+    """Answers each query with the current row, optionally held until released."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.queries = 0
+        self.released = asyncio.Event()
+        self.released.set()
+
+    async def scalar(self, statement):
+        self.queries += 1
+        bot = self.bot
+        await self.released.wait()
+        return bot
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    bots.bot_instance_cache.clear()
+    yield
+    bots.bot_instance_cache.clear()
+
+
+async def test_bot_is_read_once_and_cached():
+    db = FakeSession(make_bot("Clínica"))
+    first = await bots.get_bot_snapshot(db, "bot-1")
+    second = await bots.get_bot_snapshot(db, "bot-1")
+    assert first["name"] == second["name"] == "Clínica"
+    assert db.queries == 1
+
+
+async def test_invalidation_refreshes_the_cache():
+    db = FakeSession(make_bot("Before"))
+    await bots.get_bot_snapshot(db, "bot-1")
+    db.bot = make_bot("After")
+    bots.invalidate_bot_instance("bot-1")
+    assert (await bots.get_bot_snapshot(db, "bot-1"))["name"] == "After"
+
+
+async def test_row_read_before_an_invalidation_is_not_cached():
+    db = FakeSession(make_bot("Before"))
+    db.released.clear()
+    stale_read = asyncio.ensure_future(bots.get_bot_snapshot(db, "bot-1"))
+    await asyncio.sleep(0)
+    # The bot is updated and invalidated while the read is in flight
+    db.bot = make_bot("After")
+    bots.invalidate_bot_instance("bot-1")
+    db.released.set()
+
+    assert (await stale_read)["name"] == "Before"
+    assert bots.bot_instance_cache.get("bot-1") is None
+    assert (await bots.get_bot_snapshot(db, "bot-1"))["name"] == "After"
+
+
+async def test_generations_are_bounded(monkeypatch):
+    monkeypatch.setattr(bots, "_generations", bots.TTLCache(maxsize=3, ttl=60))
+    bots.invalidate_bot_instance(*(f"bot-{n}" for n in range(10)))
+    assert len(bots._generations) == 3
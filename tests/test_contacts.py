@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+
+from app.api.api_v1.endpoints.contacts import _commit_contact
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeSession:
+    def __init__(self, error=None):
+        self.error = error
+        self.rolled_back = False
+
+    async def commit(self):
+        if self.error is not None:
+            raise self.error
+
+    async def rollback(self):
+        self.rolled_back = True
+
+
+def psycopg2_error(sqlstate, constraint):
+    orig = Exception("duplicate key")
+    orig.pgcode = sqlstate
+    orig.diag = SimpleNamespace(constraint_name=constraint)
+    return IntegrityError("INSERT INTO contacts", {}, orig)
+
+
+def asyncpg_error(sqlstate, constraint):
+    # SQLAlchemy's asyncpg adapter chains the driver exception, which names the constraint
+    cause = Exception("duplicate key")
+    cause.constraint_name = constraint
+    orig = Exception("duplicate key")
+    orig.sqlstate = sqlstate
+    orig.__cause__ = cause
+    return IntegrityError("INSERT INTO contacts", {}, orig)
+
+
+@pytest.mark.parametrize("make_error", [psycopg2_error, asyncpg_error])
+async def test_duplicate_phone_is_a_conflict(make_error):
+    db = FakeSession(make_error("23505", "uq_contacts_user_id_phone_e164"))
+    with pytest.raises(HTTPException) as exc_info:
+        await _commit_contact(db)
+    assert exc_info.value.status_code == 409
+    assert db.rolled_back
+
+
+@pytest.mark.parametrize("make_error", [psycopg2_error, asyncpg_error])
+@pytest.mark.parametrize("sqlstate, constraint", [
+    ("23505", "contacts_pkey"),
+    ("23503", "contacts_user_id_fkey"),
+    ("23502", None),
+])
+async def test_other_integrity_errors_are_reraised(make_error, sqlstate, constraint):
+    db = FakeSession(make_error(sqlstate, constraint))
+    with pytest.raises(IntegrityError):
+        await _commit_contact(db)
+    assert db.rolled_back
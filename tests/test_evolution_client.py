@@ -0,0 +1,222 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.services import evolution
+from app.services.evolution import CircuitBreaker, EvolutionAPIError, EvolutionClient
+
+pytestmark = pytest.mark.anyio
+
+STATE = "/instance/connectionState/bot-1"
+
+
+def make_client(handler, **kwargs) -> EvolutionClient:
+    kwargs.setdefault("retry_backoff", 0)
+    return EvolutionClient("http://evolution.test", "secret", transport=httpx.MockTransport(handler), **kwargs)
+
+
+def scripted(*steps):
+    """Handler answering each call with the next step (a status code or an exception)."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        step = steps[min(len(calls), len(steps) - 1)]
+        calls.append(request)
+        if isinstance(step, Exception):
+            raise step
+        return httpx.Response(step, json={"state": "open"} if step < 400 else {"error": step})
+
+    return handler, calls
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(evolution, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Backoff delays requested by the client, without waiting or jitter."""
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(evolution, "asyncio", SimpleNamespace(sleep=sleep))
+    monkeypatch.setattr(evolution, "random", SimpleNamespace(uniform=lambda a, b: a))
+    return delays
+
+
+async def test_success_sends_api_key():
+    handler, calls = scripted(200)
+    client = make_client(handler)
+    assert await client.get(STATE) == {"state": "open"}
+    assert calls[0].headers["apikey"] == "secret"
+    await client.close()
+
+
+async def test_get_is_retried_on_503_with_exponential_backoff(sleeps):
+    handler, calls = scripted(503, 503, 200)
+    client = make_client(handler, retries=2, retry_backoff=0.1)
+    assert await client.get("/instance/connect/bot-1") == {"state": "open"}
+    assert len(calls) == 3
+    assert sleeps == [0.1, 0.2]
+    await client.close()
+
+
+async def test_get_gives_up_after_the_retries(sleeps):
+    handler, calls = scripted(503)
+    client = make_client(handler, retries=2)
+    with pytest.raises(EvolutionAPIError) as exc_info:
+        await client.get(STATE)
+    assert exc_info.value.upstream_status == 503
+    assert len(calls) == 3
+    await client.close()
+
+
+async def test_post_is_not_retried_once_sent():
+    handler, calls = scripted(httpx.ReadTimeout("slow"), 200)
+    client = make_client(handler, retries=2)
+    with pytest.raises(EvolutionAPIError) as exc_info:
+        await client.post("/instance/restart/bot-1")
+    assert exc_info.value.status_code == 502
+    assert len(calls) == 1
+    await client.close()
+
+
+async def test_post_is_retried_when_the_connection_failed():
+    handler, calls = scripted(httpx.ConnectError("refused"), 200)
+    client = make_client(handler, retries=2)
+    assert await client.post("/instance/create", json={"instanceName": "bot-1"}) == {"state": "open"}
+    assert len(calls) == 2
+    await client.close()
+
+
+async def test_404_is_none_and_client_errors_do_not_trip_the_breaker():
+    handler, _ = scripted(404)
+    client = make_client(handler)
+    assert await client.delete("/instance/delete/bot-1") is None
+    await client.close()
+
+    handler, _ = scripted(422)
+    client = make_client(handler, breaker=CircuitBreaker(failure_threshold=1))
+    with pytest.raises(EvolutionAPIError) as exc_info:
+        await client.post("/instance/create")
+    assert exc_info.value.upstream_status == 422
+    assert client.breaker.state == "closed"
+    await client.close()
+
+
+async def test_circuit_breaker_opens_and_recovers_through_one_trial(clock):
+    handler, calls = scripted(500)
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    client = make_client(handler, retries=0, breaker=breaker)
+    for _ in range(3):
+        with pytest.raises(EvolutionAPIError):
+            await client.get(STATE)
+    assert breaker.state == "open"
+
+    # Open: answered locally, the API is not called
+    with pytest.raises(HTTPException) as exc_info:
+        await client.get(STATE)
+    assert not isinstance(exc_info.value, EvolutionAPIError)
+    assert exc_info.value.status_code == 503
+    assert len(calls) == 3
+
+    clock.now += 30
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial at a time
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now += 30
+    await client.close()
+    handler, calls = scripted(200)
+    client.transport = httpx.MockTransport(handler)
+    assert await client.get(STATE) == {"state": "open"}
+    assert breaker.state == "closed"
+    await client.close()
+
+
+async def test_instance_state_is_cached_until_invalidated(clock):
+    handler, calls = scripted(200)
+    client = make_client(handler, state_cache_ttl=2)
+    await client.get_instance_state("bot-1")
+    await client.get_instance_state("bot-1")
+    assert len(calls) == 1
+
+    client.invalidate_instance("bot-1")
+    await client.get_instance_state("bot-1")
+    assert len(calls) == 2
+    await client.close()
+
+
+async def test_instance_state_expires_after_the_ttl(monkeypatch, clock):
+    from app.core import cache
+    monkeypatch.setattr(cache, "time", SimpleNamespace(monotonic=clock))
+    handler, calls = scripted(200)
+    client = make_client(handler, state_cache_ttl=2)
+    await client.get_instance_state("bot-1")
+    clock.now += 2
+    await client.get_instance_state("bot-1")
+    assert len(calls) == 2
+    await client.close()
+
+
+class Gate:
+    """Async handler holding every request until released."""
+
+    def __init__(self):
+        self.calls = []
+        self.released = asyncio.Event()
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls.append(request)
+        number = len(self.calls)
+        await self.released.wait()
+        return httpx.Response(200, json={"state": f"call-{number}"})
+
+
+async def test_concurrent_state_calls_share_one_request():
+    gate = Gate()
+    client = make_client(gate)
+    waiters = [asyncio.ensure_future(client.get_instance_state("bot-1")) for _ in range(10)]
+    await asyncio.sleep(0.01)
+    gate.released.set()
+    results = await asyncio.gather(*waiters)
+
+    assert len(gate.calls) == 1
+    assert results == [{"state": "call-1"}] * 10
+    assert client.stats()["single_flight"]["coalesced"] == 9
+    await client.close()
+
+
+async def test_call_started_before_an_invalidation_is_not_joined_or_cached():
+    gate = Gate()
+    client = make_client(gate)
+    before = asyncio.ensure_future(client.get_instance_state("bot-1"))
+    await asyncio.sleep(0.01)
+    client.invalidate_instance("bot-1")
+    after = asyncio.ensure_future(client.get_instance_state("bot-1"))
+    await asyncio.sleep(0.01)
+    gate.released.set()
+
+    assert await before == {"state": "call-1"}
+    assert await after == {"state": "call-2"}
+    # Only the call started after the invalidation populated the cache
+    assert client.state_cache.get(STATE) == {"state": "call-2"}
+    await client.close()
@@ -0,0 +1,242 @@
+import json
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.api.api_v1.endpoints.contacts import delete_contact
+from app.services.ingestion import MessageIngestor, message_ingestor
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def commit(self):
+        pass
+
+
+class FakeStore:
+    """
+    Stands in for the contacts and messages tables: a write fails as a whole
+    if any of its rows is in `bad`, and raises `transient` errors first.
+    """
+
+    def __init__(self, bad=(), transient=0, stored_contacts=None, deleted_contacts=()):
+        self.bad = set(bad)
+        self.transient = transient
+        self.stored_contacts = stored_contacts or {}
+        # Contact ids that no longer exist: messages pointing at them fail the foreign key
+        self.deleted_contacts = set(deleted_contacts)
+        self.contacts = []
+        self.messages = []
+        self.attempts = 0
+
+    def _check(self, rows):
+        self.attempts += 1
+        if self.transient:
+            self.transient -= 1
+            raise OperationalError("INSERT", {}, ConnectionResetError("connection lost"))
+        if any(row["id"] in self.bad for row in rows):
+            raise IntegrityError("INSERT", {}, Exception("violates constraint"))
+
+    async def insert_contacts(self, db, rows):
+        self._check(rows)
+
+        def on_commit():
+            self.contacts.extend(rows)
+            self.stored_contacts.update({(row["user_id"], row["phone_e164"]): row["id"] for row in rows})
+        return on_commit
+
+    async def insert_messages(self, db, rows):
+        self._check(rows)
+        if any(row["contact_id"] in self.deleted_contacts for row in rows):
+            orig = Exception("violates foreign key constraint")
+            orig.pgcode = "23503"
+            orig.diag = SimpleNamespace(constraint_name="messages_contact_id_fkey")
+            raise IntegrityError("INSERT INTO messages", {}, orig)
+        return lambda: self.messages.extend(rows)
+
+    async def lookup_contacts(self, keys):
+        return {key: contact_id for key, contact_id in self.stored_contacts.items() if key in keys}
+
+
+def make_ingestor(store: FakeStore, tmp_path) -> MessageIngestor:
+    ingestor = MessageIngestor(
+        retry_attempts=3,
+        retry_backoff=0,
+        dead_letter_path=str(tmp_path / "dead_letters.ndjson"),
+        session_factory=FakeSession,
+    )
+    ingestor._insert_contacts = store.insert_contacts
+    ingestor._insert_messages = store.insert_messages
+    ingestor._lookup_contacts = store.lookup_contacts
+    return ingestor
+
+
+def contact_row(user_id, phone_e164):
+    return {"id": uuid.uuid4(), "user_id": user_id, "phone": phone_e164[1:], "phone_e164": phone_e164,
+            "name": None, "created_at": datetime.utcnow()}
+
+
+def message_row(user_id, contact_id, phone="5511999990000"):
+    return {"id": uuid.uuid4(), "user_id": user_id, "bot_id": uuid.uuid4(), "contact_id": contact_id,
+            "external_id": uuid.uuid4().hex, "remote_jid": f"{phone}@s.whatsapp.net", "from_me": False,
+            "message_type": "conversation", "text": "oi", "payload": {"pushName": "Maria"},
+            "sent_at": datetime.utcnow(), "created_at": datetime.utcnow()}
+
+
+def dead_letters(tmp_path):
+    path = tmp_path / "dead_letters.ndjson"
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+async def test_transient_errors_are_retried(tmp_path):
+    store = FakeStore(transient=2)
+    ingestor = make_ingestor(store, tmp_path)
+    user_id = uuid.uuid4()
+    messages = [message_row(user_id, uuid.uuid4()) for _ in range(3)]
+
+    await ingestor._flush([("message", row) for row in messages])
+
+    assert store.messages == messages
+    assert ingestor.counters["retries"] == 2
+    assert ingestor.counters["dead_lettered"] == 0
+
+
+async def test_persistent_error_drops_only_the_bad_row(tmp_path):
+    user_id = uuid.uuid4()
+    messages = [message_row(user_id, uuid.uuid4()) for _ in range(9)]
+    store = FakeStore(bad={messages[5]["id"]})
+    ingestor = make_ingestor(store, tmp_path)
+
+    await ingestor._flush([("message", row) for row in messages])
+
+    assert store.messages == messages[:5] + messages[6:]
+    letters = dead_letters(tmp_path)
+    assert [letter["row"]["id"] for letter in letters] == [str(messages[5]["id"])]
+    assert letters[0]["kind"] == "message"
+    assert ingestor.counters["dead_lettered"] == 1
+
+
+async def test_transient_errors_after_all_retries_dead_letter_the_batch(tmp_path):
+    store = FakeStore(transient=10)
+    ingestor = make_ingestor(store, tmp_path)
+    user_id = uuid.uuid4()
+    messages = [message_row(user_id, uuid.uuid4()) for _ in range(4)]
+
+    await ingestor._flush([("message", row) for row in messages])
+
+    # Not bisected: the database is unavailable, not the rows
+    assert store.attempts == 4
+    assert len(dead_letters(tmp_path)) == 4
+
+
+async def test_messages_of_a_dropped_contact_are_resolved_to_the_stored_one(tmp_path):
+    user_id = uuid.uuid4()
+    bad_contact = contact_row(user_id, "+5511999990001")
+    stored_id = uuid.uuid4()
+    store = FakeStore(bad={bad_contact["id"]}, stored_contacts={(user_id, "+5511999990001"): stored_id})
+    ingestor = make_ingestor(store, tmp_path)
+    ingestor.contact_index.set((user_id, "+5511999990001"), {"id": bad_contact["id"]})
+    first = message_row(user_id, bad_contact["id"])
+
+    await ingestor._flush([("contact", bad_contact), ("message", first)])
+    # A message queued before the failure still carries the generated id
+    later = message_row(user_id, bad_contact["id"])
+    await ingestor._flush([("message", later)])
+
+    assert [row["contact_id"] for row in store.messages] == [stored_id, stored_id]
+    assert ingestor.contact_index.get((user_id, "+5511999990001")) is None
+    assert [letter["kind"] for letter in dead_letters(tmp_path)] == ["contact"]
+
+
+async def test_messages_of_a_dropped_contact_without_stored_row_are_dead_lettered(tmp_path):
+    user_id = uuid.uuid4()
+    bad_contact = contact_row(user_id, "+5511999990002")
+    good_contact = contact_row(user_id, "+5511999990003")
+    store = FakeStore(bad={bad_contact["id"]})
+    ingestor = make_ingestor(store, tmp_path)
+    orphan = message_row(user_id, bad_contact["id"])
+    kept = message_row(user_id, good_contact["id"])
+
+    await ingestor._flush([("contact", bad_contact), ("contact", good_contact), ("message", orphan), ("message", kept)])
+
+    assert store.contacts == [good_contact]
+    assert store.messages == [kept]
+    assert [(letter["kind"], letter["row"]["id"]) for letter in dead_letters(tmp_path)] == [
+        ("contact", str(bad_contact["id"])),
+        ("message", str(orphan["id"])),
+    ]
+
+
+async def test_messages_of_a_deleted_contact_get_a_new_contact(tmp_path):
+    # Another worker deleted the contact; this worker's index still has it
+    user_id = uuid.uuid4()
+    deleted_id = uuid.uuid4()
+    store = FakeStore(deleted_contacts={deleted_id})
+    ingestor = make_ingestor(store, tmp_path)
+    ingestor.contact_index.set((user_id, "+5511999990004"), {"id": deleted_id, "phone": "5511999990004", "name": None})
+    kept = message_row(user_id, uuid.uuid4())
+    first = message_row(user_id, deleted_id, "5511999990004")
+    second = message_row(user_id, deleted_id, "5511999990004")
+
+    await ingestor._flush([("message", kept), ("message", first), ("message", second)])
+
+    [contact] = store.contacts
+    assert (contact["user_id"], contact["phone_e164"], contact["name"]) == (user_id, "+5511999990004", "Maria")
+    assert [row["contact_id"] for row in store.messages] == [kept["contact_id"], contact["id"], contact["id"]]
+    assert ingestor.contact_index.get((user_id, "+5511999990004"))["id"] == contact["id"]
+    assert dead_letters(tmp_path) == []
+
+
+async def test_messages_of_a_deleted_contact_use_the_stored_one(tmp_path):
+    # The contact was deleted and created again, e.g. by an import
+    user_id = uuid.uuid4()
+    deleted_id, stored_id = uuid.uuid4(), uuid.uuid4()
+    store = FakeStore(deleted_contacts={deleted_id}, stored_contacts={(user_id, "+5511999990005"): stored_id})
+    ingestor = make_ingestor(store, tmp_path)
+    ingestor.contact_index.set((user_id, "+5511999990005"), {"id": deleted_id, "phone": "5511999990005", "name": None})
+
+    await ingestor._flush([("message", message_row(user_id, deleted_id, "5511999990005"))])
+    # Queued before the failure, still with the deleted id
+    await ingestor._flush([("message", message_row(user_id, deleted_id, "5511999990005"))])
+
+    assert store.contacts == []
+    assert [row["contact_id"] for row in store.messages] == [stored_id, stored_id]
+    assert ingestor.contact_index.get((user_id, "+5511999990005")) is None
+    assert dead_letters(tmp_path) == []
+
+
+class DeleteSession:
+    def __init__(self, contact):
+        self.contact = contact
+
+    async def scalar(self, statement):
+        return self.contact
+
+    async def delete(self, contact):
+        pass
+
+    async def commit(self):
+        pass
+
+
+async def test_deleting_a_contact_drops_it_from_the_index():
+    user_id = uuid.uuid4()
+    contact = SimpleNamespace(id=uuid.uuid4(), user_id=user_id, phone_e164="+5511999990006")
+    key = (user_id, "+5511999990006")
+    message_ingestor.contact_index.set(key, {"id": contact.id, "phone": "5511999990006", "name": None})
+
+    await delete_contact(db=DeleteSession(contact), contact_id=str(contact.id), current_user=SimpleNamespace(id=user_id))
+
+    assert message_ingestor.contact_index.get(key) is None
@@ -0,0 +1,31 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_metrics_are_disabled_without_a_token(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", None)
+    assert client.get("/metrics").status_code == 404
+    assert client.get("/metrics", headers={"Authorization": "Bearer "}).status_code == 404
+
+
+@pytest.mark.parametrize("headers", [
+    {},
+    {"Authorization": "Bearer wrong"},
+    {"Authorization": "scrape"},
+    {"Authorization": "Bearer scrapé".encode("latin-1")},
+])
+def test_metrics_reject_a_missing_or_wrong_token(monkeypatch, headers):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape")
+    assert client.get("/metrics", headers=headers).status_code == 401
+
+
+def test_metrics_with_the_token(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape")
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape"})
+    assert response.status_code == 200
+    assert {"db_pool", "availability_cache", "message_ingestion"} <= set(response.json())
@@ -0,0 +1,69 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.database import (
+    TimedAsyncAdaptedQueuePool, TimedNullPool, TimedQueuePool, instrument_pool, pool_metrics,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    pool_metrics.reset()
+    yield
+    pool_metrics.reset()
+
+
+def make_engine(tmp_path, poolclass, **kwargs):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=poolclass, **kwargs)
+    instrument_pool(engine)
+    return engine
+
+
+def test_queue_pool_checkouts_are_timed(tmp_path):
+    engine = make_engine(tmp_path, TimedQueuePool, pool_size=1, max_overflow=0)
+    for _ in range(3):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    metrics = pool_metrics.snapshot()
+    # Fails if an SQLAlchemy upgrade stops calling Pool._do_get
+    assert pool_metrics.waits == 3
+    assert (metrics["connects"], metrics["checkouts"], metrics["checkins"]) == (1, 3, 3)
+    assert metrics["checkout_seconds_max"] >= metrics["checkout_seconds_avg"] > 0
+    engine.dispose()
+
+
+def test_null_pool_checkouts_are_timed(tmp_path):
+    engine = make_engine(tmp_path, TimedNullPool)
+    for _ in range(2):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    assert pool_metrics.waits == 2
+    assert pool_metrics.snapshot()["connects"] == 2
+    engine.dispose()
+
+
+def test_checkout_timeouts_are_counted(tmp_path):
+    engine = make_engine(tmp_path, TimedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.01)
+    with engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+
+    assert pool_metrics.snapshot()["timeouts"] == 1
+    engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_async_pool_checkouts_are_timed(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", poolclass=TimedAsyncAdaptedQueuePool)
+    instrument_pool(engine.sync_engine)
+    for _ in range(2):
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    assert pool_metrics.waits == 2
+    assert pool_metrics.snapshot()["checkouts"] == 2
+    await engine.dispose()
@@ -0,0 +1,120 @@
+import random
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.timezones import get_timezone
+from app.services.recurrence import expand, occurrence_days, occurrence_index, weekday_of
+
+START = date(2024, 3, 6)  # a Wednesday
+
+
+def make_rule(frequency="weekly", repeat_interval=1, weekdays=None, starts_on=START, until=None, count=None,
+              exceptions=None):
+    return SimpleNamespace(id=uuid.uuid4(), doctor_id=uuid.uuid4(), updated_at=datetime(2024, 1, 1),
+                           frequency=frequency, repeat_interval=repeat_interval, weekdays=weekdays,
+                           starts_on=starts_on, until=until, count=count, exceptions=exceptions,
+                           start_time=time(12, 0), end_time=time(13, 0))
+
+
+def sunday_of(day: date) -> date:
+    return day - timedelta(days=weekday_of(day))
+
+
+def matches(rule, day: date) -> bool:
+    every = rule.repeat_interval or 1
+    if rule.frequency == "daily":
+        return (day - rule.starts_on).days % every == 0
+    weekdays = rule.weekdays or [weekday_of(rule.starts_on)]
+    weeks = (sunday_of(day) - sunday_of(rule.starts_on)).days // 7
+    return weekday_of(day) in weekdays and weeks % every == 0
+
+
+def reference_days(rule, first_day: date, last_day: date):
+    """Walk day by day from starts_on, counting every occurrence (exceptions included)."""
+    days = []
+    seen = 0
+    day = rule.starts_on
+    while day <= last_day and (rule.until is None or day <= rule.until):
+        if matches(rule, day):
+            if rule.count is not None and seen >= rule.count:
+                break
+            seen += 1
+            if day >= first_day and day not in (rule.exceptions or ()):
+                days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def random_rule(rng: random.Random):
+    starts_on = START + timedelta(days=rng.randint(-10, 10))
+    weekdays = rng.sample(range(7), rng.randint(1, 4)) if rng.random() < 0.8 else None
+    return make_rule(
+        frequency=rng.choice(["daily", "weekly"]),
+        repeat_interval=rng.choice([1, 1, 2, 3, 5]),
+        weekdays=weekdays,
+        starts_on=starts_on,
+        until=starts_on + timedelta(days=rng.randint(0, 120)) if rng.random() < 0.4 else None,
+        count=rng.randint(1, 30) if rng.random() < 0.4 else None,
+        exceptions=[starts_on + timedelta(days=rng.randint(0, 90)) for _ in range(rng.randint(0, 5))],
+    )
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_occurrence_days_match_the_reference(seed):
+    rng = random.Random(seed)
+    for _ in range(300):
+        rule = random_rule(rng)
+        # Windows before, around and well after starts_on
+        first_day = START + timedelta(days=rng.randint(-40, 100))
+        last_day = first_day + timedelta(days=rng.randint(0, 60))
+        assert occurrence_days(rule, first_day, last_day) == reference_days(rule, first_day, last_day), vars(rule)
+
+
+def test_occurrence_index_counts_from_starts_on():
+    # Every other week on Monday (1) and Wednesday (3), starting on a Wednesday
+    rule = make_rule(repeat_interval=2, weekdays=[3, 1])
+    occurrences = [day for day in (START + timedelta(days=n) for n in range(35)) if occurrence_index(rule, day) is not None]
+    assert occurrences == [date(2024, 3, 6), date(2024, 3, 18), date(2024, 3, 20), date(2024, 4, 1), date(2024, 4, 3)]
+    assert [occurrence_index(rule, day) for day in occurrences] == [0, 1, 2, 3, 4]
+    # The Monday of the first week is before starts_on
+    assert occurrence_index(rule, date(2024, 3, 4)) is None
+
+
+def test_count_bounds_the_occurrences_and_exceptions_count_towards_it():
+    rule = make_rule(frequency="daily", repeat_interval=2, count=4, exceptions=[date(2024, 3, 8)])
+    assert occurrence_days(rule, date(2024, 3, 1), date(2024, 4, 1)) == [
+        date(2024, 3, 6), date(2024, 3, 10), date(2024, 3, 12),
+    ]
+
+
+def test_until_is_inclusive():
+    rule = make_rule(weekdays=[3], until=date(2024, 3, 20))
+    assert occurrence_days(rule, date(2024, 3, 1), date(2024, 4, 30)) == [
+        date(2024, 3, 6), date(2024, 3, 13), date(2024, 3, 20),
+    ]
+
+
+def test_window_before_starts_on_is_empty_and_overlapping_window_starts_at_it():
+    rule = make_rule(frequency="daily")
+    assert occurrence_days(rule, date(2024, 2, 1), date(2024, 3, 5)) == []
+    assert occurrence_days(rule, date(2024, 3, 1), date(2024, 3, 7)) == [date(2024, 3, 6), date(2024, 3, 7)]
+
+
+def test_weekly_without_weekdays_repeats_on_the_weekday_of_starts_on():
+    rule = make_rule(repeat_interval=3)
+    assert occurrence_days(rule, START, START + timedelta(days=63)) == [
+        START + timedelta(weeks=weeks) for weeks in (0, 3, 6, 9)
+    ]
+
+
+def test_expand_converts_local_windows_to_utc():
+    rule = make_rule(frequency="daily", count=2)
+    intervals = expand(rule, START, START + timedelta(days=5), get_timezone("America/Sao_Paulo"))
+    # 12:00-13:00 in Sao Paulo (UTC-3, no DST since 2019)
+    assert intervals == (
+        (datetime(2024, 3, 6, 15, 0, tzinfo=timezone.utc), datetime(2024, 3, 6, 16, 0, tzinfo=timezone.utc)),
+        (datetime(2024, 3, 7, 15, 0, tzinfo=timezone.utc), datetime(2024, 3, 7, 16, 0, tzinfo=timezone.utc)),
+    )
@@ -0,0 +1,74 @@
+from datetime import date, datetime, time, timedelta, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.core.timezones import get_timezone, local_day_start_utc, local_days_to_utc, local_window_to_utc
+
+NEW_YORK = get_timezone("America/New_York")
+SAO_PAULO = get_timezone("America/Sao_Paulo")
+# 2024 in New York: 02:00 -> 03:00 on March 10, 02:00 -> 01:00 on November 3
+SPRING = date(2024, 3, 10)
+FALL = date(2024, 11, 3)
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_ordinary_day():
+    assert local_window_to_utc(date(2024, 3, 5), time(9), time(17), NEW_YORK) == (utc(2024, 3, 5, 14), utc(2024, 3, 5, 22))
+    assert local_window_to_utc(date(2024, 7, 5), time(9), time(17), NEW_YORK) == (utc(2024, 7, 5, 13), utc(2024, 7, 5, 21))
+
+
+def test_start_in_the_skipped_hour_moves_forward():
+    # 02:30 does not exist; it becomes 03:30 EDT
+    assert local_window_to_utc(SPRING, time(2, 30), time(4), NEW_YORK) == (utc(2024, 3, 10, 7, 30), utc(2024, 3, 10, 8))
+
+
+def test_end_in_the_skipped_hour_moves_forward():
+    assert local_window_to_utc(SPRING, time(1), time(2, 30), NEW_YORK) == (utc(2024, 3, 10, 6), utc(2024, 3, 10, 7, 30))
+
+
+def test_window_across_the_skipped_hour_is_an_hour_shorter():
+    start, end = local_window_to_utc(SPRING, time(1), time(4), NEW_YORK)
+    assert end - start == timedelta(hours=2)
+
+
+def test_end_in_the_repeated_hour_uses_its_second_occurrence():
+    # 01:30 happens at 05:30 UTC (EDT) and again at 06:30 UTC (EST)
+    assert local_window_to_utc(FALL, time(0), time(1, 30), NEW_YORK) == (utc(2024, 11, 3, 4), utc(2024, 11, 3, 6, 30))
+
+
+def test_start_in_the_repeated_hour_uses_its_first_occurrence():
+    assert local_window_to_utc(FALL, time(1, 30), time(3), NEW_YORK) == (utc(2024, 11, 3, 5, 30), utc(2024, 11, 3, 8))
+
+
+def test_transition_days_are_23_and_25_hours_long():
+    start, end = local_days_to_utc(SPRING, SPRING, NEW_YORK)
+    assert (start, end) == (datetime(2024, 3, 10, 5), datetime(2024, 3, 11, 4))
+    start, end = local_days_to_utc(FALL, FALL, NEW_YORK)
+    assert (start, end) == (datetime(2024, 11, 3, 4), datetime(2024, 11, 4, 5))
+    assert end - start == timedelta(hours=25)
+
+
+def test_day_starting_in_a_skipped_midnight():
+    # Sao Paulo still had DST in 2018: clocks went from 00:00 to 01:00 on November 4
+    assert local_day_start_utc(date(2018, 11, 4), SAO_PAULO) == datetime(2018, 11, 4, 3)
+    start, end = local_days_to_utc(date(2018, 11, 4), date(2018, 11, 4), SAO_PAULO)
+    assert end - start == timedelta(hours=23)
+
+
+def test_day_bounds_are_naive_utc():
+    start, end = local_days_to_utc(date(2024, 3, 4), date(2024, 3, 6), SAO_PAULO)
+    assert (start, end) == (datetime(2024, 3, 4, 3), datetime(2024, 3, 7, 3))
+    assert start.tzinfo is None and end.tzinfo is None
+
+
+def test_get_timezone_defaults_and_rejects_unknown_names():
+    assert get_timezone(None).key == settings.DEFAULT_TIMEZONE
+    assert get_timezone("").key == settings.DEFAULT_TIMEZONE
+    assert get_timezone("America/Manaus").key == "America/Manaus"
+    for name in ("Mars/Olympus_Mons", "America/New York", "../etc/passwd", "/etc/localtime"):
+        with pytest.raises(ValueError, match="Unknown timezone"):
+            get_timezone(name)
@@ -0,0 +1,115 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import cache, security
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    """Drives both the wall clock (token exp) and the cache's monotonic clock."""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class Verifier:
+    def __init__(self, clock, lifetime=3600):
+        self.clock = clock
+        self.lifetime = lifetime
+        self.calls = []
+
+    def __call__(self, token):
+        self.calls.append(token)
+        return {"uid": f"uid-{token}", "exp": self.clock() + self.lifetime}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", SimpleNamespace(monotonic=clock))
+    monkeypatch.setattr(security, "time", SimpleNamespace(time=clock))
+    return clock
+
+
+@pytest.fixture
+def verifier(monkeypatch, clock):
+    verifier = Verifier(clock)
+    monkeypatch.setattr(security.auth, "verify_id_token", verifier)
+    monkeypatch.setattr(security, "token_cache",
+                        TTLCache(maxsize=settings.TOKEN_CACHE_MAXSIZE, ttl=settings.TOKEN_CACHE_TTL))
+    return verifier
+
+
+def test_cache_is_sized_from_settings():
+    assert security.token_cache.maxsize == settings.TOKEN_CACHE_MAXSIZE
+    assert security.token_cache.ttl == settings.TOKEN_CACHE_TTL
+
+
+async def test_hit_skips_the_verifier(verifier):
+    first = await security.verify_firebase_token("Bearer token-a")
+    second = await security.verify_firebase_token("token-a")
+
+    assert second == first
+    assert verifier.calls == ["token-a"]
+    # Keyed by a digest, never by the raw token
+    assert "token-a" not in security.token_cache._data
+
+
+async def test_entry_expires_at_the_token_exp(verifier, clock):
+    verifier.lifetime = 60  # shorter than TOKEN_CACHE_TTL
+    await security.verify_firebase_token("token-a")
+
+    clock.now += 59
+    await security.verify_firebase_token("token-a")
+    assert len(verifier.calls) == 1
+
+    clock.now += 1
+    await security.verify_firebase_token("token-a")
+    assert len(verifier.calls) == 2
+
+
+async def test_entry_expires_after_the_cache_ttl(verifier, clock):
+    await security.verify_firebase_token("token-a")
+
+    clock.now += settings.TOKEN_CACHE_TTL
+    await security.verify_firebase_token("token-a")
+    assert len(verifier.calls) == 2
+
+
+async def test_expired_token_is_not_cached(verifier):
+    verifier.lifetime = -1
+    await security.verify_firebase_token("token-a")
+    await security.verify_firebase_token("token-a")
+    assert len(verifier.calls) == 2
+
+
+async def test_least_recently_used_entry_is_evicted(monkeypatch, verifier):
+    monkeypatch.setattr(settings, "TOKEN_CACHE_MAXSIZE", 2)
+    monkeypatch.setattr(security, "token_cache",
+                        TTLCache(maxsize=settings.TOKEN_CACHE_MAXSIZE, ttl=settings.TOKEN_CACHE_TTL))
+
+    await security.verify_firebase_token("token-a")
+    await security.verify_firebase_token("token-b")
+    await security.verify_firebase_token("token-a")  # a is now the most recently used
+    await security.verify_firebase_token("token-c")  # evicts b
+    assert len(security.token_cache) == 2
+
+    await security.verify_firebase_token("token-a")
+    assert verifier.calls == ["token-a", "token-b", "token-c"]
+    await security.verify_firebase_token("token-b")
+    assert verifier.calls == ["token-a", "token-b", "token-c", "token-b"]
+
+
+async def test_changed_token_is_a_miss(verifier):
+    await security.verify_firebase_token("token-a")
+    decoded = await security.verify_firebase_token("token-a2")
+
+    assert decoded["uid"] == "uid-token-a2"
+    assert verifier.calls == ["token-a", "token-a2"]